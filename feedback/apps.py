@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class FeedbackConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'feedback'
+
+    def ready(self):
+        from django.core import checks
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .mention_hub import check_hub_settings
+        from .metrics import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+        checks.register(check_hub_settings)
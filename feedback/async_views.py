@@ -0,0 +1,280 @@
+"""
+ASGI-native versions of the hot API endpoints. They return the same
+payloads as their counterparts in views.py but never hold a worker thread
+while waiting on the database or OpenAI. urls.py routes to them when
+ASYNC_VIEWS is enabled.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from slack_sdk.signature import SignatureVerifier
+
+from .events import aenqueue_event, process_event
+from .export import CONTENT_TYPES, EXPORT_FORMATS, aiter_export, export_queryset
+from .mention_hub import amention_events, get_hub
+from .metrics import record_stream_timing
+from .models import SlackUser
+from .pagination import apply_cursor, include_total, split_page
+from . import outbound
+from .response_cache import acached_json_response
+from .summaries import (
+    aopenai_completions, aprepare_final_request, asummarize, build_summary_request, chunk_feedback,
+    get_cached_summary, parse_time_bound, resolve_summary_input, sse_event, store_summary, summary_cache_key,
+)
+from .views import MENTION_ORDER, MENTIONS_PAGE_SIZE, get_mentions_queryset, serialize_mentions
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+async def slack_event_listener(request):
+    """
+    Listens to Slack events and stores them in the database. In queued mode
+    the event is appended to the SlackEvent queue, see events.enqueue_event.
+    """
+    if request.method == 'POST':
+        try:
+            if settings.SLACK_SIGNING_SECRET:
+                verifier = SignatureVerifier(settings.SLACK_SIGNING_SECRET)
+                if not verifier.is_valid_request(request.body, dict(request.headers)):
+                    return JsonResponse({'error': 'Invalid signature'}, status=403)
+
+            data = json.loads(request.body.decode('utf-8'))
+            logger.info("Received data: %s", data)
+
+            # Handle URL verification challenge
+            if data.get('type') == 'url_verification':
+                return JsonResponse({'challenge': data.get('challenge')})
+
+            # Handle actual events
+            if data.get('type') == 'event_callback':
+                if settings.SLACK_EVENTS_QUEUED:
+                    await aenqueue_event(data, int(request.headers.get('X-Slack-Retry-Num', 0)))
+                else:
+                    await sync_to_async(process_event)(data.get('event', {}))
+
+            return JsonResponse({'status': 'ok'})
+
+        except json.JSONDecodeError as e:
+            logger.error("Failed to parse JSON: %s", str(e))
+            return JsonResponse({'error': 'Invalid JSON'}, status=400)
+        except Exception as e:
+            logger.error("Unexpected error: %s", str(e))
+            return JsonResponse({'error': str(e)}, status=500)
+
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
+
+
+@csrf_exempt
+async def get_mentions(request):
+    """
+    Returns a page of mentions where a user is tagged, including reactions and sender details.
+    """
+    if request.method == 'GET':
+        user_id = request.GET.get('user_id')
+
+        if not user_id:
+            return JsonResponse({"error": "User ID is required"}, status=400)
+
+        return await acached_json_response(request, user_id, lambda: mentions_response(request, user_id))
+
+    return JsonResponse({"error": "Invalid request"}, status=400)
+
+
+async def mentions_response(request, user_id):
+    try:
+        slack_user = await SlackUser.objects.aget(slack_id=user_id)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    feedback_qs = get_mentions_queryset(slack_user)
+    try:
+        page_qs = apply_cursor(feedback_qs, request.GET.get('cursor'), MENTION_ORDER)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = [feedback async for feedback in page_qs[:MENTIONS_PAGE_SIZE + 1]]
+    feedbacks, next_cursor = split_page(rows, MENTIONS_PAGE_SIZE)
+    data = await sync_to_async(serialize_mentions)(feedbacks)
+
+    body = {
+        "mentions": data,
+        "next_cursor": next_cursor,
+    }
+    if include_total(request.GET):
+        body["total"] = await feedback_qs.acount()
+
+    return JsonResponse(body, status=200)
+
+
+@csrf_exempt
+async def stream_mentions(request):
+    """
+    Pushes new mentions of a user and reactions on them as server-sent
+    events. Waiting connections hold no thread.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    user_id = request.GET.get('user_id')
+    if not user_id:
+        return JsonResponse({"error": "User ID is required"}, status=400)
+    if not await SlackUser.objects.filter(slack_id=user_id).aexists():
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    subscription = get_hub().subscribe(user_id, loop=asyncio.get_running_loop())
+    events = amention_events(subscription, settings.MENTION_STREAM_KEEPALIVE)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+async def export_feedback(request):
+    """
+    Async counterpart of views.export_feedback. The rows are streamed from
+    an async iterator, so ASGI sends each chunk as it is read instead of
+    buffering the whole export.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+    try:
+        since = parse_time_bound(request.GET.get('since'), 'since')
+        until = parse_time_bound(request.GET.get('until'), 'until')
+        slack_user = await SlackUser.objects.aget(slack_id=request.GET['user_id']) if request.GET.get('user_id') else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    response = StreamingHttpResponse(
+        aiter_export(export_format, export_queryset(slack_user, since, until)),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="feedback.{export_format}"'
+    return response
+
+
+@csrf_exempt
+async def summarize_feedback(request):
+    """
+    Returns an AI-generated summary of the posted feedback or, given a user_id,
+    of that user's feedback read from the database.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Only POST method is allowed"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+        feedback_data, username, truncated, slack_user = await sync_to_async(resolve_summary_input)(data)
+
+        summary, cached = await agenerate_feedback_summary(feedback_data, username, slack_user)
+
+        return JsonResponse({
+            "summary": summary,
+            "feedback_count": len(feedback_data),
+            "truncated": truncated,
+            "cached": cached
+        }, status=200)
+
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+    except Exception as e:
+        logger.exception("Error in summarize_feedback: %s", str(e))
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@csrf_exempt
+async def summarize_feedback_stream(request):
+    """
+    Streaming variant of summarize_feedback, see views.summarize_feedback_stream.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Only POST method is allowed"}, status=405)
+
+    try:
+        summary_input = await sync_to_async(resolve_summary_input)(json.loads(request.body))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    response = StreamingHttpResponse(astream_feedback_summary(*summary_input), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def astream_feedback_summary(feedback_data, username, truncated, slack_user):
+    """Async counterpart of views.stream_feedback_summary."""
+    started = time.monotonic()
+    done = {"feedback_count": len(feedback_data), "truncated": truncated, "cached": False}
+    key = summary_cache_key(build_summary_request(feedback_data, username))
+    summary = await sync_to_async(get_cached_summary)(key)
+    if summary is not None:
+        record_stream_timing('first_byte', started)
+        record_stream_timing('first_token', started)
+        yield sse_event('token', {"text": summary})
+        record_stream_timing('total', started)
+        yield sse_event('done', {**done, "cached": True})
+        return
+
+    record_stream_timing('first_byte', started)
+    yield sse_event('progress', {"stage": "preparing", "chunks": len(chunk_feedback(feedback_data))})
+
+    parts = []
+    try:
+        final_request = await aprepare_final_request(feedback_data, username, aopenai_completions)
+        client = outbound.get_async_openai_client()
+        with outbound.timed('openai:chat.completions:stream'):
+            async for chunk in await client.chat.completions.create(**final_request, stream=True):
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if not parts:
+                    record_stream_timing('first_token', started)
+                parts.append(chunk.choices[0].delta.content)
+                yield sse_event('token', {"text": chunk.choices[0].delta.content})
+    except Exception as e:
+        logger.error("Error streaming feedback summary: %s", str(e))
+        yield sse_event('error', {"error": "Unable to generate summary due to an error. Please try again later."})
+        return
+
+    await sync_to_async(store_summary)(key, ''.join(parts).strip(), len(feedback_data), slack_user)
+    record_stream_timing('total', started)
+    yield sse_event('done', done)
+
+
+async def agenerate_feedback_summary(feedback_data, username, slack_user=None):
+    """Async counterpart of views.generate_feedback_summary."""
+    key = summary_cache_key(build_summary_request(feedback_data, username))
+    summary = await sync_to_async(get_cached_summary)(key)
+    if summary is not None:
+        return summary, True
+
+    try:
+        summary = await asummarize(feedback_data, username, aopenai_completions)
+
+    except Exception as e:
+        logger.error("Error generating feedback summary: %s", str(e))
+        return "Unable to generate summary due to an error. Please try again later.", False
+
+    await sync_to_async(store_summary)(key, summary, len(feedback_data), slack_user)
+    return summary, False
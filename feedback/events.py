@@ -0,0 +1,272 @@
+import logging
+import time
+from collections import Counter
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Feedback, Reaction, SlackEvent, SlackUser
+from .rendering import MENTION_RE, render_message
+from .slack_directory import directory
+from .invalidation import feedback_changed
+from .mention_hub import mention_delta, mentioned_ids, publish_mentions, reaction_delta
+from .stats import forget_feedback, record_reaction_changes
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+REACTION_EVENTS = ('reaction_added', 'reaction_removed')
+
+
+def get_event_id(data):
+    """Slack's event_id, falling back to the event's own timestamp for payloads without one."""
+    event = data.get('event', {})
+    return data.get('event_id') or event.get('event_ts') or event.get('ts') or ''
+
+
+def enqueue_event(data, retry_num=0):
+    """
+    Appends an event_callback payload to the SlackEvent queue. Returns False
+    when the event_id is already queued, i.e. the delivery is a Slack retry
+    or a duplicate, in which case only the highest retry number is recorded.
+    """
+    event_id = get_event_id(data)
+    queued, created = SlackEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={'payload': data, 'retry_num': retry_num},
+    )
+    if not created:
+        logger.info(f"Ignoring duplicate delivery of {event_id} (retry {retry_num})")
+        if retry_num > queued.retry_num:
+            SlackEvent.objects.filter(pk=queued.pk).update(retry_num=retry_num)
+    return created
+
+
+async def aenqueue_event(data, retry_num=0):
+    """Async counterpart of enqueue_event for the ASGI listener."""
+    return await sync_to_async(enqueue_event)(data, retry_num)
+
+
+def process_event(event):
+    """
+    Applies one Slack event (the "event" object of an event_callback) to the
+    database.
+    """
+    event_type = event.get('type')
+
+    if event_type == 'message' and 'subtype' not in event:
+        # Handle new message
+        slack_message_id = event.get('ts')
+        message_text = event.get('text')
+        slack_user_id = event.get('user')
+        timestamp = timezone.make_aware(timezone.datetime.fromtimestamp(float(slack_message_id)))
+
+        # Get or create the SlackUser
+        slack_user, _ = SlackUser.objects.get_or_create(
+            slack_id=slack_user_id,
+            defaults={'username': directory.get_username(slack_user_id)}
+        )
+
+        # Create or update the feedback message
+        mentioned_usernames = directory.get_usernames(MENTION_RE.findall(message_text or ''))
+        feedback_message, created = Feedback.objects.update_or_create(
+            slack_message_id=slack_message_id,
+            defaults={
+                'message': message_text,
+                'rendered_message': render_message(message_text, mentioned_usernames),
+                'timestamp': timestamp,
+                'user': slack_user,
+                'sender': slack_user,
+                'source': 'slack',
+            }
+        )
+        logger.info(f"{'Created' if created else 'Updated'} message: {feedback_message.id}")
+        if created:
+            delta = mention_delta(feedback_message, slack_user)
+            publish_mentions((slack_id, delta) for slack_id in mentioned_ids(message_text))
+
+    elif event_type == 'reaction_added':
+        # Handle new reaction
+        slack_message_id = event.get('item', {}).get('ts')
+        reaction_name = event.get('reaction')
+
+        try:
+            # Get the related message
+            feedback_message = Feedback.objects.get(slack_message_id=slack_message_id)
+
+            # Always create a new reaction entry
+            reaction = Reaction.objects.create(
+                feedback=feedback_message,
+                reaction=reaction_name
+            )
+            record_reaction_changes({(feedback_message.id, reaction_name): 1})
+            delta = reaction_delta(slack_message_id, reaction_name, 1)
+            publish_mentions((slack_id, delta) for slack_id in mentioned_ids(feedback_message.message))
+            logger.info(f"Created reaction: {reaction.reaction}")
+
+        except Feedback.DoesNotExist:
+            logger.error(f"Message not found for reaction: {slack_message_id}")
+
+    elif event_type == 'reaction_removed':
+        # Handle reaction removal
+        slack_message_id = event.get('item', {}).get('ts')
+        reaction_name = event.get('reaction')
+
+        try:
+            feedback_message = Feedback.objects.get(slack_message_id=slack_message_id)
+
+            # Delete one instance of the reaction
+            reaction = Reaction.objects.filter(
+                feedback=feedback_message,
+                reaction=reaction_name
+            ).first()
+            if reaction:
+                reaction.delete()
+                record_reaction_changes({(feedback_message.id, reaction_name): -1})
+                feedback_changed(feedback_ids=[feedback_message.id])
+                delta = reaction_delta(slack_message_id, reaction_name, -1)
+                publish_mentions((slack_id, delta) for slack_id in mentioned_ids(feedback_message.message))
+                logger.info(f"Deleted reaction {reaction_name} from message {slack_message_id}")
+
+        except Feedback.DoesNotExist:
+            logger.error(f"Message not found for reaction: {slack_message_id}")
+
+    elif event_type == 'message' and event.get('subtype') == 'message_deleted':
+        # Handle message deletion
+        deleted_ts = event.get('deleted_ts')
+        try:
+            deleted = Feedback.objects.filter(slack_message_id=deleted_ts)
+            forget_feedback(list(deleted.values_list('id', flat=True)))
+            deleted.delete()
+            logger.info(f"Deleted message {deleted_ts}")
+        except Exception as e:
+            logger.error(f"Error deleting message: {str(e)}")
+
+
+def apply_reaction_events(events):
+    """
+    Applies reaction_added/reaction_removed events as one batch. Adds and
+    removes of the same reaction on the same message net out, every
+    referenced message is resolved with one query, and the result is
+    written with one bulk_create and one delete. Returns (created, deleted).
+    """
+    net = {}
+    for event in events:
+        key = (event.get('item', {}).get('ts'), event.get('reaction'))
+        net[key] = net.get(key, 0) + (1 if event.get('type') == 'reaction_added' else -1)
+
+    messages = {}
+    feedback_ids = {}
+    for ts, feedback_id, message in Feedback.objects.filter(slack_message_id__in={ts for ts, _ in net})\
+            .values_list('slack_message_id', 'id', 'message'):
+        feedback_ids[ts] = feedback_id
+        messages[feedback_id] = (ts, message)
+    for ts in {ts for ts, _ in net} - feedback_ids.keys():
+        logger.error(f"Message not found for reaction: {ts}")
+
+    to_create = []
+    to_remove = {}
+    for (ts, reaction_name), count in net.items():
+        if ts not in feedback_ids or count == 0:
+            continue
+        if count > 0:
+            to_create.extend(Reaction(feedback_id=feedback_ids[ts], reaction=reaction_name) for _ in range(count))
+        else:
+            to_remove[(feedback_ids[ts], reaction_name)] = -count
+
+    delete_ids = []
+    changes = Counter((reaction.feedback_id, reaction.reaction) for reaction in to_create)
+    if to_remove:
+        candidates = Reaction.objects.filter(
+            feedback_id__in={feedback_id for feedback_id, _ in to_remove},
+            reaction__in={reaction_name for _, reaction_name in to_remove},
+        ).order_by('id').values_list('id', 'feedback_id', 'reaction')
+        for reaction_id, feedback_id, reaction_name in candidates:
+            if to_remove.get((feedback_id, reaction_name), 0) > 0:
+                to_remove[(feedback_id, reaction_name)] -= 1
+                delete_ids.append(reaction_id)
+                changes[(feedback_id, reaction_name)] -= 1
+
+    Reaction.objects.bulk_create(to_create)
+    if delete_ids:
+        Reaction.objects.filter(id__in=delete_ids).delete()
+    if to_create or delete_ids:
+        record_reaction_changes(changes)
+        feedback_changed(feedback_ids={r.feedback_id for r in to_create} | {feedback_id for feedback_id, _ in to_remove})
+        publish_mentions(
+            (slack_id, reaction_delta(messages[feedback_id][0], reaction_name, count))
+            for (feedback_id, reaction_name), count in changes.items() if count
+            for slack_id in mentioned_ids(messages[feedback_id][1])
+        )
+    return len(to_create), len(delete_ids)
+
+
+def process_queued_events(batch_size=100):
+    """
+    Drains up to batch_size pending SlackEvent rows in arrival order. Rows
+    are locked with SKIP LOCKED so several workers can drain concurrently.
+    Message events are applied one by one; reaction events are coalesced
+    by apply_reaction_events. Returns a dict of batch metrics.
+    """
+    started = time.monotonic()
+    stats = {'events': 0, 'reaction_events': 0, 'reactions_created': 0, 'reactions_deleted': 0, 'failed': 0}
+
+    with transaction.atomic():
+        batch = list(
+            SlackEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=SlackEvent.PENDING)
+            .order_by('id')[:batch_size]
+        )
+        reaction_batch = []
+        for queued in batch:
+            queued.attempts += 1
+            queued.processed_at = timezone.now()
+            event = queued.payload.get('event', {})
+            if event.get('type') in REACTION_EVENTS:
+                reaction_batch.append(queued)
+                continue
+            try:
+                with transaction.atomic():
+                    process_event(event)
+                mark_done(queued)
+            except Exception as e:
+                mark_failed(queued, e)
+
+        # Reactions go last so they can attach to messages created in this batch
+        if reaction_batch:
+            try:
+                with transaction.atomic():
+                    created, deleted = apply_reaction_events([q.payload['event'] for q in reaction_batch])
+                stats['reactions_created'] = created
+                stats['reactions_deleted'] = deleted
+                for queued in reaction_batch:
+                    mark_done(queued)
+            except Exception as e:
+                for queued in reaction_batch:
+                    mark_failed(queued, e)
+
+        SlackEvent.objects.bulk_update(batch, ['status', 'attempts', 'error', 'processed_at'])
+
+    stats['events'] = len(batch)
+    stats['reaction_events'] = len(reaction_batch)
+    stats['failed'] = sum(1 for queued in batch if queued.status != SlackEvent.DONE)
+    stats['elapsed'] = time.monotonic() - started
+    if batch:
+        logger.info(
+            f"Applied {len(batch)} events ({len(reaction_batch)} reactions netted to "
+            f"+{stats['reactions_created']}/-{stats['reactions_deleted']}) in {stats['elapsed'] * 1000:.0f}ms"
+        )
+    return stats
+
+
+def mark_done(queued):
+    queued.status = SlackEvent.DONE
+    queued.error = ''
+
+
+def mark_failed(queued, error):
+    logger.error(f"Error processing event {queued.event_id}: {str(error)}")
+    queued.error = str(error)
+    if queued.attempts >= MAX_ATTEMPTS:
+        queued.status = SlackEvent.FAILED
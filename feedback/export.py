@@ -0,0 +1,134 @@
+"""
+Streaming feedback export. Rows are read through a server-side cursor and
+written out chunk by chunk, so memory stays flat however large the export.
+iter_export feeds WSGI responses; under ASGI, Django would consume a sync
+iterator in a worker thread and buffer the whole body, so the async view
+uses aiter_export instead.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Feedback, TaggedUser
+from .serializers import FEEDBACK_ROW_FIELDS, attach_feedback_relations
+
+EXPORT_FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+CSV_COLUMNS = [
+    'slack_message_id', 'timestamp', 'source', 'sender_id', 'sender_username', 'recipient_id',
+    'recipient_username', 'message', 'rendered_message', 'reactions', 'tagged_users',
+]
+
+
+def export_queryset(slack_user=None, since=None, until=None):
+    """Feedback rows to export in (timestamp, id) order, optionally only those tagging slack_user."""
+    queryset = Feedback.objects.all()
+    if slack_user is not None:
+        queryset = queryset.filter(id__in=TaggedUser.objects.filter(user=slack_user).values('feedback_id'))
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+    return queryset.order_by('timestamp', 'id').values(*FEEDBACK_ROW_FIELDS, 'rendered_message', 'source')
+
+
+def iter_export_rows(queryset, chunk_size=2000):
+    """
+    Yields the rows of an export_queryset with reactions and tagged users
+    attached, two extra queries per chunk of chunk_size rows.
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield from attach_feedback_relations(chunk)
+
+
+async def aiter_export_rows(queryset, chunk_size=2000):
+    """Async counterpart of iter_export_rows, reading through the async ORM iterator."""
+    chunk = []
+    async for row in queryset.aiterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            for row_with_relations in await sync_to_async(attach_feedback_relations)(chunk):
+                yield row_with_relations
+            chunk = []
+    if chunk:
+        for row_with_relations in await sync_to_async(attach_feedback_relations)(chunk):
+            yield row_with_relations
+
+
+def export_record(row):
+    return {
+        'slack_message_id': row['slack_message_id'],
+        'timestamp': row['timestamp'],
+        'source': row['source'],
+        'sender': {'slack_id': row['sender__slack_id'], 'username': row['sender__username']},
+        'recipient': {'slack_id': row['user__slack_id'], 'username': row['user__username']},
+        'message': row['message'],
+        'rendered_message': row['rendered_message'],
+        'reactions': [reaction['reaction'] for reaction in row['reactions']],
+        'tagged_users': [tagged['user'] for tagged in row['tagged_users']],
+    }
+
+
+class Echo:
+    """File-like object whose write() returns the value, for feeding csv.writer into a generator."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_line(row):
+    return json.dumps(export_record(row), cls=DjangoJSONEncoder) + '\n'
+
+
+def csv_values(row):
+    record = export_record(row)
+    return [
+        record['slack_message_id'],
+        record['timestamp'].isoformat(),
+        record['source'],
+        record['sender']['slack_id'],
+        record['sender']['username'],
+        record['recipient']['slack_id'],
+        record['recipient']['username'],
+        record['message'],
+        record['rendered_message'],
+        ';'.join(record['reactions']),
+        ';'.join(tagged['slack_id'] for tagged in record['tagged_users']),
+    ]
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield ndjson_line(row)
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        yield writer.writerow(csv_values(row))
+
+
+def iter_export(export_format, queryset, chunk_size=2000):
+    """Yields the export of queryset as lines of NDJSON or CSV text."""
+    rows = iter_export_rows(queryset, chunk_size)
+    return iter_csv(rows) if export_format == 'csv' else iter_ndjson(rows)
+
+
+async def aiter_export(export_format, queryset, chunk_size=2000):
+    """Async counterpart of iter_export, for StreamingHttpResponse under ASGI."""
+    writer = csv.writer(Echo())
+    if export_format == 'csv':
+        yield writer.writerow(CSV_COLUMNS)
+    async for row in aiter_export_rows(queryset, chunk_size):
+        yield writer.writerow(csv_values(row)) if export_format == 'csv' else ndjson_line(row)
@@ -0,0 +1,114 @@
+"""
+Resolution of logged-in users to SlackUsers. A SlackIdentity row maps the
+login email to its SlackUser; resolved identities are also kept in the
+session. Users that Slack has not matched yet get a temp_ SlackUser, which
+manage.py reconcile_slack_identities swaps for the real one in the
+background, so requests never wait on users.lookupByEmail.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import slack_api
+from .models import SlackIdentity, SlackUser
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'slack_identity'
+TEMP_PREFIX = 'temp_'
+
+
+def link_identity(user):
+    """
+    First login of user: links their email to the SlackUser named after its
+    local part, as logins were matched before, or else to a temp_ SlackUser.
+    """
+    email = user.email.lower()
+    email_username = email.split('@')[0]
+    slack_user = SlackUser.objects.filter(username=email_username).first()
+    if slack_user is None:
+        slack_user, _ = SlackUser.objects.get_or_create(
+            slack_id=f'{TEMP_PREFIX}{user.id}',
+            defaults={'username': email_username},
+        )
+    identity, _ = SlackIdentity.objects.select_related('slack_user').get_or_create(
+        email=email,
+        defaults={'slack_user': slack_user, 'resolved': not slack_user.slack_id.startswith(TEMP_PREFIX)},
+    )
+    return identity
+
+
+def session_identity(request):
+    """
+    {'email', 'user_id', 'username', 'resolved'} of the logged-in user.
+    Resolved identities come from the session; the others cost one indexed
+    lookup, so a reconciled Slack ID shows up on the next request.
+    """
+    email = request.user.email.lower()
+    cached = request.session.get(SESSION_KEY)
+    if cached and cached['email'] == email:
+        return cached
+
+    identity = SlackIdentity.objects.select_related('slack_user').filter(email=email).first() \
+        or link_identity(request.user)
+    entry = {
+        'email': email,
+        'user_id': identity.slack_user.slack_id,
+        'username': identity.slack_user.username,
+        'resolved': identity.resolved,
+    }
+    if identity.resolved:
+        request.session[SESSION_KEY] = entry
+    return entry
+
+
+def resolve_identity(identity, slack_id, username):
+    """
+    Points identity at the SlackUser with slack_id. The temp_ placeholder
+    takes over the real ID, unless Slack events already created that user.
+    """
+    with transaction.atomic():
+        placeholder = identity.slack_user
+        existing = SlackUser.objects.filter(slack_id=slack_id).first()
+        if existing is None:
+            placeholder.slack_id = slack_id
+            placeholder.username = username or placeholder.username
+            placeholder.save()
+        else:
+            identity.slack_user = existing
+        identity.resolved = True
+        identity.checked_at = timezone.now()
+        identity.save()
+
+
+def reconcile_identities(batch_size=100):
+    """
+    Looks up unresolved identities in Slack by email, skipping those checked
+    within SLACK_IDENTITY_RECHECK_INTERVAL seconds. Returns a dict of counts.
+    """
+    now = timezone.now()
+    recheck_before = now - timedelta(seconds=settings.SLACK_IDENTITY_RECHECK_INTERVAL)
+    batch = list(
+        SlackIdentity.objects.select_related('slack_user')
+        .filter(Q(checked_at__isnull=True) | Q(checked_at__lt=recheck_before), resolved=False)
+        .order_by('id')[:batch_size]
+    )
+    stats = {'checked': len(batch), 'resolved': 0, 'not_found': 0, 'failed': 0}
+    for identity in batch:
+        try:
+            response = slack_api.call('users.lookupByEmail', {'email': identity.email})
+        except Exception as e:
+            logger.error(f"Error looking up {identity.email} in Slack: {str(e)}")
+            stats['failed'] += 1
+        else:
+            if response.get('ok'):
+                resolve_identity(identity, response['user']['id'], response['user'].get('name'))
+                stats['resolved'] += 1
+                continue
+            stats['not_found'] += 1
+        SlackIdentity.objects.filter(pk=identity.pk).update(checked_at=now)
+    return stats
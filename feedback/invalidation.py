@@ -0,0 +1,43 @@
+from django.db.models import Q
+
+from .models import Feedback, SlackUser, TaggedUser
+from .rendering import mentioning, refresh_rendered_messages
+from .response_cache import ALL_FEEDBACK, USERNAMES, bump_versions
+from .slack_directory import directory
+from .summaries import invalidate_summaries
+
+
+def feedback_changed(feedback_ids=(), user_ids=()):
+    """
+    Called after Feedback, Reaction or TaggedUser rows are written. Drops the
+    cached summaries and response pages of user_ids and of every user tagged
+    in or receiving one of feedback_ids.
+    """
+    touched = Q(id__in=set(user_ids))
+    if feedback_ids:
+        touched |= Q(id__in=TaggedUser.objects.filter(feedback_id__in=feedback_ids).values('user_id'))
+        touched |= Q(id__in=Feedback.objects.filter(id__in=feedback_ids).values('user_id'))
+    users = dict(SlackUser.objects.filter(touched).values_list('id', 'slack_id'))
+    invalidate_summaries(users.keys())
+    bump_versions([*users.values(), ALL_FEEDBACK])
+
+
+def usernames_changed(slack_ids):
+    """
+    Called after the usernames of slack_ids changed, by the SlackUser save
+    signal and by bulk upserts that skip it. Re-renders the messages that
+    mention them and drops every cache still showing the old names: the
+    directory entries, all response pages (through USERNAMES) and the
+    summaries of users whose feedback was sent by or mentions a renamed user.
+    """
+    slack_ids = list(slack_ids)
+    if not slack_ids:
+        return
+    for slack_id in slack_ids:
+        directory.invalidate(slack_id)
+    refresh_rendered_messages(slack_ids)
+    affected = Feedback.objects.filter(mentioning(slack_ids) | Q(sender__slack_id__in=slack_ids)).values('id')
+    user_ids = set(TaggedUser.objects.filter(feedback_id__in=affected).values_list('user_id', flat=True))
+    user_ids.update(Feedback.objects.filter(id__in=affected).values_list('user_id', flat=True))
+    invalidate_summaries(user_ids)
+    bump_versions([USERNAMES, ALL_FEEDBACK])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from feedback.models import Feedback
+from feedback.rendering import render_feedback_rows
+
+
+class Command(BaseCommand):
+    help = "Fill Feedback.rendered_message for rows stored before it existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help="Rows rendered and written per query",
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help="Re-render every row, not just rows with an empty rendered_message",
+        )
+
+    def handle(self, *args, **kwargs):
+        queryset = Feedback.objects.all() if kwargs['all'] else Feedback.objects.filter(rendered_message='')
+        rendered = 0
+        last_id = 0
+        while True:
+            # Walk by primary key so each chunk is an index range scan
+            chunk = list(queryset.filter(id__gt=last_id).order_by('id').only('id', 'message')[:kwargs['chunk_size']])
+            if not chunk:
+                break
+            rendered += render_feedback_rows(chunk)
+            last_id = chunk[-1].id
+            self.stdout.write(f"Rendered {rendered} messages")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {rendered} messages"))
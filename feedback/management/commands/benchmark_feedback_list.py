@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from feedback.management.commands.explain_queries import SEED_MESSAGE_PREFIX, seed
+from feedback.models import Feedback
+from feedback.serializers import FEEDBACK_ROW_FIELDS, FeedbackRowSerializer, FeedbackSerializer, attach_feedback_relations
+from feedback.views import FeedbackViewSet
+
+
+def serialize_models(queryset):
+    return FeedbackSerializer(queryset, many=True).data
+
+
+def serialize_rows(queryset):
+    return FeedbackRowSerializer(attach_feedback_relations(queryset), many=True).data
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare query count and serialization time of the feedback list strategies "
+        "over a seeded dataset. Only the seeded rows are serialized and they are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feedback', type=int, default=10000, help="Feedback rows to seed and serialize")
+        parser.add_argument('--users', type=int, default=200, help="Slack users to seed")
+        parser.add_argument(
+            '--skip-naive',
+            action='store_true',
+            help="Skip the unoptimized Feedback.objects.all() run, which issues several queries per row",
+        )
+
+    def handle(self, *args, **kwargs):
+        strategies = [
+            ('ModelSerializer, optimized queryset', serialize_models, FeedbackViewSet.queryset),
+            ('FeedbackRowSerializer, .values() rows', serialize_rows, Feedback.objects.values(*FEEDBACK_ROW_FIELDS)),
+        ]
+        if not kwargs['skip_naive']:
+            strategies.insert(0, ('ModelSerializer, Feedback.objects.all()', serialize_models, Feedback.objects.all()))
+
+        with transaction.atomic():
+            seed(kwargs['feedback'], kwargs['users'])
+            for name, serialize, queryset in strategies:
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    seeded = queryset.filter(slack_message_id__startswith=SEED_MESSAGE_PREFIX)
+                    data = serialize(seeded.order_by('timestamp', 'id'))
+                    elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{name}: {len(data)} rows, {len(queries)} queries, {elapsed * 1000:.0f}ms"
+                )
+            transaction.set_rollback(True)
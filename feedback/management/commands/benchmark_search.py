@@ -0,0 +1,94 @@
+import random
+import time
+from datetime import timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from feedback.models import Feedback, SlackUser
+from feedback.pagination import apply_rank_cursor
+from feedback.search import SEARCH_PAGE_SIZE, search_queryset
+
+WORDS = (
+    'thanks great job shipping release deploy review helped debugging incident onboarding docs '
+    'migration dashboard customer launch demo pairing mentoring refactor tests pipeline outage '
+    'support feedback design roadmap kudos awesome patience clarity ownership'
+).split()
+# (label, query): a common word, a rarer one, a phrase of two and one that matches nothing
+QUERIES = [
+    ('common word', 'thanks'),
+    ('rare word', 'outage'),
+    ('two words', 'deploy pipeline'),
+    ('no match', 'zeppelin'),
+]
+
+
+def seed_messages(feedback_count, user_count, batch_size):
+    users = SlackUser.objects.bulk_create(
+        SlackUser(slack_id=f'USEARCH{i:06d}', username=f'search{i}') for i in range(user_count)
+    )
+    rng = random.Random(0)
+    start = timezone.now() - timedelta(days=365)
+    rows = (
+        Feedback(
+            slack_message_id=f'search.{i:09d}',
+            user=rng.choice(users),
+            sender=rng.choice(users),
+            message=' '.join(rng.choices(WORDS, k=12)),
+            timestamp=start + timedelta(seconds=i * 30),
+        )
+        for i in range(feedback_count)
+    )
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        Feedback.objects.bulk_create(batch)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE feedback_feedback')
+
+
+def timed_ms(run):
+    started = time.perf_counter()
+    result = run()
+    return result, (time.perf_counter() - started) * 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the first page of indexed full-text search against an unindexed substring scan "
+        "over a seeded dataset. The seed data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feedback', type=int, default=1000000, help="Feedback rows to seed")
+        parser.add_argument('--users', type=int, default=200, help="Slack users to seed")
+        parser.add_argument('--batch-size', type=int, default=10000, help="Rows per bulk insert")
+        parser.add_argument('--skip-scan', action='store_true', help="Skip the unindexed message__icontains runs")
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            _, seed_ms = timed_ms(lambda: seed_messages(kwargs['feedback'], kwargs['users'], kwargs['batch_size']))
+            self.stdout.write(f"Seeded {kwargs['feedback']} messages in {seed_ms / 1000:.1f}s ({connection.vendor})")
+
+            for label, q in QUERIES:
+                page_qs = apply_rank_cursor(search_queryset(q), None).values('id', 'rank')[:SEARCH_PAGE_SIZE + 1]
+                rows, page_ms = timed_ms(lambda: list(page_qs))
+                matches, count_ms = timed_ms(search_queryset(q).count)
+                line = (
+                    f"{label} ({q!r}): first page of {min(len(rows), SEARCH_PAGE_SIZE)} in {page_ms:.1f}ms, "
+                    f"{matches} matches counted in {count_ms:.1f}ms"
+                )
+                if not kwargs['skip_scan']:
+                    scan_qs = Feedback.objects.all()
+                    for term in q.split():
+                        scan_qs = scan_qs.filter(message__icontains=term)
+                    scanned, scan_ms = timed_ms(lambda: scan_qs.count())
+                    line += f", substring scan {scanned} matches in {scan_ms:.1f}ms"
+                self.stdout.write(line)
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS("Done"))
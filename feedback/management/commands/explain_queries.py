@@ -0,0 +1,111 @@
+import random
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from feedback.models import Feedback, Reaction, SlackUser, TaggedUser
+from feedback.pagination import apply_cursor, encode_cursor
+from feedback.views import MENTION_ORDER, MENTIONS_PAGE_SIZE, get_mentions_queryset
+
+HOT_TABLES = ('feedback_feedback', 'feedback_reaction', 'feedback_taggeduser')
+SEED_MESSAGE_PREFIX = 'explain.'  # slack_message_id prefix of the rows seed() inserts
+
+# A full scan of a hot table, as printed by PostgreSQL and SQLite respectively
+FULL_SCAN_RES = [
+    re.compile(r'Seq Scan on (%s)\b' % '|'.join(HOT_TABLES)),
+    re.compile(r'\bSCAN (%s)\b(?! USING)' % '|'.join(HOT_TABLES)),
+]
+
+
+def seed(feedback_count, user_count):
+    """Bulk-inserts a synthetic mention graph. Returns the most-tagged user."""
+    users = SlackUser.objects.bulk_create(
+        SlackUser(slack_id=f'UEXPLAIN{i:06d}', username=f'explain{i}') for i in range(user_count)
+    )
+    rng = random.Random(0)
+    start = timezone.now() - timedelta(days=365)
+    feedbacks = Feedback.objects.bulk_create(
+        Feedback(
+            slack_message_id=f'{SEED_MESSAGE_PREFIX}{i:09d}',
+            user=rng.choice(users),
+            sender=rng.choice(users),
+            message=f'explain plan row {i}',
+            timestamp=start + timedelta(seconds=i * 30),
+        )
+        for i in range(feedback_count)
+    )
+    # Skew the mentions so one user is tagged in a large share of the history
+    tagged = []
+    for feedback in feedbacks:
+        for user in {users[0] if rng.random() < 0.3 else rng.choice(users), rng.choice(users)}:
+            tagged.append(TaggedUser(
+                feedback=feedback, feedback_timestamp=feedback.timestamp, user=user, username_mentioned=user.username,
+            ))
+    TaggedUser.objects.bulk_create(tagged, batch_size=5000)
+    Reaction.objects.bulk_create(
+        (Reaction(feedback=feedback, reaction=rng.choice(['tada', '+1', 'heart'])) for feedback in feedbacks for _ in range(2)),
+        batch_size=5000,
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE %s' % ', '.join(HOT_TABLES))
+    return users[0]
+
+
+def hot_queries(slack_user):
+    """The (name, queryset) pairs whose plans are checked, mirroring what the views and event handlers run."""
+    mentions = get_mentions_queryset(slack_user)
+    deep_mention = mentions.order_by('-timestamp', '-id')[MENTIONS_PAGE_SIZE]
+    deep_feedback = Feedback.objects.order_by('-timestamp', '-id')[MENTIONS_PAGE_SIZE]
+    any_reaction = Reaction.objects.order_by('-id').first()
+    return [
+        ('get_mentions first page', apply_cursor(mentions, None, MENTION_ORDER)[:MENTIONS_PAGE_SIZE + 1]),
+        ('get_mentions deep page', apply_cursor(mentions, encode_cursor(deep_mention), MENTION_ORDER)[:MENTIONS_PAGE_SIZE + 1]),
+        ('feedback list deep page', apply_cursor(Feedback.objects.all(), encode_cursor(deep_feedback))[:51]),
+        ('reaction_removed lookup', Reaction.objects.filter(
+            feedback_id=any_reaction.feedback_id, reaction=any_reaction.reaction,
+        ).order_by('id')[:1]),
+    ]
+
+
+def full_scans(plan):
+    return sorted({match.group(1) for pattern in FULL_SCAN_RES for match in pattern.finditer(plan)})
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAIN the hot mention and timeline queries against a seeded dataset. "
+        "The seed data is inserted in a transaction that is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--feedback', type=int, default=20000, help="Feedback rows to seed")
+        parser.add_argument('--users', type=int, default=200, help="Slack users to seed")
+        parser.add_argument('--analyze', action='store_true', help="Run EXPLAIN ANALYZE (PostgreSQL only)")
+        parser.add_argument('--check', action='store_true', help="Fail if any query does a full scan of a hot table")
+
+    def handle(self, *args, **kwargs):
+        explain_options = {'analyze': True} if kwargs['analyze'] and connection.vendor == 'postgresql' else {}
+        regressions = []
+
+        with transaction.atomic():
+            slack_user = seed(kwargs['feedback'], kwargs['users'])
+            for name, queryset in hot_queries(slack_user):
+                plan = queryset.explain(**explain_options)
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(plan)
+                self.stdout.write('')
+                scanned = full_scans(plan)
+                if scanned:
+                    regressions.append(f"{name}: full scan of {', '.join(scanned)}")
+            transaction.set_rollback(True)
+
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if regressions and kwargs['check']:
+            raise CommandError(f"{len(regressions)} queries fell back to a full table scan")
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("All hot queries use an index"))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from feedback.export import EXPORT_FORMATS, export_queryset, iter_export
+from feedback.models import SlackUser
+from feedback.summaries import parse_time_bound
+
+
+class Command(BaseCommand):
+    help = "Stream feedback with sender, recipient, reactions and tagged users as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='ndjson')
+        parser.add_argument('--output', help="File to write to instead of stdout")
+        parser.add_argument('--user-id', help="Only feedback tagging this Slack user")
+        parser.add_argument('--since', help="ISO 8601 datetime of the oldest feedback to export")
+        parser.add_argument('--until', help="ISO 8601 datetime the exported feedback is older than")
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help="Rows fetched from the server-side cursor at a time",
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            since = parse_time_bound(kwargs['since'], '--since')
+            until = parse_time_bound(kwargs['until'], '--until')
+            slack_user = SlackUser.objects.get(slack_id=kwargs['user_id']) if kwargs['user_id'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        except SlackUser.DoesNotExist:
+            raise CommandError(f"Unknown Slack user {kwargs['user_id']}")
+
+        lines = iter_export(kwargs['format'], export_queryset(slack_user, since, until), kwargs['chunk_size'])
+        rows = -1 if kwargs['format'] == 'csv' else 0  # The CSV header is not a row
+        if kwargs['output']:
+            with open(kwargs['output'], 'w', newline='', encoding='utf-8') as out:
+                for line in lines:
+                    out.write(line)
+                    rows += 1
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} feedback rows to {kwargs['output']}"))
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
+                rows += 1
+            # stdout carries the export itself
+            self.stderr.write(f"Exported {rows} feedback rows", style_func=self.style.SUCCESS)
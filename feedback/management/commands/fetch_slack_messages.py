@@ -1,159 +1,284 @@
 from django.core.management.base import BaseCommand
-import re
-from feedback.models import SlackUser, Feedback, Reaction, TaggedUser
+import time
+from concurrent.futures import ThreadPoolExecutor
+from feedback import outbound, slack_api
+from feedback.models import ChannelSyncState, SlackUser, Feedback, Reaction, TaggedUser
+from feedback.rendering import MENTION_RE, render_message
+from feedback.slack_directory import directory
+from feedback.invalidation import feedback_changed, usernames_changed
+from feedback.stats import record_ingested
 from django.utils import timezone
 from django.conf import settings
-import requests
-from django.db import IntegrityError  # Add the missing import
+from django.db import transaction
+from slack_sdk.errors import SlackApiError
 
-# Slack API URL
-SLACK_API_URL = 'https://slack.com/api/conversations.history'
-SLACK_TOKEN = settings.SLACK_BOT_TOKEN
-CHANNEL_ID = 'C011BRATXHA'
+CHANNEL_ID = 'C011BRATXHA'  # Used when neither --channels nor SLACK_CHANNEL_ID is set
 
+DEFAULT_BATCH_SIZE = 100
 
-def fetch_historical_data():
-    headers = {
-        'Authorization': f'Bearer {SLACK_TOKEN}'
-    }
+
+def get_channel_ids(channels=None):
+    """Channels named on the command line, else the comma-separated SLACK_CHANNEL_ID setting."""
+    value = channels or settings.SLACK_CHANNEL_ID or CHANNEL_ID
+    return [channel.strip() for channel in value.split(',') if channel.strip()]
+
+
+def fetch_historical_data(channels=None, batch_size=DEFAULT_BATCH_SIZE, workers=1, full=False):
+    """
+    Syncs every channel one page at a time, storing each page in a single
+    transaction. With workers > 1 the per-message Slack calls of a page are
+    fanned out over a thread pool while this thread does all the database
+    writes. Returns a dict with row counts and elapsed time.
+    """
+    stats = {'pages': 0, 'users': 0, 'feedback': 0, 'tagged_users': 0, 'reactions': 0, 'skipped': 0}
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        for channel_id in get_channel_ids(channels):
+            sync_channel(channel_id, stats, batch_size=batch_size, executor=executor, full=full)
+    finally:
+        if executor:
+            executor.shutdown()
+
+    stats['elapsed'] = time.monotonic() - started
+    return stats
+
+
+def sync_channel(channel_id, stats, batch_size=DEFAULT_BATCH_SIZE, executor=None, full=False):
+    """
+    Fetches the messages of channel_id newer than its checkpoint. The cursor
+    is saved after every stored page, so a crashed run resumes where it
+    stopped; the checkpoint itself only moves once the run reaches the end.
+    An error page from Slack raises SlackApiError before anything is saved.
+    """
+    state, _ = ChannelSyncState.objects.get_or_create(channel_id=channel_id)
+    if full:
+        state.last_ts = state.cursor = state.run_oldest_ts = state.run_newest_ts = ''
+    elif state.cursor:
+        print(f"Resuming {channel_id} from saved cursor")
+    else:
+        state.run_oldest_ts = state.last_ts
+        state.run_newest_ts = ''
 
     params = {
-        'channel': CHANNEL_ID,
-        'limit': 100,
+        'channel': channel_id,
+        'limit': batch_size,
     }
-    
+    if state.run_oldest_ts:
+        params['oldest'] = state.run_oldest_ts
+
     while True:
-        response = requests.get(SLACK_API_URL, headers=headers, params=params)
-        data = response.json()
-        print("Slack API Response:", data)
+        if state.cursor:
+            params['cursor'] = state.cursor
+        data = slack_api.call('conversations.history', params)
+        if not data.get('ok'):
+            # Leave the saved cursor and checkpoint alone so the next run retries this page
+            raise SlackApiError(f"conversations.history failed for {channel_id}: {data.get('error')}", data)
 
         messages = data.get('messages', [])
         if not messages:
-            print("No more messages to fetch.")
+            print(f"No more messages to fetch from {channel_id}.")
             break
 
-        for message in messages:
-            slack_message_id = message.get('ts')
-            message_text = message.get('text')
-            slack_user_id = message.get('user')
-            
-            if not slack_user_id:
-                print(f"Skipping message {slack_message_id} due to missing user ID.")
-                continue  
-
-            timestamp = timezone.make_aware(timezone.datetime.fromtimestamp(float(slack_message_id)))
-
-            if Feedback.objects.filter(slack_message_id=slack_message_id).exists():
-                print(f"Message with ID {slack_message_id} already exists in the database. Skipping.")
-                continue  
-
-            # Get user info to store username
-            user_info = fetch_user_info(slack_user_id)
-            username = user_info.get('user', {}).get('name', '')
-            
-            slack_user, created = SlackUser.objects.get_or_create(
-                slack_id=slack_user_id,
-                defaults={'username': username}
-            )
-            
-            # Update username if it's empty but we have it now
-            if not slack_user.username and username:
-                slack_user.username = username
-                slack_user.save()
-            
-            feedback_message = Feedback.objects.create(
-                slack_message_id=slack_message_id,
-                message=message_text,
-                timestamp=timestamp,
-                user=slack_user,
-                sender=slack_user,
-                source='slack',  # Set the source explicitly
+        page_stats = store_message_page(messages, channel_id, executor)
+        stats['pages'] += 1
+        for key, value in page_stats.items():
+            stats[key] += value
+        print(f"{channel_id} page {stats['pages']}: stored {page_stats['feedback']} new messages, skipped {page_stats['skipped']}")
+
+        # Checkpoint the page before moving on
+        state.run_newest_ts = max([state.run_newest_ts] + [m['ts'] for m in messages], key=lambda ts: float(ts or 0))
+        state.cursor = data.get('response_metadata', {}).get('next_cursor', '')
+        state.save()
+        if not state.cursor:
+            break
+
+    state.last_ts = state.run_newest_ts or state.last_ts
+    state.cursor = state.run_oldest_ts = state.run_newest_ts = ''
+    state.save()
+
+
+def store_message_page(messages, channel_id, executor=None):
+    """
+    Stores one page of conversations.history messages using a fixed number of
+    queries: one lookup for already-ingested messages, one user upsert and one
+    bulk insert each for feedback, tagged users and reactions.
+    """
+    stats = {'users': 0, 'feedback': 0, 'tagged_users': 0, 'reactions': 0, 'skipped': 0}
+
+    candidates = []
+    for message in messages:
+        if not message.get('user'):
+            print(f"Skipping message {message.get('ts')} due to missing user ID.")
+            stats['skipped'] += 1
+            continue
+        candidates.append(message)
+
+    existing_ids = set(
+        Feedback.objects.filter(slack_message_id__in=[m['ts'] for m in candidates])
+        .values_list('slack_message_id', flat=True)
+    )
+    new_messages = [m for m in candidates if m['ts'] not in existing_ids]
+    stats['skipped'] += len(candidates) - len(new_messages)
+    if not new_messages:
+        return stats
+
+    # Resolve every user referenced on the page (senders and mentions) once
+    mentions_by_ts = {m['ts']: list(dict.fromkeys(MENTION_RE.findall(m.get('text') or ''))) for m in new_messages}
+    user_ids = set(m['user'] for m in new_messages)
+    for mentioned in mentions_by_ts.values():
+        user_ids.update(mentioned)
+    usernames = directory.get_usernames(user_ids, executor=executor)
+
+    # Reactions are fetched before the transaction so no Slack call holds it open
+    message_ids = [m['ts'] for m in new_messages]
+    channel_ids = [channel_id] * len(message_ids)
+    fetched = (executor.map if executor else map)(fetch_reactions_for_message, message_ids, channel_ids)
+    reactions_by_ts = dict(zip(message_ids, fetched))
+
+    with transaction.atomic():
+        stats['users'] = upsert_slack_users(usernames)
+        users = {u.slack_id: u for u in SlackUser.objects.filter(slack_id__in=user_ids)}
+        names = {slack_id: user.username for slack_id, user in users.items()}
+
+        feedback_rows = Feedback.objects.bulk_create([
+            Feedback(
+                slack_message_id=message['ts'],
+                message=message.get('text'),
+                rendered_message=render_message(message.get('text'), names),
+                timestamp=timezone.make_aware(timezone.datetime.fromtimestamp(float(message['ts']))),
+                user=users[message['user']],
+                sender=users[message['user']],
+                source='slack',
             )
+            for message in new_messages
+        ])
+        stats['feedback'] = len(feedback_rows)
 
-            print(f"Created new Feedback: {feedback_message.message} (ID: {feedback_message.id})")
-
-            # Extract and Store Tagged Users
-            user_mentions = re.findall(r'<@([A-Z0-9]+)>', message_text)
-            for mentioned_user_id in user_mentions:
-                # Get user info to store username
-                mentioned_user_info = fetch_user_info(mentioned_user_id)
-                mentioned_username = mentioned_user_info.get('user', {}).get('name', '')
-                
-                mentioned_user, _ = SlackUser.objects.get_or_create(
-                    slack_id=mentioned_user_id,
-                    defaults={'username': mentioned_username}
-                )
-                
-                # Update username if it's empty but we have it now
-                if not mentioned_user.username and mentioned_username:
-                    mentioned_user.username = mentioned_username
-                    mentioned_user.save()
-                
-                TaggedUser.objects.get_or_create(
-                    feedback=feedback_message,
+        tagged_rows = []
+        reaction_rows = []
+        for feedback in feedback_rows:
+            for mentioned_user_id in mentions_by_ts[feedback.slack_message_id]:
+                mentioned_user = users[mentioned_user_id]
+                tagged_rows.append(TaggedUser(
+                    feedback=feedback,
+                    feedback_timestamp=feedback.timestamp,
                     user=mentioned_user,
-                    username_mentioned=mentioned_username or mentioned_user.username,
-                    slack_id_mentioned=mentioned_user_id
-                )
-                print(f"Stored mention of user {mentioned_user.username} ({mentioned_user.slack_id}) in Feedback ID {feedback_message.id}")
-
-            # Fetch and Store Reactions
-            reactions = fetch_reactions_for_message(slack_message_id)
-            for reaction in reactions:
-                reaction_name = reaction['name']
-                
-                try:
-                    # Simply store the reaction name
-                    Reaction.objects.get_or_create(
-                        feedback=feedback_message,
-                        reaction=reaction_name
-                    )
-                    print(f"Stored reaction {reaction_name}")
-                except Exception as e:
-                    print(f"Error storing reaction {reaction_name}: {str(e)}")
-
-        # Handle pagination
-        next_cursor = data.get('response_metadata', {}).get('next_cursor', '')
-        if not next_cursor:
-            break
-        params['cursor'] = next_cursor
+                    username_mentioned=usernames[mentioned_user_id] or mentioned_user.username,
+                    slack_id_mentioned=mentioned_user_id,
+                ))
+            reaction_names = dict.fromkeys(r['name'] for r in reactions_by_ts[feedback.slack_message_id])
+            reaction_rows.extend(Reaction(feedback=feedback, reaction=name) for name in reaction_names)
 
+        stats['tagged_users'] = len(TaggedUser.objects.bulk_create(tagged_rows))
+        stats['reactions'] = len(Reaction.objects.bulk_create(reaction_rows))
+        record_ingested(tagged_rows, reaction_rows)
+        feedback_changed(feedback_ids=[feedback.id for feedback in feedback_rows])
 
-def fetch_user_info(user_id):
-    """Fetch user information from Slack API"""
-    user_info_url = 'https://slack.com/api/users.info'
-    headers = {
-        'Authorization': f'Bearer {SLACK_TOKEN}'
-    }
-    params = {
-        'user': user_id
-    }
+    return stats
 
-    response = requests.get(user_info_url, headers=headers, params=params)
-    return response.json()
 
+def upsert_slack_users(usernames):
+    """
+    Inserts missing SlackUser rows and fills in usernames Slack returned.
+    Users whose username came back empty never overwrite an existing one.
+    Renamed users go through invalidation.usernames_changed, like a
+    SlackUser save, since the bulk upsert sends no signals.
+    """
+    now = timezone.now()
+    known = [
+        SlackUser(slack_id=slack_id, username=name, username_checked_at=now) for slack_id, name in usernames.items() if name
+    ]
+    unknown = [SlackUser(slack_id=slack_id, username='') for slack_id, name in usernames.items() if not name]
+    previous = dict(
+        SlackUser.objects.filter(slack_id__in=[user.slack_id for user in known]).values_list('slack_id', 'username')
+    )
 
-def fetch_reactions_for_message(slack_message_id):
-    reaction_url = 'https://slack.com/api/reactions.get'
-    headers = {
-        'Authorization': f'Bearer {SLACK_TOKEN}'
-    }
+    if known:
+        SlackUser.objects.bulk_create(
+            known,
+            update_conflicts=True,
+            unique_fields=['slack_id'],
+            update_fields=['username'],
+        )
+    if unknown:
+        SlackUser.objects.bulk_create(unknown, ignore_conflicts=True)
+
+    renamed = [user.slack_id for user in known if user.slack_id in previous and previous[user.slack_id] != user.username]
+    if renamed:
+        # A name that differs from the stored one can only have come from Slack
+        SlackUser.objects.filter(slack_id__in=renamed).update(username_checked_at=now)
+    usernames_changed(renamed)
+    return len(known) + len(unknown)
+
+
+def fetch_reactions_for_message(slack_message_id, channel_id=CHANNEL_ID):
     params = {
-        'channel': CHANNEL_ID,
+        'channel': channel_id,
         'timestamp': slack_message_id
     }
-
-    response = requests.get(reaction_url, headers=headers, params=params)
-    return response.json().get('message', {}).get('reactions', [])
+    return slack_api.call('reactions.get', params).get('message', {}).get('reactions', [])
 
 
 class Command(BaseCommand):
     help = "Fetch and store Slack messages and reactions"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--channels',
+            help="Comma-separated channel IDs to sync (defaults to the SLACK_CHANNEL_ID setting)",
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Ignore saved checkpoints and walk each channel's whole history",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help="Messages requested per conversations.history page and written per transaction",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help="Threads used for reactions.get and users.info calls; database writes stay on one thread",
+        )
+        parser.add_argument(
+            '--warm-directory',
+            action='store_true',
+            help="Preload the Slack user directory with one users.list sweep before fetching",
+        )
+
     def handle(self, *args, **kwargs):
         self.stdout.write("Fetching messages from Slack...")
         try:
-            fetch_historical_data()  # Call the service
+            if kwargs['warm_directory']:
+                loaded = directory.warm()
+                self.stdout.write(f"Loaded {loaded} users into the directory")
+            stats = fetch_historical_data(
+                channels=kwargs['channels'],
+                batch_size=kwargs['batch_size'],
+                workers=kwargs['workers'],
+                full=kwargs['full'],
+            )
+            rows = stats['users'] + stats['feedback'] + stats['tagged_users'] + stats['reactions']
+            rate = rows / stats['elapsed'] if stats['elapsed'] else 0
+            self.stdout.write(
+                f"{stats['pages']} pages, {stats['feedback']} messages, {stats['tagged_users']} mentions, "
+                f"{stats['reactions']} reactions, {stats['users']} users upserted, {stats['skipped']} skipped "
+                f"in {stats['elapsed']:.1f}s ({rate:.0f} rows/s)"
+            )
+            lookups = directory.stats()
+            self.stdout.write(
+                f"User directory: {lookups['hits']} hits, {lookups['misses']} misses, "
+                f"{lookups['api_calls']} Slack API calls"
+            )
+            for endpoint, latency in outbound.latency_report().items():
+                average = latency['sum'] / latency['count'] if latency['count'] else 0
+                self.stdout.write(f"{endpoint}: {latency['count']} calls, {average * 1000:.0f}ms avg, buckets {latency['buckets']}")
             self.stdout.write(self.style.SUCCESS("Messages and reactions fetched successfully"))
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error: {str(e)}"))
@@ -0,0 +1,80 @@
+import asyncio
+import json
+import time
+
+import httpx
+from django.core.management.base import BaseCommand
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(url, method, body, total, concurrency, timeout):
+    """Sends total requests with at most concurrency in flight. Returns (latencies, errors, elapsed)."""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one_request():
+            nonlocal errors
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    response = await client.request(method, url, json=body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.monotonic() - started)
+
+        started = time.monotonic()
+        await asyncio.gather(*(one_request() for _ in range(total)))
+        elapsed = time.monotonic() - started
+
+    return sorted(latencies), errors, elapsed
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test an endpoint of a running deployment. Run it against the WSGI "
+        "deployment (e.g. gunicorn slack_feedback.wsgi) and the ASGI one "
+        "(e.g. ASYNC_VIEWS=true uvicorn slack_feedback.asgi:application) with the "
+        "same arguments to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help="Full URL, e.g. http://localhost:8000/api/get-mentions/?user_id=U123")
+        parser.add_argument('--method', default='GET')
+        parser.add_argument('--data', help="JSON body sent with every request")
+        parser.add_argument('--requests', type=int, default=200, help="Total requests to send")
+        parser.add_argument('--concurrency', type=int, default=50, help="Requests in flight at once")
+        parser.add_argument('--timeout', type=float, default=60.0)
+        parser.add_argument('--label', default='', help="Name printed with the results, e.g. wsgi or asgi")
+
+    def handle(self, *args, **kwargs):
+        body = json.loads(kwargs['data']) if kwargs['data'] else None
+        latencies, errors, elapsed = asyncio.run(run_load(
+            kwargs['url'],
+            kwargs['method'].upper(),
+            body,
+            kwargs['requests'],
+            kwargs['concurrency'],
+            kwargs['timeout'],
+        ))
+
+        label = f"[{kwargs['label']}] " if kwargs['label'] else ''
+        self.stdout.write(
+            f"{label}{len(latencies)} requests, {errors} errors, concurrency {kwargs['concurrency']}, "
+            f"{len(latencies) / elapsed:.1f} req/s over {elapsed:.2f}s"
+        )
+        self.stdout.write(
+            f"{label}latency p50 {percentile(latencies, 0.5) * 1000:.0f}ms, "
+            f"p90 {percentile(latencies, 0.9) * 1000:.0f}ms, "
+            f"p99 {percentile(latencies, 0.99) * 1000:.0f}ms, "
+            f"max {percentile(latencies, 1) * 1000:.0f}ms"
+        )
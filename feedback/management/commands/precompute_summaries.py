@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.summary_jobs import process_summary_jobs, schedule_summary_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Regenerate the AI summaries of users whose feedback changed since their last summary. "
+        "Run it off-peak, e.g. nightly from cron, or with --loop as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help="Jobs claimed per round",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help="Summaries generated concurrently",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for pending jobs instead of exiting when none are left",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help="Seconds to wait before polling again in --loop mode",
+        )
+
+    def handle(self, *args, **kwargs):
+        scheduled = schedule_summary_jobs()
+        if scheduled:
+            self.stdout.write(f"Scheduled {scheduled} new users")
+
+        totals = {'jobs': 0, 'failed': 0}
+        try:
+            while True:
+                stats = process_summary_jobs(batch_size=kwargs['batch_size'], workers=kwargs['workers'])
+                totals['jobs'] += stats['jobs']
+                totals['failed'] += stats['failed']
+                if stats['jobs']:
+                    self.stdout.write(f"Generated {stats['jobs']} summaries in {stats['elapsed']:.1f}s")
+                    continue
+                if not kwargs['loop']:
+                    break
+                time.sleep(kwargs['interval'])
+                schedule_summary_jobs()
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Precomputed {totals['jobs']} summaries, {totals['failed']} failed"))
@@ -0,0 +1,64 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.events import process_queued_events
+
+
+class Command(BaseCommand):
+    help = "Apply Slack events queued by the event listener"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help="Events claimed and applied per transaction",
+        )
+        parser.add_argument(
+            '--window',
+            type=float,
+            default=0.2,
+            help="Seconds to let events accumulate after a partial batch so bursts are coalesced",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help="Seconds to wait before polling again when the queue is empty",
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help="Drain the queue and exit instead of polling forever",
+        )
+
+    def handle(self, *args, **kwargs):
+        totals = {'batches': 0, 'events': 0, 'reaction_events': 0, 'reactions_created': 0,
+                  'reactions_deleted': 0, 'failed': 0, 'elapsed': 0.0, 'largest_batch': 0}
+        try:
+            while True:
+                stats = process_queued_events(batch_size=kwargs['batch_size'])
+                if stats['events']:
+                    totals['batches'] += 1
+                    totals['largest_batch'] = max(totals['largest_batch'], stats['events'])
+                    for key in ('events', 'reaction_events', 'reactions_created', 'reactions_deleted', 'failed', 'elapsed'):
+                        totals[key] += stats[key]
+
+                if stats['events'] == kwargs['batch_size']:
+                    continue
+                if kwargs['once'] and not stats['events']:
+                    break
+                time.sleep(kwargs['window'] if stats['events'] else kwargs['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        batches = totals['batches'] or 1
+        rate = totals['events'] / totals['elapsed'] if totals['elapsed'] else 0
+        self.stdout.write(
+            f"{totals['batches']} batches, {totals['events']} events "
+            f"(avg batch {totals['events'] / batches:.1f}, largest {totals['largest_batch']}), "
+            f"{totals['reaction_events']} reaction events netted to +{totals['reactions_created']}"
+            f"/-{totals['reactions_deleted']} rows, {totals['failed']} failed, {rate:.0f} events/s"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Processed {totals['events']} events"))
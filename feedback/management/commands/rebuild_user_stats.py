@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from feedback.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user feedback statistics from scratch"
+
+    def handle(self, *args, **kwargs):
+        rows = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} user stat counters"))
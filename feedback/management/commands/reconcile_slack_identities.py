@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.identities import reconcile_identities
+
+
+class Command(BaseCommand):
+    help = (
+        "Resolve logins that still have a temporary Slack ID by looking their email up in Slack. "
+        "Run it from cron, or with --loop as a long-running worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help="Identities looked up per round",
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help="Keep polling for unresolved identities instead of exiting when none are due",
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60.0,
+            help="Seconds to wait before polling again in --loop mode",
+        )
+
+    def handle(self, *args, **kwargs):
+        totals = {'resolved': 0, 'not_found': 0, 'failed': 0}
+        try:
+            while True:
+                stats = reconcile_identities(batch_size=kwargs['batch_size'])
+                for key in totals:
+                    totals[key] += stats[key]
+                if stats['checked']:
+                    self.stdout.write(f"Checked {stats['checked']} identities, resolved {stats['resolved']}")
+                    continue
+                if not kwargs['loop']:
+                    break
+                time.sleep(kwargs['interval'])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Resolved {totals['resolved']} identities, {totals['not_found']} not found in Slack, {totals['failed']} failed"
+        ))
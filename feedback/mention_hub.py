@@ -0,0 +1,220 @@
+"""
+Fan-out of new mentions and reactions to open /api/mentions/stream/
+connections. The event handlers call publish_mentions() with
+(slack_id, delta) pairs and every subscription of those users receives
+the delta once the transaction commits. LocalHub only reaches connections
+of the same process; with MENTION_HUB_URL set, RedisHub relays deltas over
+Redis pub/sub so that every worker process sees them.
+"""
+import asyncio
+import json
+import queue
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .rendering import MENTION_RE
+from .summaries import sse_event
+
+# Deltas a connection may fall behind by before it is told to resync instead
+SUBSCRIPTION_BUFFER = 100
+RESYNC = {'type': 'resync'}
+REDIS_CHANNEL = 'feedback:mentions'
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+class Subscription:
+    """
+    The deltas of one connection. Sync views block on get(); async views
+    subscribe with their event loop and await aget(), which holds no thread.
+    """
+
+    def __init__(self, hub, slack_id, loop=None):
+        self.hub = hub
+        self.slack_id = slack_id
+        self.loop = loop
+        self.queue = asyncio.Queue(SUBSCRIPTION_BUFFER) if loop else queue.Queue(SUBSCRIPTION_BUFFER)
+
+    def deliver(self, delta):
+        if self.loop is None:
+            self._put(delta)
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._put, delta)
+        except RuntimeError:
+            # The connection's event loop is gone; close() will follow
+            pass
+
+    def _put(self, delta):
+        if self.queue.full():
+            # A reader that fell behind gets one resync rather than an unbounded backlog
+            self._drain()
+            delta = RESYNC
+        self.queue.put_nowait(delta)
+
+    def _drain(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except (queue.Empty, asyncio.QueueEmpty):
+                return
+
+    def get(self, timeout):
+        """The next delta, or None after timeout seconds without one."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    async def aget(self, timeout):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalHub:
+    """In-process hub: deltas reach the subscriptions of the publishing process only."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)  # slack_id -> {Subscription}
+        self._lock = threading.Lock()
+
+    def subscribe(self, slack_id, loop=None):
+        subscription = Subscription(self, slack_id, loop)
+        with self._lock:
+            self._subscriptions[slack_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.slack_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.slack_id]
+
+    def publish(self, deltas):
+        """Delivers each (slack_id, delta) pair to that user's subscriptions."""
+        with self._lock:
+            for slack_id, delta in deltas:
+                for subscription in self._subscriptions.get(slack_id, ()):
+                    subscription.deliver(delta)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+class RedisHub(LocalHub):
+    """
+    Publishes deltas to a Redis channel; one listener thread per process
+    relays the channel to that process's subscriptions.
+    """
+
+    def __init__(self, url):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as e:
+            raise ImproperlyConfigured("MENTION_HUB_URL requires the redis package") from e
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def subscribe(self, slack_id, loop=None):
+        with self._lock:
+            if self._listener is None:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(**{REDIS_CHANNEL: self._relay})
+                self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+        return super().subscribe(slack_id, loop)
+
+    def publish(self, deltas):
+        self._redis.publish(REDIS_CHANNEL, json.dumps(list(deltas)))
+
+    def _relay(self, message):
+        super().publish(json.loads(message['data']))
+
+
+def get_hub():
+    """The process-wide hub, chosen by MENTION_HUB_URL on first use."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = RedisHub(settings.MENTION_HUB_URL) if settings.MENTION_HUB_URL else LocalHub()
+        return _hub
+
+
+def check_hub_settings(app_configs, **kwargs):
+    """
+    System check: queued Slack events are applied by manage.py
+    process_slack_events, a separate process whose LocalHub reaches no
+    stream connections, so queueing needs MENTION_HUB_URL.
+    """
+    if settings.SLACK_EVENTS_QUEUED and not settings.MENTION_HUB_URL:
+        return [checks.Warning(
+            "SLACK_EVENTS_QUEUED is on without MENTION_HUB_URL: mentions applied by "
+            "process_slack_events will not reach /api/mentions/stream/ connections.",
+            hint="Set MENTION_HUB_URL to a redis:// URL shared by the web and worker processes.",
+            id='feedback.W001',
+        )]
+    return []
+
+
+def mentioned_ids(message):
+    return set(MENTION_RE.findall(message or ''))
+
+
+def mention_delta(feedback, sender):
+    return {
+        'type': 'mention',
+        'slack_message_id': feedback.slack_message_id,
+        'sender': {'slack_id': sender.slack_id, 'username': sender.username},
+        'message': feedback.rendered_message or feedback.message,
+        'timestamp': feedback.timestamp.isoformat(),
+    }
+
+
+def reaction_delta(slack_message_id, reaction, count):
+    """count is the net number of reactions added (negative when removed)."""
+    return {'type': 'reaction', 'slack_message_id': slack_message_id, 'reaction': reaction, 'count': count}
+
+
+def publish_mentions(deltas):
+    """Publishes (slack_id, delta) pairs once the current transaction commits."""
+    deltas = list(deltas)
+    if deltas:
+        transaction.on_commit(lambda: get_hub().publish(deltas), robust=True)
+
+
+def mention_events(subscription, keepalive):
+    """
+    Yields the server-sent events of a subscription: 'ready', then one
+    event per delta, with a comment every keepalive seconds of silence.
+    """
+    try:
+        yield sse_event('ready', {'user_id': subscription.slack_id})
+        while True:
+            delta = subscription.get(keepalive)
+            yield ': keepalive\n\n' if delta is None else sse_event(delta['type'], delta)
+    finally:
+        subscription.close()
+
+
+async def amention_events(subscription, keepalive):
+    try:
+        yield sse_event('ready', {'user_id': subscription.slack_id})
+        while True:
+            delta = await subscription.aget(keepalive)
+            yield ': keepalive\n\n' if delta is None else sse_event(delta['type'], delta)
+    finally:
+        subscription.close()
@@ -0,0 +1,250 @@
+"""
+Request-level performance metrics. RequestMetricsMiddleware times every
+request and attributes to it, through a context variable, the database
+queries it ran (seen by an execute wrapper installed on each connection)
+and the Slack and OpenAI calls recorded by outbound.timed. The results are
+kept as per-view histograms that the /metrics view renders in the
+Prometheus text format, and requests slower than SLOW_REQUEST_MS are
+logged with their slowest SQL statements.
+
+Streaming responses are measured up to the point the response is returned,
+not until the last event is sent, and their size is not recorded. Work
+handed to thread pools is not attributed to the request.
+"""
+import heapq
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+CALL_BUCKETS = (0, 1, 2, 5, 10, 25, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+OUTBOUND_SERVICES = ('slack', 'openai')
+SLOW_LOG_QUERIES = 5  # Slowest statements included in a slow-request log line
+
+# name -> (help text, buckets)
+HISTOGRAMS = {
+    'feedback_request_duration_seconds': ("Wall time of requests", DURATION_BUCKETS),
+    'feedback_request_db_queries': ("Database queries per request", QUERY_BUCKETS),
+    'feedback_request_db_duration_seconds': ("Time per request spent in database queries", DURATION_BUCKETS),
+    'feedback_request_outbound_calls': ("Outbound API calls per request", CALL_BUCKETS),
+    'feedback_request_outbound_duration_seconds': ("Time per request spent in outbound API calls", DURATION_BUCKETS),
+    'feedback_response_size_bytes': ("Body size of non-streaming responses", SIZE_BUCKETS),
+    'feedback_summary_stream_seconds': ("Time from the start of a streamed summary to each stage", DURATION_BUCKETS),
+}
+
+_lock = threading.Lock()
+_series = {name: {} for name in HISTOGRAMS}  # name -> {labels: Histogram}
+_requests = {}  # labels -> count
+_current = ContextVar('feedback_request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+
+    def cumulative(self):
+        """(le, cumulative count) pairs, ending with +Inf."""
+        running = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            running += count
+            yield str(bound), running
+
+
+class RequestStats:
+    """What one request spent on the database and outbound APIs."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []  # min-heap of (seconds, sql), at most SLOW_LOG_QUERIES long
+        self.outbound = {service: [0, 0.0] for service in OUTBOUND_SERVICES}  # service -> [calls, seconds]
+        self._lock = threading.Lock()
+
+    def add_query(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_time += seconds
+            if len(self.slowest) < SLOW_LOG_QUERIES:
+                heapq.heappush(self.slowest, (seconds, sql))
+            else:
+                heapq.heappushpop(self.slowest, (seconds, sql))
+
+    def add_outbound(self, service, seconds):
+        with self._lock:
+            self.outbound[service][0] += 1
+            self.outbound[service][1] += seconds
+
+
+@contextmanager
+def collect():
+    """Attributes the queries and outbound calls made inside the block to a new RequestStats."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper feeding the current request's RequestStats."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.monotonic()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(sql, time.monotonic() - started)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver; see FeedbackConfig.ready."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def record_outbound_call(endpoint, seconds):
+    """Called by outbound.record_latency for endpoints such as 'slack:users.info'."""
+    stats = _current.get()
+    service = endpoint.split(':', 1)[0]
+    if stats is not None and service in OUTBOUND_SERVICES:
+        stats.add_outbound(service, seconds)
+
+
+def record_stream_timing(stage, started):
+    """Called by the streaming summary views at 'first_byte', 'first_token' and 'total'."""
+    observe('feedback_summary_stream_seconds', (('stage', stage),), time.monotonic() - started)
+
+
+def observe(name, labels, value):
+    with _lock:
+        _series[name].setdefault(labels, Histogram(HISTOGRAMS[name][1])).observe(value)
+
+
+def view_label(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name
+
+
+def finish_request(request, response, stats):
+    elapsed = time.monotonic() - stats.started
+    view = view_label(request)
+    labels = (('view', view),)
+    observe('feedback_request_duration_seconds', labels, elapsed)
+    observe('feedback_request_db_queries', labels, stats.queries)
+    observe('feedback_request_db_duration_seconds', labels, stats.db_time)
+    for service, (calls, seconds) in stats.outbound.items():
+        service_labels = (('service', service), ('view', view))
+        observe('feedback_request_outbound_calls', service_labels, calls)
+        observe('feedback_request_outbound_duration_seconds', service_labels, seconds)
+    if not response.streaming:
+        observe('feedback_response_size_bytes', labels, len(response.content))
+    with _lock:
+        key = (('method', request.method), ('status', str(response.status_code)), ('view', view))
+        _requests[key] = _requests.get(key, 0) + 1
+
+    if settings.SLOW_REQUEST_MS and elapsed * 1000 >= settings.SLOW_REQUEST_MS:
+        slowest = '\n'.join(f"  {seconds * 1000:.1f}ms {sql}" for seconds, sql in sorted(stats.slowest, reverse=True))
+        logger.warning(
+            f"Slow request {request.method} {request.path} ({view}): {elapsed * 1000:.0f}ms, "
+            f"{stats.queries} queries in {stats.db_time * 1000:.0f}ms, "
+            + ', '.join(f"{calls} {service} calls in {seconds * 1000:.0f}ms" for service, (calls, seconds) in stats.outbound.items())
+            + (f"; slowest SQL:\n{slowest}" if slowest else '')
+        )
+
+
+class RequestMetricsMiddleware:
+    """Records per-view request metrics; list it first in MIDDLEWARE so it sees the whole request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with collect() as stats:
+            response = self.get_response(request)
+        finish_request(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        with collect() as stats:
+            response = await self.get_response(request)
+        finish_request(request, response, stats)
+        return response
+
+
+def format_labels(labels):
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return ','.join(f'{name}="{value}"' for name, value in escaped)
+
+
+def histogram_lines(name, labels, buckets, total, count):
+    """Prometheus sample lines of one histogram series; buckets are (le, cumulative count) pairs."""
+    lines = [f'{name}_bucket{{{format_labels(labels + (("le", le),))}}} {cumulative}' for le, cumulative in buckets]
+    suffix = f'{{{format_labels(labels)}}}' if labels else ''
+    lines.append(f'{name}_sum{suffix} {total}')
+    lines.append(f'{name}_count{suffix} {count}')
+    return lines
+
+
+def render_prometheus(outbound_report=None):
+    """
+    Every metric in the Prometheus text exposition format. outbound_report
+    is outbound.latency_report(), exported as feedback_outbound_duration_seconds.
+    """
+    lines = []
+    with _lock:
+        for name, (help_text, _) in HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for labels, histogram in sorted(_series[name].items()):
+                lines += histogram_lines(name, labels, list(histogram.cumulative()), histogram.total, histogram.count)
+        lines += ['# HELP feedback_requests_total Requests served', '# TYPE feedback_requests_total counter']
+        lines += [f'feedback_requests_total{{{format_labels(labels)}}} {count}' for labels, count in sorted(_requests.items())]
+
+    if outbound_report is not None:
+        name = 'feedback_outbound_duration_seconds'
+        lines += [f'# HELP {name} Latency of the calls timed by feedback.outbound', f'# TYPE {name} histogram']
+        for endpoint, histogram in outbound_report.items():
+            lines += histogram_lines(
+                name, (('endpoint', endpoint),), list(histogram['buckets'].items()), histogram['sum'], histogram['count'],
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forgets every recorded request, e.g. between tests."""
+    with _lock:
+        for series in _series.values():
+            series.clear()
+        _requests.clear()
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0002_alter_reaction_reaction'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChannelSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel_id', models.CharField(max_length=50, unique=True)),
+                ('last_ts', models.CharField(blank=True, default='', max_length=100)),
+                ('cursor', models.CharField(blank=True, default='', max_length=500)),
+                ('run_oldest_ts', models.CharField(blank=True, default='', max_length=100)),
+                ('run_newest_ts', models.CharField(blank=True, default='', max_length=100)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 15:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0004_slackevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='rendered_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-17 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0005_feedback_rendered_message'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['timestamp', 'id'], name='feedback_fe_timesta_802398_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['feedback', 'reaction'], name='feedback_re_feedbac_edac40_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taggeduser',
+            index=models.Index(fields=['user', 'feedback'], name='feedback_ta_user_id_b9668d_idx'),
+        ),
+    ]
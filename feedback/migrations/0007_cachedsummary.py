@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-17 16:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0006_feedback_reaction_taggeduser_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CachedSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('summary', models.TextField()),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField()),
+                ('slack_user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='cached_summaries', to='feedback.slackuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='feedback_ca_last_us_12e2cf_idx')],
+            },
+        ),
+    ]
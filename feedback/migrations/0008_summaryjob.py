@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 17:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0007_cachedsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('truncated', models.BooleanField(default=False)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('requested_at', models.DateTimeField()),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('slack_user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='summary_job', to='feedback.slackuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'requested_at'], name='feedback_su_status_61821d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-17 17:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0008_summaryjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('total', 'Feedback received'), ('month', 'Feedback received per month'), ('reaction', 'Reactions on feedback received'), ('sender', 'Feedback received per sender')], max_length=20)),
+                ('key', models.CharField(blank=True, default='', max_length=200)),
+                ('count', models.IntegerField(default=0)),
+                ('slack_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='feedback.slackuser')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('slack_user', 'kind', 'key'), name='unique_user_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:05
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Rows are indexed by their rendered text so that @username mentions match
+SEARCH_DOCUMENT = "coalesce(nullif({row}rendered_message, ''), {row}message, '')"
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX feedback_fe_search__9f7e13_gin ON feedback_feedback USING gin (search_vector)",
+    """
+    CREATE FUNCTION feedback_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('english', %s);
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """ % SEARCH_DOCUMENT.format(row='NEW.'),
+    """
+    CREATE TRIGGER feedback_search_vector_update
+    BEFORE INSERT OR UPDATE OF message, rendered_message ON feedback_feedback
+    FOR EACH ROW EXECUTE FUNCTION feedback_search_vector_update()
+    """,
+    "UPDATE feedback_feedback SET search_vector = to_tsvector('english', %s)" % SEARCH_DOCUMENT.format(row=''),
+]
+POSTGRES_BACKWARD = [
+    "DROP TRIGGER feedback_search_vector_update ON feedback_feedback",
+    "DROP FUNCTION feedback_search_vector_update()",
+    "DROP INDEX feedback_fe_search__9f7e13_gin",
+]
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE feedback_feedback_fts USING fts5(body, tokenize='porter unicode61')",
+    """
+    CREATE TRIGGER feedback_feedback_fts_insert AFTER INSERT ON feedback_feedback BEGIN
+        INSERT INTO feedback_feedback_fts (rowid, body) VALUES (NEW.id, %s);
+    END
+    """ % SEARCH_DOCUMENT.format(row='NEW.'),
+    """
+    CREATE TRIGGER feedback_feedback_fts_update AFTER UPDATE OF message, rendered_message ON feedback_feedback BEGIN
+        UPDATE feedback_feedback_fts SET body = %s WHERE rowid = NEW.id;
+    END
+    """ % SEARCH_DOCUMENT.format(row='NEW.'),
+    """
+    CREATE TRIGGER feedback_feedback_fts_delete AFTER DELETE ON feedback_feedback BEGIN
+        DELETE FROM feedback_feedback_fts WHERE rowid = OLD.id;
+    END
+    """,
+    "INSERT INTO feedback_feedback_fts (rowid, body) SELECT id, %s FROM feedback_feedback" % SEARCH_DOCUMENT.format(row=''),
+]
+SQLITE_BACKWARD = [
+    "DROP TRIGGER feedback_feedback_fts_insert",
+    "DROP TRIGGER feedback_feedback_fts_update",
+    "DROP TRIGGER feedback_feedback_fts_delete",
+    "DROP TABLE feedback_feedback_fts",
+]
+
+
+def run_for_vendor(postgres, sqlite):
+    def run(apps, schema_editor):
+        statements = {'postgresql': postgres, 'sqlite': sqlite}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0009_userstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feedback',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        # The GIN index only exists on PostgreSQL; SQLite gets an FTS5 table instead
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='feedback',
+                    index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='feedback_fe_search__9f7e13_gin'),
+                ),
+            ],
+        ),
+        migrations.RunPython(
+            run_for_vendor(POSTGRES_FORWARD, SQLITE_FORWARD),
+            run_for_vendor(POSTGRES_BACKWARD, SQLITE_BACKWARD),
+        ),
+    ]
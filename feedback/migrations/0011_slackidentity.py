@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-17 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0010_feedback_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlackIdentity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=254, unique=True)),
+                ('resolved', models.BooleanField(default=False)),
+                ('checked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('slack_user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identities', to='feedback.slackuser')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['resolved', 'checked_at'], name='feedback_sl_resolve_e1b198_idx')],
+            },
+        ),
+    ]
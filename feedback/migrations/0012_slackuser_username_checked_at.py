@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0011_slackidentity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='slackuser',
+            name='username_checked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:30
+
+import uuid
+
+from django.db import migrations, models
+
+
+def create_shared_versions(apps, schema_editor):
+    # USERNAMES and ALL_FEEDBACK of feedback.response_cache, read by nearly every cached page
+    ResponseVersion = apps.get_model('feedback', 'ResponseVersion')
+    ResponseVersion.objects.bulk_create(
+        [ResponseVersion(scope=scope, version=uuid.uuid4().hex) for scope in ('*', '@usernames')],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0012_slackuser_username_checked_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResponseVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100, unique=True)),
+                ('version', models.CharField(max_length=32)),
+            ],
+        ),
+        migrations.RunPython(create_shared_versions, migrations.RunPython.noop),
+    ]
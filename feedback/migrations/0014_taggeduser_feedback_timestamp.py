@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-17 21:45
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_feedback_timestamps(apps, schema_editor):
+    Feedback = apps.get_model('feedback', 'Feedback')
+    TaggedUser = apps.get_model('feedback', 'TaggedUser')
+    TaggedUser.objects.update(feedback_timestamp=Subquery(
+        Feedback.objects.filter(pk=OuterRef('feedback_id')).values('timestamp')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0013_responseversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taggeduser',
+            name='feedback_timestamp',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_feedback_timestamps, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='taggeduser',
+            name='feedback_timestamp',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='taggeduser',
+            index=models.Index(fields=['user', 'feedback_timestamp', 'feedback'], name='feedback_ta_user_id_c221de_idx'),
+        ),
+    ]
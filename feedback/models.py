@@ -1,8 +1,11 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 class SlackUser(models.Model):
     slack_id = models.CharField(max_length=50, unique=True)
     username = models.CharField(max_length=100)
+    username_checked_at = models.DateTimeField(null=True, blank=True)  # Last time Slack confirmed username
 
     def __str__(self):
         return self.username
@@ -12,8 +15,16 @@ class Feedback(models.Model):
     user = models.ForeignKey(SlackUser, on_delete=models.CASCADE, related_name="feedback_received")
     sender = models.ForeignKey(SlackUser, on_delete=models.CASCADE, related_name="feedback_given")
     message = models.TextField()
+    rendered_message = models.TextField(blank=True, default='')  # message with <@U…> mentions replaced by @username
     timestamp = models.DateTimeField()
     source = models.CharField(max_length=50, default='slack')  # New field to track the source
+    search_vector = SearchVectorField(null=True, editable=False)  # Filled by a database trigger, see feedback.search
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp', 'id']),  # Keyset pagination order
+            GinIndex(fields=['search_vector']),  # Full-text search (PostgreSQL only, see migration 0010)
+        ]
 
     def __str__(self):
         return f"{self.sender} → {self.user}: {self.message[:20]}"
@@ -22,6 +33,11 @@ class Reaction(models.Model):
     feedback = models.ForeignKey(Feedback, on_delete=models.CASCADE, related_name="reactions")
     reaction = models.CharField(max_length=200)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['feedback', 'reaction']),  # reaction_removed lookups
+        ]
+
     def __str__(self):
         return f"{self.reaction} on {self.feedback.message[:20]}"
 
@@ -30,6 +46,147 @@ class TaggedUser(models.Model):
     user = models.ForeignKey(SlackUser, on_delete=models.CASCADE)  # The actual user object
     username_mentioned = models.CharField(max_length=100)  # The username in the message
     slack_id_mentioned = models.CharField(max_length=50, null=True, blank=True)  # Allow null initially
+    feedback_timestamp = models.DateTimeField(editable=False)  # Copy of feedback.timestamp, kept in step by feedback.signals
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'feedback']),  # Covers the feedback_id subqueries of search, export and summaries
+            models.Index(fields=['user', 'feedback_timestamp', 'feedback']),  # get_mentions reads a user's mentions in page order
+        ]
 
     def __str__(self):
         return f"{self.user.username} ({self.slack_id_mentioned}) was tagged in {self.feedback.message[:20]}"
+
+class ChannelSyncState(models.Model):
+    channel_id = models.CharField(max_length=50, unique=True)
+    last_ts = models.CharField(max_length=100, blank=True, default='')  # Newest message ts fully ingested
+    cursor = models.CharField(max_length=500, blank=True, default='')  # Pagination cursor of an unfinished run
+    run_oldest_ts = models.CharField(max_length=100, blank=True, default='')  # oldest= bound of the unfinished run
+    run_newest_ts = models.CharField(max_length=100, blank=True, default='')  # Newest ts seen by the unfinished run
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.channel_id} synced up to {self.last_ts or 'nothing'}"
+
+class SlackEvent(models.Model):
+    PENDING = 'pending'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    event_id = models.CharField(max_length=100, unique=True)  # Slack's event_id, used to drop duplicate deliveries
+    payload = models.JSONField()  # Raw event_callback body
+    retry_num = models.PositiveIntegerField(default=0)  # Highest X-Slack-Retry-Num seen for this event
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.event_id} ({self.status})"
+
+class CachedSummary(models.Model):
+    key = models.CharField(max_length=64, unique=True)  # sha256 of the prompt version and the exact OpenAI request
+    slack_user = models.ForeignKey(SlackUser, on_delete=models.CASCADE, null=True, blank=True, related_name="cached_summaries")
+    summary = models.TextField()
+    feedback_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_used_at']),  # TTL and least-recently-used eviction
+        ]
+
+    def __str__(self):
+        return f"{self.key[:12]} for {self.slack_user or 'posted feedback'}"
+
+class SummaryJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    slack_user = models.OneToOneField(SlackUser, on_delete=models.CASCADE, related_name="summary_job")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    summary = models.TextField(blank=True, default='')  # Latest finished summary, kept while a newer one is pending
+    feedback_count = models.PositiveIntegerField(default=0)
+    truncated = models.BooleanField(default=False)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    requested_at = models.DateTimeField()  # Last time the user's feedback changed or a summary was asked for
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'requested_at']),
+        ]
+
+    def __str__(self):
+        return f"Summary of {self.slack_user} ({self.status})"
+
+class UserStat(models.Model):
+    TOTAL = 'total'
+    MONTH = 'month'
+    REACTION = 'reaction'
+    SENDER = 'sender'
+    KIND_CHOICES = [
+        (TOTAL, 'Feedback received'),
+        (MONTH, 'Feedback received per month'),
+        (REACTION, 'Reactions on feedback received'),
+        (SENDER, 'Feedback received per sender'),
+    ]
+
+    slack_user = models.ForeignKey(SlackUser, on_delete=models.CASCADE, related_name="stats")  # The tagged user
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    key = models.CharField(max_length=200, blank=True, default='')  # '' for total, YYYY-MM, reaction name or sender slack_id
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['slack_user', 'kind', 'key'], name='unique_user_stat'),
+        ]
+
+    def __str__(self):
+        return f"{self.slack_user} {self.kind} {self.key}: {self.count}"
+
+class SlackIdentity(models.Model):
+    """Links a login email to its SlackUser, so sessions resolve with one indexed lookup."""
+    email = models.EmailField(unique=True)  # Lowercased
+    slack_user = models.ForeignKey(SlackUser, on_delete=models.CASCADE, related_name="identities")
+    resolved = models.BooleanField(default=False)  # False while slack_user is a temp_ placeholder
+    checked_at = models.DateTimeField(null=True, blank=True)  # Last users.lookupByEmail attempt
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resolved', 'checked_at']),  # reconcile_slack_identities scan
+        ]
+
+    def __str__(self):
+        return f"{self.email} → {self.slack_user}"
+
+class ResponseVersion(models.Model):
+    """Current version of a feedback.response_cache scope, shared by every process through the database."""
+    scope = models.CharField(max_length=100, unique=True)  # A slack_id, ALL_FEEDBACK or USERNAMES
+    version = models.CharField(max_length=32)
+
+    def __str__(self):
+        return f"{self.scope}: {self.version}"
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+import openai
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .metrics import record_outbound_call
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_lock = threading.Lock()
+_session = None
+_openai_client = None
+_async_openai_clients = weakref.WeakKeyDictionary()  # event loop -> AsyncOpenAI
+_histograms = {}
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+
+    def as_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(LATENCY_BUCKETS + ('+Inf',), self.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {'count': self.count, 'sum': round(self.total, 6), 'buckets': buckets}
+
+
+def record_latency(endpoint, seconds):
+    with _lock:
+        _histograms.setdefault(endpoint, LatencyHistogram()).observe(seconds)
+    record_outbound_call(endpoint, seconds)
+
+
+@contextmanager
+def timed(endpoint):
+    """Records the wall time of the block under endpoint, e.g. 'slack:users.info'."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        record_latency(endpoint, time.monotonic() - started)
+
+
+def latency_report():
+    """Returns {endpoint: {'count', 'sum', 'buckets'}} with cumulative bucket counts."""
+    with _lock:
+        return {endpoint: histogram.as_dict() for endpoint, histogram in sorted(_histograms.items())}
+
+
+def get_session():
+    """Shared keep-alive requests session with retry/backoff on transient server errors."""
+    global _session
+    with _lock:
+        if _session is None:
+            retry = Retry(
+                total=settings.OUTBOUND_HTTP_RETRIES,
+                backoff_factor=settings.OUTBOUND_HTTP_BACKOFF,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=None,
+                raise_on_status=False,
+            )
+            adapter = HTTPAdapter(
+                pool_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+                pool_maxsize=settings.OUTBOUND_HTTP_POOL_SIZE,
+                max_retries=retry,
+            )
+            _session = requests.Session()
+            _session.mount('https://', adapter)
+            _session.mount('http://', adapter)
+        return _session
+
+
+def request(method, url, endpoint, **kwargs):
+    """Sends a request through the shared session and records its latency under endpoint."""
+    kwargs.setdefault('timeout', (settings.OUTBOUND_HTTP_CONNECT_TIMEOUT, settings.OUTBOUND_HTTP_TIMEOUT))
+    with timed(endpoint):
+        return get_session().request(method, url, **kwargs)
+
+
+def get_openai_client():
+    """Shared OpenAI client backed by one pooled httpx client."""
+    global _openai_client
+    with _lock:
+        if _openai_client is None:
+            timeout = httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OUTBOUND_HTTP_CONNECT_TIMEOUT)
+            http_client = httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+                ),
+            )
+            _openai_client = openai.OpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=settings.OUTBOUND_HTTP_RETRIES,
+                timeout=timeout,
+                http_client=http_client,
+            )
+        return _openai_client
+
+
+def get_async_openai_client():
+    """
+    AsyncOpenAI client backed by a pooled httpx.AsyncClient. Async
+    connections belong to an event loop, so one client is kept per loop.
+    """
+    loop = asyncio.get_running_loop()
+    with _lock:
+        client = _async_openai_clients.get(loop)
+        if client is None:
+            timeout = httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.OUTBOUND_HTTP_CONNECT_TIMEOUT)
+            http_client = httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+                    max_keepalive_connections=settings.OUTBOUND_HTTP_POOL_SIZE,
+                ),
+            )
+            client = openai.AsyncOpenAI(
+                api_key=settings.OPENAI_API_KEY,
+                base_url=settings.OPENAI_BASE_URL,
+                max_retries=settings.OUTBOUND_HTTP_RETRIES,
+                timeout=timeout,
+                http_client=http_client,
+            )
+            _async_openai_clients[loop] = client
+        return client
+
+
+def reset_openai_clients():
+    """Drops the shared OpenAI clients so the next call builds them from the current settings."""
+    global _openai_client
+    with _lock:
+        _openai_client = None
+        _async_openai_clients.clear()
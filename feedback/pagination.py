@@ -0,0 +1,119 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(feedback):
+    """Opaque cursor pointing just after feedback (an instance or a .values() row) in (timestamp, id) order."""
+    if isinstance(feedback, dict):
+        position = json.dumps([feedback['timestamp'].isoformat(), feedback['id']])
+    else:
+        position = json.dumps([feedback.timestamp.isoformat(), feedback.id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Returns (timestamp, id) for a cursor from encode_cursor. Raises ValueError for anything else."""
+    try:
+        timestamp, feedback_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        timestamp = parse_datetime(timestamp)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if timestamp is None or not isinstance(feedback_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return timestamp, feedback_id
+
+
+def apply_cursor(queryset, cursor, order=('timestamp', 'id')):
+    """
+    Restricts a Feedback queryset ordered by (timestamp, id) to the rows after
+    cursor. Deep pages cost the same as the first one because the filter is
+    a range seek instead of an OFFSET. order names the fields holding the
+    timestamp and id, for querysets that seek on an indexed copy of them.
+    """
+    timestamp_field, id_field = order
+    queryset = queryset.order_by(timestamp_field, id_field)
+    if not cursor:
+        return queryset
+    timestamp, feedback_id = decode_cursor(cursor)
+    return queryset.filter(
+        Q(**{f'{timestamp_field}__gt': timestamp})
+        | Q(**{timestamp_field: timestamp, f'{id_field}__gt': feedback_id})
+    )
+
+
+def encode_rank_cursor(row):
+    """Opaque cursor pointing just after a ranked search result row in (-rank, -id) order."""
+    return base64.urlsafe_b64encode(json.dumps([row['rank'], row['id']]).encode()).decode()
+
+
+def apply_rank_cursor(queryset, cursor):
+    """
+    Orders a queryset annotated with rank best match first and restricts it
+    to the rows after cursor. Raises ValueError for a malformed cursor.
+    """
+    queryset = queryset.order_by('-rank', '-id')
+    if not cursor:
+        return queryset
+    try:
+        rank, feedback_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(rank, (int, float)) or not isinstance(feedback_id, int):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return queryset.filter(Q(rank__lt=rank) | Q(rank=rank, id__lt=feedback_id))
+
+
+def split_page(rows, page_size, encode=encode_cursor):
+    """Takes page_size + 1 rows fetched after apply_cursor and returns (page, next_cursor or None)."""
+    page = rows[:page_size]
+    next_cursor = encode(page[-1]) if len(rows) > page_size else None
+    return page, next_cursor
+
+
+def include_total(request_params):
+    """True when the client opted into the total row count with ?include_total=true."""
+    return request_params.get('include_total', '').lower() in ('1', 'true', 'yes')
+
+
+class FeedbackKeysetPagination(BasePagination):
+    """
+    Keyset pagination over (timestamp, id) with an opaque ?cursor= parameter.
+    The total row count is only computed when ?include_total=true is given.
+    """
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            page_size = min(max(int(request.query_params.get('page_size', self.page_size)), 1), self.max_page_size)
+        except ValueError:
+            page_size = self.page_size
+        try:
+            filtered = apply_cursor(queryset, request.query_params.get('cursor'))
+        except ValueError as e:
+            raise ValidationError({'cursor': str(e)})
+        self.total = queryset.count() if include_total(request.query_params) else None
+        page, self.next_cursor = split_page(list(filtered[:page_size + 1]), page_size)
+        return page
+
+    def get_paginated_response(self, data):
+        body = {
+            'next_cursor': self.next_cursor,
+            'next': (
+                replace_query_param(self.request.build_absolute_uri(), 'cursor', self.next_cursor)
+                if self.next_cursor else None
+            ),
+            'results': data,
+        }
+        if self.total is not None:
+            body['count'] = self.total
+        return Response(body)
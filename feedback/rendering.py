@@ -0,0 +1,58 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .models import Feedback, SlackUser
+
+MENTION_RE = re.compile(r'<@([A-Z0-9]+)>')
+
+
+def render_message(text, usernames):
+    """Replaces <@U12345678> tokens with @username for every ID usernames has a name for."""
+    def render_mention(match):
+        username = usernames.get(match.group(1))
+        return f'@{username}' if username else match.group(0)
+
+    return MENTION_RE.sub(render_mention, text or '')
+
+
+def render_feedback_rows(feedbacks, batch_size=500):
+    """
+    Re-renders rendered_message for the given Feedback rows with one
+    SlackUser query for all of their mentions and one bulk_update.
+    """
+    mentioned = {mentioned_id for feedback in feedbacks for mentioned_id in MENTION_RE.findall(feedback.message)}
+    usernames = dict(
+        SlackUser.objects.filter(slack_id__in=mentioned).exclude(username='').values_list('slack_id', 'username')
+    )
+    for feedback in feedbacks:
+        feedback.rendered_message = render_message(feedback.message, usernames)
+    Feedback.objects.bulk_update(feedbacks, ['rendered_message'], batch_size=batch_size)
+    return len(feedbacks)
+
+
+def mentioning(slack_ids):
+    """Q matching the Feedback whose raw message mentions any of slack_ids."""
+    return reduce(or_, (Q(message__contains=f'<@{slack_id}>') for slack_id in slack_ids))
+
+
+def refresh_rendered_messages(slack_ids, chunk_size=500):
+    """Re-renders every message that mentions one of slack_ids, e.g. after a username change."""
+    slack_ids = list(slack_ids)
+    if not slack_ids:
+        return 0
+    mentions_any = mentioning(slack_ids)
+    refreshed = 0
+    last_id = 0
+    while True:
+        chunk = list(
+            Feedback.objects.filter(mentions_any, id__gt=last_id)
+            .order_by('id')
+            .only('id', 'message')[:chunk_size]
+        )
+        if not chunk:
+            return refreshed
+        refreshed += render_feedback_rows(chunk)
+        last_id = chunk[-1].id
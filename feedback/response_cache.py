@@ -0,0 +1,130 @@
+"""
+Versioned response caching for the mention and feedback list pages. Every
+scope (a user's slack_id, or ALL_FEEDBACK for the feedback list) has an
+opaque version in the ResponseVersion table that is replaced, in the same
+transaction, whenever feedback touching it is written. Keeping versions in
+the database lets the ingestion and event worker processes invalidate the
+pages of every web worker. Pages are cached under (scope, versions, query
+string) and carry that key as their ETag, so an unchanged page is answered
+with a 304 or from the cache after a single indexed version lookup.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+
+from .models import ResponseVersion
+
+ALL_FEEDBACK = '*'
+# Bumped when a user is renamed, since usernames appear on every page
+USERNAMES = '@usernames'
+
+
+def version_pairs(scopes):
+    return ResponseVersion.objects.filter(scope__in=scopes).values_list('scope', 'version')
+
+
+def new_version_rows(scopes):
+    return [ResponseVersion(scope=scope, version=uuid.uuid4().hex) for scope in sorted(scopes)]
+
+
+def get_versions(scope):
+    """The versions a page of scope depends on: its own and that of USERNAMES."""
+    scopes = [scope, USERNAMES]
+    versions = dict(version_pairs(scopes))
+    missing = [name for name in scopes if name not in versions]
+    if missing:
+        ResponseVersion.objects.bulk_create(new_version_rows(missing), ignore_conflicts=True)
+        versions = dict(version_pairs(scopes))
+    return [versions.get(name) for name in scopes]
+
+
+async def aget_versions(scope):
+    scopes = [scope, USERNAMES]
+    versions = {name: version async for name, version in version_pairs(scopes)}
+    missing = [name for name in scopes if name not in versions]
+    if missing:
+        await ResponseVersion.objects.abulk_create(new_version_rows(missing), ignore_conflicts=True)
+        versions = {name: version async for name, version in version_pairs(scopes)}
+    return [versions.get(name) for name in scopes]
+
+
+def bump_versions(scopes):
+    """
+    Gives each scope a new version. The write is part of the current
+    transaction, so other processes see the new version exactly when they
+    can see the data that caused it. Rows are written in scope order so
+    concurrent bumps cannot deadlock.
+    """
+    scopes = set(scopes)
+    if scopes:
+        ResponseVersion.objects.bulk_create(
+            new_version_rows(scopes),
+            update_conflicts=True,
+            unique_fields=['scope'],
+            update_fields=['version'],
+        )
+
+
+def page_key(scope, versions, params):
+    query = '&'.join(f'{name}={value}' for name, value in sorted(params.items()))
+    digest = hashlib.sha256(f'{scope}|{"|".join(map(str, versions))}|{query}'.encode()).hexdigest()[:32]
+    return f'response-page:{digest}'
+
+
+def page_etag(key):
+    return f'"{key.rsplit(":", 1)[1]}"'
+
+
+def not_modified(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+def page_response(body, etag):
+    response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    return response
+
+
+def cached_json_response(request, scope, build):
+    """
+    Serves the JSON page build() produces through the cache of scope.
+    Only 200 responses are cached.
+    """
+    key = page_key(scope, get_versions(scope), request.GET)
+    etag = page_etag(key)
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    body = cache.get(key)
+    if body is None:
+        response = build()
+        if response.status_code != 200:
+            return response
+        body = response.content
+        cache.set(key, body, settings.RESPONSE_CACHE_TTL)
+    return page_response(body, etag)
+
+
+async def acached_json_response(request, scope, abuild):
+    """Async counterpart of cached_json_response; abuild is a coroutine function."""
+    key = page_key(scope, await aget_versions(scope), request.GET)
+    etag = page_etag(key)
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    body = await cache.aget(key)
+    if body is None:
+        response = await abuild()
+        if response.status_code != 200:
+            return response
+        body = response.content
+        await cache.aset(key, body, settings.RESPONSE_CACHE_TTL)
+    return page_response(body, etag)
@@ -0,0 +1,71 @@
+"""
+Full-text search over feedback messages. On PostgreSQL a trigger keeps
+Feedback.search_vector up to date and a GIN index serves the matches; on
+SQLite the feedback_feedback_fts FTS5 table is kept in step by triggers.
+Both are created by migration 0010_feedback_search, so every write path,
+bulk inserts included, is indexed without application code.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+from django.db.models.expressions import RawSQL
+
+from .models import Feedback, Reaction, TaggedUser
+
+# Must match the configuration used by the trigger in migration 0010
+SEARCH_CONFIG = 'english'
+FTS_TABLE = 'feedback_feedback_fts'
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+
+def fts5_query(q):
+    """Quotes each word of q so FTS5 reads the input as plain terms, all of which must match."""
+    return ' '.join('"%s"' % term.replace('"', '""') for term in q.split())
+
+
+def text_match(q):
+    """Feedback matching q, annotated with rank (higher is a better match)."""
+    if connection.vendor == 'postgresql':
+        query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+        # ts_rank returns real; as double precision the value round-trips through the cursor exactly,
+        # so rows tied with the last row of a page still compare equal to it
+        rank = Cast(SearchRank(F('search_vector'), query), FloatField())
+        return Feedback.objects.filter(search_vector=query).annotate(rank=rank)
+
+    if connection.vendor == 'sqlite':
+        # FTS5's rank is bm25, where lower is better
+        query = fts5_query(q)
+        return Feedback.objects.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]),
+        ).annotate(rank=RawSQL(
+            f'SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = feedback_feedback.id',
+            [query],
+            output_field=FloatField(),
+        ))
+
+    # No full-text index on other backends: every word must appear in the message
+    queryset = Feedback.objects.all()
+    for term in q.split():
+        queryset = queryset.filter(message__icontains=term)
+    return queryset.annotate(rank=Value(1.0, output_field=FloatField()))
+
+
+def search_queryset(q, user_id=None, sender_id=None, reaction=None, since=None, until=None):
+    """
+    text_match(q) narrowed to feedback tagging the Slack user user_id, sent
+    by sender_id, carrying reaction and within [since, until).
+    """
+    queryset = text_match(q)
+    if user_id:
+        queryset = queryset.filter(id__in=TaggedUser.objects.filter(user__slack_id=user_id).values('feedback_id'))
+    if sender_id:
+        queryset = queryset.filter(sender__slack_id=sender_id)
+    if reaction:
+        queryset = queryset.filter(id__in=Reaction.objects.filter(reaction=reaction).values('feedback_id'))
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+    return queryset
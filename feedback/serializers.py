@@ -1,3 +1,5 @@
+from collections import defaultdict
+
 from rest_framework import serializers
 from .models import Feedback, Reaction, SlackUser, TaggedUser
 
@@ -7,11 +9,9 @@ class SlackUserSerializer(serializers.ModelSerializer):
         fields = ['slack_id', 'username']
 
 class ReactionSerializer(serializers.ModelSerializer):
-    user = SlackUserSerializer()
-
     class Meta:
         model = Reaction
-        fields = ['reaction', 'user']
+        fields = ['reaction']
 
 class TaggedUserSerializer(serializers.ModelSerializer):
     user = SlackUserSerializer()
@@ -29,3 +29,53 @@ class FeedbackSerializer(serializers.ModelSerializer):
     class Meta:
         model = Feedback
         fields = ['slack_message_id', 'sender', 'user', 'message', 'timestamp', 'reactions', 'tagged_users']
+
+# Columns FeedbackRowSerializer reads, for Feedback.objects.values(*FEEDBACK_ROW_FIELDS)
+FEEDBACK_ROW_FIELDS = (
+    'id', 'slack_message_id', 'message', 'timestamp',
+    'sender__slack_id', 'sender__username', 'user__slack_id', 'user__username',
+)
+
+_timestamp_field = serializers.DateTimeField()
+
+def attach_feedback_relations(rows):
+    """
+    Adds 'reactions' and 'tagged_users' lists to a page of FEEDBACK_ROW_FIELDS
+    dicts, with one query each regardless of the page size.
+    """
+    rows = list(rows)
+    ids = [row['id'] for row in rows]
+    reactions = defaultdict(list)
+    tagged_users = defaultdict(list)
+    if ids:
+        for feedback_id, reaction in Reaction.objects.filter(feedback_id__in=ids).order_by('id')\
+                .values_list('feedback_id', 'reaction'):
+            reactions[feedback_id].append({'reaction': reaction})
+        for feedback_id, slack_id, username, username_mentioned in TaggedUser.objects.filter(feedback_id__in=ids)\
+                .order_by('id').values_list('feedback_id', 'user__slack_id', 'user__username', 'username_mentioned'):
+            tagged_users[feedback_id].append({
+                'user': {'slack_id': slack_id, 'username': username},
+                'username_mentioned': username_mentioned,
+            })
+    for row in rows:
+        row['reactions'] = reactions[row['id']]
+        row['tagged_users'] = tagged_users[row['id']]
+    return rows
+
+class FeedbackRowSerializer(serializers.BaseSerializer):
+    """
+    Read-only equivalent of FeedbackSerializer for dicts from
+    attach_feedback_relations. Builds the output directly instead of going
+    through a field object per attribute.
+    """
+
+    def to_representation(self, row):
+        return {
+            'slack_message_id': row['slack_message_id'],
+            'sender': {'slack_id': row['sender__slack_id'], 'username': row['sender__username']},
+            'user': {'slack_id': row['user__slack_id'], 'username': row['user__username']},
+            'message': row['message'],
+            'timestamp': _timestamp_field.to_representation(row['timestamp']),
+            'reactions': row['reactions'],
+            'tagged_users': row['tagged_users'],
+        }
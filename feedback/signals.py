@@ -0,0 +1,55 @@
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Feedback, Reaction, SlackUser, TaggedUser
+from .invalidation import feedback_changed, usernames_changed
+
+
+@receiver(pre_save, sender=SlackUser)
+def remember_previous_username(sender, instance, **kwargs):
+    if instance.pk is None:
+        instance._previous_username = None
+    else:
+        instance._previous_username = (
+            SlackUser.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=SlackUser)
+def refresh_messages_on_username_change(sender, instance, created, **kwargs):
+    """Keeps Feedback.rendered_message in step with renamed users."""
+    previous = getattr(instance, '_previous_username', None)
+    if previous == instance.username or (created and not instance.username):
+        return
+    usernames_changed([instance.slack_id])
+
+
+@receiver(pre_save, sender=TaggedUser)
+def copy_feedback_timestamp(sender, instance, **kwargs):
+    """Bulk inserts skip this and set TaggedUser.feedback_timestamp themselves."""
+    if instance.feedback_timestamp is None:
+        instance.feedback_timestamp = instance.feedback.timestamp
+
+
+@receiver(post_save, sender=Feedback)
+def move_mentions_with_feedback(sender, instance, created, **kwargs):
+    if not created:
+        TaggedUser.objects.filter(feedback_id=instance.pk).exclude(feedback_timestamp=instance.timestamp)\
+            .update(feedback_timestamp=instance.timestamp)
+
+
+@receiver(post_save, sender=Feedback)
+@receiver(pre_delete, sender=Feedback)
+def invalidate_caches_on_feedback_change(sender, instance, **kwargs):
+    feedback_changed(feedback_ids=[instance.pk], user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=Reaction)
+@receiver(post_save, sender=TaggedUser)
+def invalidate_caches_on_related_change(sender, instance, **kwargs):
+    """
+    Bulk writes and reaction removals skip these signals and call
+    feedback_changed themselves, which keeps their deletes fast.
+    """
+    user_ids = [instance.user_id] if sender is TaggedUser else []
+    feedback_changed(feedback_ids=[instance.feedback_id], user_ids=user_ids)
@@ -0,0 +1,95 @@
+import threading
+import time
+
+from django.conf import settings
+from slack_sdk.errors import SlackApiError
+
+from . import outbound
+
+# Slack Web API rate limit tier for each method we call
+# https://api.slack.com/docs/rate-limits
+SLACK_METHOD_TIERS = {
+    'conversations.history': 3,
+    'reactions.get': 3,
+    'users.info': 4,
+    'users.list': 2,
+    'users.lookupByEmail': 3,
+}
+TIER_REQUESTS_PER_MINUTE = {1: 1, 2: 20, 3: 50, 4: 100}
+MAX_RETRIES = 3
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available
+    or until a pause requested by a Retry-After header has elapsed.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class SlackRateLimiter:
+    """One token bucket per Slack API method, sized from the method's tier."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, method):
+        with self._lock:
+            if method not in self._buckets:
+                per_minute = TIER_REQUESTS_PER_MINUTE[SLACK_METHOD_TIERS.get(method, 3)]
+                self._buckets[method] = TokenBucket(rate=per_minute / 60, capacity=per_minute)
+            return self._buckets[method]
+
+
+limiter = SlackRateLimiter()
+
+
+def call(method, params=None):
+    """
+    Calls a Slack Web API method and returns the decoded JSON body. Requests
+    are throttled per method and HTTP 429 responses are retried after the
+    Retry-After delay Slack asks for. Raises SlackApiError with the HTTP
+    status once a 429 or server error has used up its retries.
+    """
+    bucket = limiter.bucket(method)
+    headers = {
+        'Authorization': f'Bearer {settings.SLACK_BOT_TOKEN}'
+    }
+    url = f'{settings.SLACK_API_BASE_URL}/{method}'
+
+    for attempt in range(MAX_RETRIES + 1):
+        bucket.acquire()
+        response = outbound.request('GET', url, f'slack:{method}', headers=headers, params=params)
+        if response.status_code == 429 and attempt < MAX_RETRIES:
+            bucket.pause(float(response.headers.get('Retry-After', 1)))
+            continue
+        if response.status_code != 200:
+            raise SlackApiError(f"{method} failed with HTTP {response.status_code}", response)
+        return response.json()
@@ -0,0 +1,175 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import slack_api
+from .models import SlackUser
+
+
+def fetch_user_info(user_id):
+    """Fetch user information from Slack API"""
+    return slack_api.call('users.info', {'user': user_id})
+
+
+def fetch_users_list(cursor=None, limit=200):
+    """Fetch one page of the workspace member list from Slack API"""
+    params = {
+        'limit': limit
+    }
+    if cursor:
+        params['cursor'] = cursor
+    return slack_api.call('users.list', params)
+
+
+class SlackUserDirectory:
+    """
+    Resolves Slack user IDs to usernames through an in-memory LRU cache,
+    then the SlackUser table, and only then Slack's users.info API.
+
+    Stored usernames are trusted for SLACK_USERNAME_MAX_AGE seconds after
+    Slack last confirmed them (SlackUser.username_checked_at). Older ones
+    are asked for again when fetching is allowed, so a rename in Slack is
+    picked up by the first ingestion after that window, or by the next
+    warm() sweep.
+    """
+
+    def __init__(self, ttl=None, max_size=None):
+        self.ttl = ttl if ttl is not None else settings.SLACK_USER_CACHE_TTL
+        self.max_size = max_size if max_size is not None else settings.SLACK_USER_CACHE_SIZE
+        self._entries = OrderedDict()  # slack_id -> (username, expires_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.api_calls = 0
+
+    def _lookup(self, slack_id):
+        entry = self._entries.get(slack_id)
+        if entry is None:
+            return None
+        username, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._entries[slack_id]
+            return None
+        self._entries.move_to_end(slack_id)
+        return username
+
+    def remember(self, slack_id, username):
+        """Store a username for slack_id, evicting the least recently used entry when full."""
+        with self._lock:
+            self._entries[slack_id] = (username, time.monotonic() + self.ttl)
+            self._entries.move_to_end(slack_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, slack_id=None):
+        """Drop one cached user, or the whole cache when no ID is given."""
+        with self._lock:
+            if slack_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(slack_id, None)
+
+    def get_username(self, slack_id, fetch=True):
+        return self.get_usernames([slack_id], fetch=fetch).get(slack_id, '')
+
+    def get_usernames(self, slack_ids, fetch=True, executor=None):
+        """
+        Returns {slack_id: username} for every ID given. Cache misses are
+        resolved with a single SlackUser query; IDs still unknown after that,
+        or whose stored name is stale, are fetched from users.info when fetch
+        is True, fanned out over executor when one is given. Without fetch,
+        stale names are returned as stored.
+        """
+        result = {}
+        missing = []
+        with self._lock:
+            for slack_id in dict.fromkeys(slack_ids):
+                username = self._lookup(slack_id)
+                if username is None:
+                    missing.append(slack_id)
+                else:
+                    result[slack_id] = username
+            self.hits += len(result)
+            self.misses += len(missing)
+
+        if not missing:
+            return result
+
+        cutoff = timezone.now() - timedelta(seconds=settings.SLACK_USERNAME_MAX_AGE)
+        stored = {}
+        stale = {}
+        for slack_id, username, checked_at in SlackUser.objects.filter(slack_id__in=missing)\
+                .exclude(username='').values_list('slack_id', 'username', 'username_checked_at'):
+            if checked_at is not None and checked_at >= cutoff:
+                stored[slack_id] = username
+            else:
+                stale[slack_id] = username
+        for slack_id, username in stored.items():
+            self.remember(slack_id, username)
+        result.update(stored)
+
+        if not fetch:
+            result.update(stale)
+            return result
+
+        unknown = [slack_id for slack_id in missing if slack_id not in stored]
+        fetched = dict(zip(unknown, executor.map(self._fetch, unknown) if executor else map(self._fetch, unknown)))
+        self.mark_checked({slack_id: username for slack_id, username in fetched.items() if username})
+        # A stale name is still better than none when Slack could not be asked
+        result.update({slack_id: username or stale.get(slack_id, '') for slack_id, username in fetched.items()})
+        return result
+
+    def mark_checked(self, usernames):
+        """Records that Slack confirmed these {slack_id: username} pairs for the stored users that match."""
+        if usernames:
+            matching = reduce(or_, (Q(slack_id=slack_id, username=username) for slack_id, username in usernames.items()))
+            SlackUser.objects.filter(matching).update(username_checked_at=timezone.now())
+
+    def _fetch(self, slack_id):
+        data = fetch_user_info(slack_id)
+        with self._lock:
+            self.api_calls += 1
+        username = data.get('user', {}).get('name', '') if data.get('ok') else ''
+        # A failed lookup returns '' without caching it, so the next call asks Slack again
+        if username:
+            self.remember(slack_id, username)
+        return username
+
+    def warm(self):
+        """Load every workspace member with one paginated users.list sweep. Returns the count loaded."""
+        loaded = 0
+        cursor = None
+        while True:
+            data = fetch_users_list(cursor)
+            with self._lock:
+                self.api_calls += 1
+            members = {
+                member['id']: member['name'] for member in data.get('members', []) if member.get('id') and member.get('name')
+            }
+            for slack_id, username in members.items():
+                self.remember(slack_id, username)
+            self.mark_checked(members)
+            loaded += len(members)
+            cursor = data.get('response_metadata', {}).get('next_cursor', '')
+            if not cursor:
+                return loaded
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'api_calls': self.api_calls,
+                'size': len(self._entries),
+            }
+
+
+# Shared by views and management commands for the life of the process
+directory = SlackUserDirectory()
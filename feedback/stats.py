@@ -0,0 +1,149 @@
+"""
+Per-user feedback statistics. UserStat holds one counter per tagged user
+and (kind, key); ingestion and the Slack event handlers adjust the counters
+with F() updates as rows are written, and rebuild_stats recomputes them all.
+"""
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import TruncMonth
+
+from .models import Reaction, SlackUser, TaggedUser, UserStat
+
+TOP_SENDERS = 10
+
+
+def month_key(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def tagged_deltas(tagged, sign=1):
+    """Counter deltas for (user_id, timestamp, sender_slack_id) tuples of tagged feedback."""
+    deltas = Counter()
+    for user_id, timestamp, sender_id in tagged:
+        deltas[(user_id, UserStat.TOTAL, '')] += sign
+        deltas[(user_id, UserStat.MONTH, month_key(timestamp))] += sign
+        deltas[(user_id, UserStat.SENDER, sender_id or '')] += sign
+    return deltas
+
+
+def apply_stat_deltas(deltas):
+    """
+    Adds {(user_id, kind, key): delta} to the UserStat counters: one insert
+    for missing rows and one F() update per distinct delta.
+    """
+    deltas = {stat: delta for stat, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    UserStat.objects.bulk_create(
+        [UserStat(slack_user_id=user_id, kind=kind, key=key) for user_id, kind, key in deltas],
+        ignore_conflicts=True,
+    )
+    by_delta = defaultdict(list)
+    for (user_id, kind, key), delta in deltas.items():
+        by_delta[delta].append(Q(slack_user_id=user_id, kind=kind, key=key))
+    for delta, stats in by_delta.items():
+        UserStat.objects.filter(reduce(or_, stats)).update(count=F('count') + delta)
+
+
+def record_ingested(tagged_rows, reaction_rows):
+    """Counts freshly created TaggedUser and Reaction rows whose feedback objects are in memory."""
+    deltas = tagged_deltas(
+        (tagged.user_id, tagged.feedback.timestamp, tagged.feedback.sender.slack_id) for tagged in tagged_rows
+    )
+    tagged_by_feedback = defaultdict(list)
+    for tagged in tagged_rows:
+        tagged_by_feedback[tagged.feedback_id].append(tagged.user_id)
+    for reaction in reaction_rows:
+        for user_id in tagged_by_feedback[reaction.feedback_id]:
+            deltas[(user_id, UserStat.REACTION, reaction.reaction)] += 1
+    apply_stat_deltas(deltas)
+
+
+def record_reaction_changes(changes):
+    """Applies {(feedback_id, reaction): delta} to the reaction histograms of the feedback's tagged users."""
+    changes = {change: delta for change, delta in changes.items() if delta}
+    if not changes:
+        return
+    tagged_by_feedback = defaultdict(list)
+    for feedback_id, user_id in TaggedUser.objects.filter(
+        feedback_id__in={feedback_id for feedback_id, _ in changes},
+    ).values_list('feedback_id', 'user_id'):
+        tagged_by_feedback[feedback_id].append(user_id)
+    deltas = Counter()
+    for (feedback_id, reaction), delta in changes.items():
+        for user_id in tagged_by_feedback[feedback_id]:
+            deltas[(user_id, UserStat.REACTION, reaction)] += delta
+    apply_stat_deltas(deltas)
+
+
+def forget_feedback(feedback_ids):
+    """Takes feedback that is about to be deleted, with its tags and reactions, out of the counters."""
+    tagged = list(
+        TaggedUser.objects.filter(feedback_id__in=feedback_ids)
+        .values_list('feedback_id', 'user_id', 'feedback__timestamp', 'feedback__sender__slack_id')
+    )
+    if not tagged:
+        return
+    deltas = tagged_deltas(((user_id, timestamp, sender_id) for _, user_id, timestamp, sender_id in tagged), sign=-1)
+    tagged_by_feedback = defaultdict(list)
+    for feedback_id, user_id, _, _ in tagged:
+        tagged_by_feedback[feedback_id].append(user_id)
+    for feedback_id, reaction in Reaction.objects.filter(feedback_id__in=feedback_ids).values_list('feedback_id', 'reaction'):
+        for user_id in tagged_by_feedback[feedback_id]:
+            deltas[(user_id, UserStat.REACTION, reaction)] -= 1
+    apply_stat_deltas(deltas)
+
+
+def rebuild_stats():
+    """Recomputes every UserStat counter from the feedback tables with grouped queries. Returns the row count."""
+    totals = TaggedUser.objects.values('user_id').annotate(count=Count('id'))
+    months = TaggedUser.objects.annotate(month=TruncMonth('feedback__timestamp', tzinfo=dt_timezone.utc))\
+        .values('user_id', 'month').annotate(count=Count('id'))
+    senders = TaggedUser.objects.values('user_id', 'feedback__sender__slack_id').annotate(count=Count('id'))
+    reactions = TaggedUser.objects.filter(feedback__reactions__isnull=False)\
+        .values('user_id', 'feedback__reactions__reaction').annotate(count=Count('feedback__reactions__id'))
+
+    rows = [UserStat(slack_user_id=row['user_id'], kind=UserStat.TOTAL, key='', count=row['count']) for row in totals]
+    rows += [
+        UserStat(slack_user_id=row['user_id'], kind=UserStat.MONTH, key=row['month'].strftime('%Y-%m'), count=row['count'])
+        for row in months
+    ]
+    rows += [
+        UserStat(slack_user_id=row['user_id'], kind=UserStat.SENDER, key=row['feedback__sender__slack_id'], count=row['count'])
+        for row in senders
+    ]
+    rows += [
+        UserStat(slack_user_id=row['user_id'], kind=UserStat.REACTION, key=row['feedback__reactions__reaction'], count=row['count'])
+        for row in reactions
+    ]
+    with transaction.atomic():
+        UserStat.objects.all().delete()
+        UserStat.objects.bulk_create(rows, batch_size=2000)
+    return len(rows)
+
+
+def user_stats(slack_user):
+    """The stats payload of slack_user in two queries, however long their history."""
+    by_kind = defaultdict(dict)
+    for kind, key, count in UserStat.objects.filter(slack_user=slack_user, count__gt=0).values_list('kind', 'key', 'count'):
+        by_kind[kind][key] = count
+
+    senders = sorted(by_kind[UserStat.SENDER].items(), key=lambda item: (-item[1], item[0]))[:TOP_SENDERS]
+    usernames = dict(
+        SlackUser.objects.filter(slack_id__in=[sender_id for sender_id, _ in senders]).values_list('slack_id', 'username')
+    ) if senders else {}
+    return {
+        "user_id": slack_user.slack_id,
+        "feedback_received": by_kind[UserStat.TOTAL].get('', 0),
+        "by_month": dict(sorted(by_kind[UserStat.MONTH].items())),
+        "reactions": dict(sorted(by_kind[UserStat.REACTION].items(), key=lambda item: (-item[1], item[0]))),
+        "top_senders": [
+            {"user_id": sender_id, "username": usernames.get(sender_id, "Unknown"), "count": count}
+            for sender_id, count in senders
+        ],
+    }
@@ -0,0 +1,488 @@
+"""
+Prompt building, map-reduce summarization and caching for AI feedback
+summaries. The feedback is either posted by the client or, given a user_id,
+read straight from the database, and is cut to SUMMARY_PROMPT_TOKEN_BUDGET.
+Summaries and partial notes are cached in CachedSummary under a hash of the
+exact OpenAI request.
+"""
+import asyncio
+import hashlib
+import json
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import outbound
+from .models import CachedSummary, Feedback, Reaction, SlackUser, SummaryJob, TaggedUser
+
+# Bump when the prompt wording changes so cached summaries of the old prompt are not reused
+SUMMARY_PROMPT_VERSION = 1
+
+SummaryInput = namedtuple('SummaryInput', ['feedback', 'username', 'truncated', 'slack_user'])
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts, about four characters per token for English text."""
+    return len(text) // 4 + 1
+
+
+def format_feedback_block(number, feedback):
+    """The prompt lines for one feedback dict with sender, timestamp, message and reactions."""
+    message_block = (
+        f"Message {number} (from {feedback.get('sender', 'Unknown')} "
+        f"on {feedback.get('timestamp', 'Unknown date')}):\n"
+        f"{feedback.get('message', '')}\n"
+    )
+
+    reactions = feedback.get('reactions', [])
+    if reactions:
+        reaction_str = ', '.join(str(r) for r in reactions)
+        message_block += f"Reactions: {reaction_str}\n"
+    return message_block + "\n"
+
+
+SUMMARY_MODEL = "gpt-4o-mini"
+
+# Updated system message to focus on personal feedback analysis
+SUMMARY_SYSTEM_MESSAGE = (
+    "You are an expert at analyzing personal professional feedback. "
+    "Provide concise summaries focused on the individual's performance, strengths, "
+    "and growth opportunities. Frame the analysis from the perspective of "
+    "feedback received by the specific person."
+)
+
+
+def summary_instructions(username):
+    """The report layout every final summary of username's feedback follows."""
+    # Updated prompt to focus on individual user feedback analysis
+    return (
+        f"Analyze the following feedback messages received by {username} and provide "
+        "a summary in markdown format with these sections:\n"
+        "# Personal Feedback Analysis\n\n"
+        "## Main Themes and Patterns\n"
+        f"[Analyze main themes in the feedback received by {username}]\n\n"
+        "## Key Strengths\n"
+        f"[List {username}'s key strengths based on the feedback]\n\n"
+        "## Areas for Improvement\n"
+        f"[List suggested areas where {username} could improve, based on the feedback]\n\n"
+        "## Personal Growth Trends\n"
+        f"[Analyze {username}'s growth and development trends based on the feedback]\n\n"
+        f"Note: This analysis is specifically about feedback received by {username}.\n\n"
+    )
+
+
+def chat_request(prompt, max_tokens, temperature=0.7):
+    return {
+        "model": SUMMARY_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt}
+        ],
+        "max_tokens": max_tokens,
+        "temperature": temperature,
+    }
+
+
+def build_summary_request(feedback_data, username):
+    """
+    Returns the chat.completions.create arguments that summarize feedback_data
+    for username.
+    """
+    prompt = (
+        summary_instructions(username)
+        + "Feedback messages to analyze:\n\n"
+        + ''.join(format_feedback_block(i + 1, feedback) for i, feedback in enumerate(feedback_data))
+    )
+    return chat_request(prompt, 1000)
+
+
+def build_chunk_request(chunk, username):
+    """Map step: condenses one chunk of feedback into notes for the final summary."""
+    prompt = (
+        f"Write concise notes on the following feedback messages received by {username}: "
+        "recurring themes, strengths, areas for improvement and how the feedback changes over time. "
+        "Keep concrete examples and who gave them.\n\n"
+        "Feedback messages:\n\n"
+        + ''.join(format_feedback_block(i + 1, feedback) for i, feedback in enumerate(chunk))
+    )
+    return chat_request(prompt, settings.SUMMARY_NOTES_MAX_TOKENS, temperature=0.3)
+
+
+def format_notes(notes):
+    return ''.join(f"Period {i + 1}:\n{text}\n\n" for i, text in enumerate(notes))
+
+
+def build_merge_request(notes, username):
+    """Reduce step: condenses the notes of consecutive periods into one set of notes."""
+    prompt = (
+        f"Merge the following notes on consecutive periods of feedback received by {username}, "
+        "oldest first, into one set of concise notes. Keep trends over time visible.\n\n"
+        + format_notes(notes)
+    )
+    return chat_request(prompt, settings.SUMMARY_NOTES_MAX_TOKENS, temperature=0.3)
+
+
+def build_final_request(notes, username):
+    """Writes the summary report from the notes of consecutive periods of feedback."""
+    prompt = (
+        summary_instructions(username)
+        + "Notes on consecutive periods of the feedback, oldest first:\n\n"
+        + format_notes(notes)
+    )
+    return chat_request(prompt, 1000)
+
+
+def feedback_period(feedback):
+    """
+    The SUMMARY_CHUNK_DAYS period, counted from the Unix epoch, of a feedback
+    dict's timestamp, or None when it has no parseable timestamp.
+    """
+    try:
+        timestamp = parse_datetime(str(feedback.get('timestamp') or ''))
+    except ValueError:
+        return None
+    if timestamp is None:
+        return None
+    return int(timestamp.timestamp() // (settings.SUMMARY_CHUNK_DAYS * 24 * 3600))
+
+
+def chunk_feedback(feedback_data, chunk_tokens=None):
+    """
+    Splits chronological feedback into consecutive chunks of at most
+    chunk_tokens estimated tokens. Feedback that does not fit one chunk is
+    first split at SUMMARY_CHUNK_DAYS period boundaries, and each period is
+    filled from its oldest message. Appending newer feedback therefore only
+    changes the last chunk, and dropping the oldest whole period (see
+    fit_to_budget) leaves the other chunks as they were.
+    """
+    chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+    feedback_data = list(feedback_data)
+    total = sum(estimate_tokens(format_feedback_block(i + 1, feedback)) for i, feedback in enumerate(feedback_data))
+    if total <= chunk_tokens:
+        return [feedback_data] if feedback_data else []
+
+    chunks = []
+    current = []
+    current_period = None
+    used = 0
+    for feedback in feedback_data:
+        period = feedback_period(feedback)
+        cost = estimate_tokens(format_feedback_block(len(current) + 1, feedback))
+        if current and (used + cost > chunk_tokens or period not in (None, current_period)):
+            chunks.append(current)
+            current = []
+            used = 0
+            cost = estimate_tokens(format_feedback_block(1, feedback))
+        current.append(feedback)
+        used += cost
+        current_period = period if period is not None else current_period
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def group_notes(notes, chunk_tokens=None):
+    """Groups consecutive notes so each group fits in chunk_tokens estimated tokens."""
+    chunk_tokens = chunk_tokens or settings.SUMMARY_CHUNK_TOKENS
+    groups = []
+    used = 0
+    for text in notes:
+        cost = estimate_tokens(text)
+        if not groups or used + cost > chunk_tokens:
+            groups.append([])
+            used = 0
+        groups[-1].append(text)
+        used += cost
+    return groups
+
+
+def fit_to_budget(feedback_data, token_budget=None):
+    """
+    Takes feedback dicts newest first until the next one would push the
+    prompt past token_budget. When older feedback is left out, the rest of
+    its SUMMARY_CHUNK_DAYS period is dropped too, so the oldest chunk always
+    starts on a period boundary. Returns the kept feedback newest first and
+    whether any was left out.
+    """
+    if token_budget is None:
+        token_budget = settings.SUMMARY_PROMPT_TOKEN_BUDGET
+
+    selected = []
+    used = 0
+    for feedback in feedback_data:
+        cost = estimate_tokens(format_feedback_block(len(selected) + 1, feedback))
+        # The newest message always goes in so one long message cannot empty the summary
+        if selected and used + cost > token_budget:
+            break
+        used += cost
+        selected.append(feedback)
+    else:
+        return selected, False
+
+    partial = feedback_period(feedback)
+    if partial is not None and feedback_period(selected[-1]) == partial:
+        whole = [kept for kept in selected if feedback_period(kept) != partial]
+        selected = whole or selected
+    return selected, True
+
+
+def select_feedback_for_summary(slack_user, since=None, until=None, token_budget=None):
+    """
+    Reads the feedback tagging slack_user, newest first, and cuts it to
+    token_budget with fit_to_budget. Returns the selected feedback dicts
+    oldest first and whether older feedback was left out.
+    """
+    mentioned = TaggedUser.objects.filter(user=slack_user).values('feedback_id')
+    queryset = Feedback.objects.filter(id__in=mentioned)
+    if since:
+        queryset = queryset.filter(timestamp__gte=since)
+    if until:
+        queryset = queryset.filter(timestamp__lt=until)
+    rows = queryset.order_by('-timestamp', '-id')\
+        .values_list('id', 'sender__username', 'timestamp', 'rendered_message', 'message')\
+        .iterator(chunk_size=200)
+
+    selected, truncated = fit_to_budget((
+        {
+            'id': feedback_id,
+            'sender': sender or 'Unknown',
+            'timestamp': timestamp.isoformat(),
+            'message': rendered_message or message,
+            'reactions': [],
+        }
+        for feedback_id, sender, timestamp, rendered_message, message in rows
+    ), token_budget)
+
+    if selected:
+        reactions = defaultdict(list)
+        for feedback_id, reaction in Reaction.objects.filter(feedback_id__in=[f['id'] for f in selected])\
+                .order_by('id').values_list('feedback_id', 'reaction'):
+            reactions[feedback_id].append(reaction)
+        for feedback in selected:
+            feedback['reactions'] = reactions[feedback['id']]
+
+    selected.reverse()
+    return selected, truncated
+
+
+def parse_time_bound(value, name):
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO 8601 datetime")
+    return parsed
+
+
+def resolve_summary_input(data):
+    """
+    Returns a SummaryInput for a summarize_feedback body. A user_id (with
+    optional since/until) selects the feedback on the server; otherwise the
+    posted feedback array, oldest first, is cut to the same token budget and
+    slack_user is None. Raises
+    ValueError for an unusable body and SlackUser.DoesNotExist for an
+    unknown user_id.
+    """
+    user_id = data.get('user_id')
+    if not user_id:
+        feedback_data = data.get('feedback', [])
+        if not feedback_data:
+            raise ValueError("No feedback data provided")
+        if not isinstance(feedback_data, list):
+            raise ValueError("feedback must be an array")
+        feedback_data, truncated = fit_to_budget(reversed(feedback_data))
+        feedback_data.reverse()
+        return SummaryInput(feedback_data, data.get('username', 'the user'), truncated, None)
+
+    since = parse_time_bound(data.get('since'), 'since')
+    until = parse_time_bound(data.get('until'), 'until')
+    slack_user = SlackUser.objects.get(slack_id=user_id)
+    feedback_data, truncated = select_feedback_for_summary(slack_user, since, until)
+    if not feedback_data:
+        raise ValueError("No feedback found for this user")
+    return SummaryInput(feedback_data, data.get('username', slack_user.username), truncated, slack_user)
+
+
+def summary_cache_key(summary_request):
+    """Content address of a build_summary_request result."""
+    payload = json.dumps([SUMMARY_PROMPT_VERSION, summary_request], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def get_cached_summary(key):
+    """The cached summary for key, or None when there is none or it has expired."""
+    return get_cached_summaries([key]).get(key)
+
+
+def store_summary(key, summary, feedback_count=0, slack_user=None):
+    """
+    Caches summary under key, then drops expired entries and the least
+    recently used ones beyond SUMMARY_CACHE_SIZE.
+    """
+    now = timezone.now()
+    CachedSummary.objects.update_or_create(
+        key=key,
+        defaults={
+            'summary': summary,
+            'feedback_count': feedback_count,
+            'slack_user': slack_user,
+            'created_at': now,
+            'last_used_at': now,
+        },
+    )
+    CachedSummary.objects.filter(created_at__lt=now - timedelta(seconds=settings.SUMMARY_CACHE_TTL)).delete()
+    overflow = list(
+        CachedSummary.objects.order_by('-last_used_at', '-id').values_list('id', flat=True)[settings.SUMMARY_CACHE_SIZE:]
+    )
+    if overflow:
+        CachedSummary.objects.filter(id__in=overflow).delete()
+
+
+def invalidate_summaries(user_ids):
+    """
+    Drops the cached summaries of user_ids and queues their precomputed
+    summaries for regeneration. See invalidation.feedback_changed.
+    """
+    user_ids = set(user_ids)
+    if user_ids:
+        CachedSummary.objects.filter(slack_user_id__in=user_ids).delete()
+        SummaryJob.objects.filter(slack_user_id__in=user_ids).update(
+            status=SummaryJob.PENDING, requested_at=timezone.now(), attempts=0,
+        )
+
+
+def get_cached_summaries(keys):
+    """{key: summary} for the keys with a fresh cached summary, in one query."""
+    now = timezone.now()
+    fresh = CachedSummary.objects.filter(
+        key__in=set(keys), created_at__gte=now - timedelta(seconds=settings.SUMMARY_CACHE_TTL),
+    )
+    found = dict(fresh.values_list('key', 'summary'))
+    if found:
+        fresh.update(last_used_at=now)
+    return found
+
+
+def split_cached(summary_requests):
+    """Returns the cache keys of summary_requests, the cached results and the keys still to compute."""
+    keys = [summary_cache_key(summary_request) for summary_request in summary_requests]
+    cached = get_cached_summaries(keys)
+    missing = list(dict.fromkeys(key for key in keys if key not in cached))
+    return keys, cached, missing
+
+
+def cached_completions(summary_requests, complete_many):
+    """
+    complete_many(summary_requests) through the summary cache: only requests
+    without a cached result are sent, and their results are stored.
+    """
+    keys, cached, missing = split_cached(summary_requests)
+    if missing:
+        by_key = dict(zip(keys, summary_requests))
+        for key, text in zip(missing, complete_many([by_key[key] for key in missing])):
+            store_summary(key, text)
+            cached[key] = text
+    return [cached[key] for key in keys]
+
+
+def prepare_final_request(feedback_data, username, complete_many):
+    """
+    Returns the request that writes the summary of chronological
+    feedback_data for username. Feedback that fits one SUMMARY_CHUNK_TOKENS
+    chunk goes straight into it. Longer histories are split into chunks that
+    are condensed into notes concurrently (map), and the notes are merged
+    level by level until they fit the final request (reduce). Chunk and
+    merge results are cached, so new feedback only re-summarizes the newest
+    chunk. complete_many(requests) returns the completion text of each request.
+    """
+    chunks = chunk_feedback(feedback_data)
+    if len(chunks) <= 1:
+        return build_summary_request(feedback_data, username)
+
+    notes = cached_completions([build_chunk_request(chunk, username) for chunk in chunks], complete_many)
+    groups = group_notes(notes)
+    while 1 < len(groups) < len(notes):
+        notes = cached_completions([build_merge_request(group, username) for group in groups], complete_many)
+        groups = group_notes(notes)
+    return build_final_request(notes, username)
+
+
+async def aprepare_final_request(feedback_data, username, acomplete_many):
+    """Async counterpart of prepare_final_request; acomplete_many is a coroutine function."""
+    chunks = chunk_feedback(feedback_data)
+    if len(chunks) <= 1:
+        return build_summary_request(feedback_data, username)
+
+    async def acached_completions(summary_requests):
+        keys, cached, missing = await sync_to_async(split_cached)(summary_requests)
+        if missing:
+            by_key = dict(zip(keys, summary_requests))
+            for key, text in zip(missing, await acomplete_many([by_key[key] for key in missing])):
+                await sync_to_async(store_summary)(key, text)
+                cached[key] = text
+        return [cached[key] for key in keys]
+
+    notes = await acached_completions([build_chunk_request(chunk, username) for chunk in chunks])
+    groups = group_notes(notes)
+    while 1 < len(groups) < len(notes):
+        notes = await acached_completions([build_merge_request(group, username) for group in groups])
+        groups = group_notes(notes)
+    return build_final_request(notes, username)
+
+
+def summarize(feedback_data, username, complete_many):
+    """Summarizes chronological feedback_data for username, see prepare_final_request."""
+    return complete_many([prepare_final_request(feedback_data, username, complete_many)])[0]
+
+
+async def asummarize(feedback_data, username, acomplete_many):
+    """Async counterpart of summarize."""
+    return (await acomplete_many([await aprepare_final_request(feedback_data, username, acomplete_many)]))[0]
+
+
+def completion_text(response):
+    return response.choices[0].message.content.strip()
+
+
+def openai_completions(summary_requests):
+    """Sends summary_requests to OpenAI with at most SUMMARY_WORKERS in flight. Returns the completion texts."""
+    client = outbound.get_openai_client()
+
+    def complete(summary_request):
+        with outbound.timed('openai:chat.completions'):
+            return completion_text(client.chat.completions.create(**summary_request))
+
+    if len(summary_requests) == 1:
+        return [complete(summary_requests[0])]
+    with ThreadPoolExecutor(max_workers=settings.SUMMARY_WORKERS) as executor:
+        return list(executor.map(complete, summary_requests))
+
+
+async def aopenai_completions(summary_requests):
+    """Async counterpart of openai_completions."""
+    client = outbound.get_async_openai_client()
+    semaphore = asyncio.Semaphore(settings.SUMMARY_WORKERS)
+
+    async def complete(summary_request):
+        async with semaphore:
+            with outbound.timed('openai:chat.completions'):
+                return completion_text(await client.chat.completions.create(**summary_request))
+
+    return await asyncio.gather(*(complete(summary_request) for summary_request in summary_requests))
+
+
+def stream_deltas(chunks):
+    """The text of each streamed chat.completions chunk that carries any."""
+    for chunk in chunks:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -0,0 +1,131 @@
+"""
+Background summary precomputation. Every user with tagged feedback has a
+SummaryJob row; changes to their feedback flip it back to pending (see
+invalidation.feedback_changed) and manage.py precompute_summaries
+regenerates pending summaries so the summary endpoint only reads them.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SlackUser, SummaryJob, TaggedUser
+from .summaries import (
+    build_summary_request, get_cached_summary, openai_completions, select_feedback_for_summary, store_summary,
+    summarize, summary_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+RUNNING_TIMEOUT = timedelta(hours=1)  # A running job older than this is assumed to belong to a dead runner
+
+
+def schedule_summary_jobs():
+    """Adds a pending SummaryJob for every tagged user that has none. Returns how many were added."""
+    now = timezone.now()
+    missing = SlackUser.objects.filter(
+        id__in=TaggedUser.objects.values('user_id'), summary_job__isnull=True,
+    ).values_list('id', flat=True)
+    created = SummaryJob.objects.bulk_create(
+        [SummaryJob(slack_user_id=user_id, requested_at=now) for user_id in missing],
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def request_summary(slack_user):
+    """The user's SummaryJob, created as pending when the user has none yet."""
+    job, _ = SummaryJob.objects.get_or_create(slack_user=slack_user, defaults={'requested_at': timezone.now()})
+    return job
+
+
+def claim_summary_jobs(batch_size):
+    """
+    Marks up to batch_size pending (or abandoned running) jobs as running,
+    oldest request first. Rows are locked with SKIP LOCKED so several
+    runners can share the table.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            SummaryJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(Q(status=SummaryJob.PENDING) | Q(status=SummaryJob.RUNNING, started_at__lt=now - RUNNING_TIMEOUT))
+            .select_related('slack_user')
+            .order_by('requested_at')[:batch_size]
+        )
+        for job in jobs:
+            job.status = SummaryJob.RUNNING
+            job.attempts += 1
+            job.started_at = now
+        SummaryJob.objects.bulk_update(jobs, ['status', 'attempts', 'started_at'])
+    return jobs
+
+
+def run_summary_job(job):
+    """
+    Regenerates the summary of one claimed job. The result is only marked
+    done when the user's feedback did not change while it ran; otherwise the
+    job stays pending with the new summary so the next run picks it up.
+    Returns True on success.
+    """
+    slack_user = job.slack_user
+    updates = {}
+    try:
+        feedback_data, truncated = select_feedback_for_summary(slack_user)
+        summary = ''
+        if feedback_data:
+            key = summary_cache_key(build_summary_request(feedback_data, slack_user.username))
+            summary = get_cached_summary(key)
+            if summary is None:
+                summary = summarize(feedback_data, slack_user.username, openai_completions)
+                store_summary(key, summary, len(feedback_data), slack_user)
+        updates.update(
+            summary=summary, feedback_count=len(feedback_data), truncated=truncated, error='', finished_at=timezone.now(),
+        )
+        succeeded = True
+    except Exception as e:
+        logger.error(f"Error precomputing the summary of {slack_user}: {str(e)}")
+        updates['error'] = str(e)
+        succeeded = False
+
+    status = SummaryJob.DONE if succeeded else SummaryJob.FAILED if job.attempts >= MAX_ATTEMPTS else SummaryJob.PENDING
+    unchanged = SummaryJob.objects.filter(pk=job.pk, requested_at=job.requested_at).update(status=status, **updates)
+    if not unchanged:
+        SummaryJob.objects.filter(pk=job.pk).update(status=SummaryJob.PENDING, **updates)
+    return succeeded
+
+
+def run_in_worker(job):
+    try:
+        return run_summary_job(job)
+    finally:
+        connection.close()
+
+
+def process_summary_jobs(batch_size=20, workers=1):
+    """
+    Claims and runs up to batch_size pending jobs, workers at a time.
+    Returns a dict of batch metrics.
+    """
+    started = time.monotonic()
+    jobs = claim_summary_jobs(batch_size)
+    if workers > 1 and len(jobs) > 1:
+        # Each worker thread uses its own database connection, closed when its job is done
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run_in_worker, jobs))
+    else:
+        results = [run_summary_job(job) for job in jobs]
+
+    stats = {
+        'jobs': len(jobs),
+        'failed': results.count(False),
+        'elapsed': time.monotonic() - started,
+    }
+    if jobs:
+        logger.info(f"Precomputed {len(jobs)} summaries ({stats['failed']} failed) in {stats['elapsed']:.1f}s")
+    return stats
@@ -1,3 +1,1280 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import requests
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from slack_sdk.errors import SlackApiError
+
+from . import async_views, metrics, outbound, slack_api, views
+from .events import apply_reaction_events, process_event
+from .management.commands.explain_queries import hot_queries, seed
+from .management.commands.fetch_slack_messages import fetch_historical_data
+from .mention_hub import REDIS_CHANNEL, RESYNC, SUBSCRIPTION_BUFFER, LocalHub, RedisHub, amention_events, check_hub_settings, get_hub
+from .serializers import FeedbackSerializer
+from .models import (
+    CachedSummary, ChannelSyncState, Feedback, Reaction, ResponseVersion, SlackEvent, SlackIdentity, SlackUser,
+    SummaryJob, TaggedUser, UserStat,
+)
+from .slack_directory import directory
+from .summaries import (
+    build_summary_request, chunk_feedback, estimate_tokens, format_feedback_block, resolve_summary_input,
+    select_feedback_for_summary, store_summary, summary_cache_key,
+)
+
+
+class StubSlackHandler(BaseHTTPRequestHandler):
+    """Answers the Slack Web API methods used by ingestion from canned data."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        server = self.server
+        with server.lock:
+            server.calls.append(method)
+            if method == 'conversations.history':
+                server.history_params.append(params)
+            throttled = method == 'reactions.get' and not server.throttled
+            server.throttled = server.throttled or throttled
+            throttled = throttled or server.rate_limited > 0
+            server.rate_limited -= server.rate_limited > 0
+            unavailable = server.unavailable > 0
+            server.unavailable -= unavailable
+
+        if unavailable:
+            self.send_response(503)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        if throttled:
+            self.send_response(429)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+
+        if method == 'conversations.history' and server.error_on_cursor and server.error_on_cursor == params.get('cursor'):
+            server.error_on_cursor = None
+            body = {'ok': False, 'error': 'ratelimited'}
+        elif method == 'conversations.history' and server.fail_on_cursor and server.fail_on_cursor == params.get('cursor'):
+            server.fail_on_cursor = None
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'<html>upstream error</html>')
+            return
+        elif method == 'conversations.history':
+            page = server.pages[int(params.get('cursor', 0))]
+            body = {'ok': True, **page}
+        elif method == 'users.info' and server.users_info_errors:
+            server.users_info_errors -= 1
+            body = {'ok': False, 'error': 'ratelimited'}
+        elif method == 'users.info':
+            name = server.user_names.get(params['user'], params['user'].lower())
+            body = {'ok': True, 'user': {'id': params['user'], 'name': name}}
+        elif method == 'users.lookupByEmail':
+            local, domain = params['email'].split('@')
+            found = domain == 'slack.example'
+            body = {'ok': True, 'user': {'id': f'U{local.upper()}', 'name': local}} if found else {'ok': False, 'error': 'users_not_found'}
+        elif method == 'reactions.get':
+            body = {'ok': True, 'message': {'reactions': [{'name': 'tada'}, {'name': 'tada'}, {'name': '+1'}]}}
+        else:
+            body = {'ok': False, 'error': 'unknown_method'}
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Answers chat.completions with a canned reply per prompt kind and records the prompts."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        prompt = body['messages'][-1]['content']
+        kind = 'notes' if prompt.startswith('Write concise notes') else 'merge' if prompt.startswith('Merge') else 'summary'
+        with self.server.lock:
+            self.server.prompts.append((kind, prompt))
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.end_headers()
+            for text in (kind, ' text'):
+                chunk = {
+                    'id': 'chatcmpl-test',
+                    'object': 'chat.completion.chunk',
+                    'created': 0,
+                    'model': body['model'],
+                    'choices': [{'index': 0, 'delta': {'content': text}, 'finish_reason': None}],
+                }
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode())
+            self.wfile.write(b'data: [DONE]\n\n')
+            return
+
+        payload = json.dumps({
+            'id': 'chatcmpl-test',
+            'object': 'chat.completion',
+            'created': 0,
+            'model': body['model'],
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': f'{kind} text'}, 'finish_reason': 'stop'}],
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubRedis:
+    """The slice of redis.Redis that RedisHub uses; clients sharing a channels dict see each other's publishes."""
+
+    def __init__(self, channels):
+        self.channels = channels
+
+    def pubsub(self, ignore_subscribe_messages=False):
+        return StubPubSub(self.channels)
+
+    def publish(self, channel, data):
+        for handler in list(self.channels.get(channel, [])):
+            handler({'type': 'message', 'channel': channel.encode(), 'data': data.encode()})
+
+
+class StubPubSub:
+    def __init__(self, channels):
+        self.channels = channels
+        self.handlers = {}
+
+    def subscribe(self, **handlers):
+        self.handlers.update(handlers)
+
+    def run_in_thread(self, sleep_time=0, daemon=False):
+        for channel, handler in self.handlers.items():
+            self.channels.setdefault(channel, []).append(handler)
+        return self
+
+    def stop(self):
+        for channel, handler in self.handlers.items():
+            self.channels[channel].remove(handler)
+
+
+class StubSlackTestCase(TestCase):
+    """Runs a stub Slack API server on a free local port for each test."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubSlackHandler)
+        self.server.lock = threading.Lock()
+        self.server.calls = []
+        self.server.throttled = False
+        self.server.history_params = []
+        self.server.fail_on_cursor = None
+        self.server.error_on_cursor = None
+        self.server.users_info_errors = 0
+        self.server.user_names = {}
+        self.server.unavailable = 0  # Requests still to answer with a 503
+        self.server.rate_limited = 0  # Requests still to answer with a 429
+        self.server.pages = [
+            {
+                'messages': [
+                    {'ts': '1700000000.000100', 'user': 'UALICE', 'text': 'thanks <@UBOB> and <@UCAROL>'},
+                    {'ts': '1700000001.000100', 'user': 'UBOB', 'text': 'great demo <@UALICE> <@UALICE>'},
+                ],
+                'response_metadata': {'next_cursor': '1'},
+            },
+            {
+                'messages': [
+                    {'ts': '1700000002.000100', 'user': 'UCAROL', 'text': 'no mentions here'},
+                    {'ts': '1700000003.000100', 'text': 'bot message without a user'},
+                ],
+            },
+        ]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        directory.invalidate()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        directory.invalidate()
+
+    def stub_api(self):
+        return override_settings(SLACK_API_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}/api')
+
+    def backfill(self, **kwargs):
+        with self.stub_api():
+            return fetch_historical_data(channels='CFEEDBACK', **kwargs)
+
+
+class ConcurrentBackfillTests(StubSlackTestCase):
+    def test_worker_pool_stores_the_same_rows_as_a_serial_run(self):
+        stats = self.backfill(batch_size=2, workers=4)
+
+        self.assertEqual(stats['feedback'], 3)
+        self.assertEqual(stats['skipped'], 1)
+        self.assertEqual(Feedback.objects.count(), 3)
+        self.assertEqual(
+            dict(SlackUser.objects.values_list('slack_id', 'username')),
+            {'UALICE': 'ualice', 'UBOB': 'ubob', 'UCAROL': 'ucarol'},
+        )
+        self.assertEqual(TaggedUser.objects.count(), 3)
+        self.assertEqual(Reaction.objects.count(), 6)
+
+    def test_users_are_looked_up_once_and_rate_limits_are_retried(self):
+        self.backfill(batch_size=2, workers=4)
+
+        self.assertEqual(self.server.calls.count('users.info'), 3)
+        # One reactions.get per message plus the retry after the 429
+        self.assertEqual(self.server.calls.count('reactions.get'), 4)
+
+    def test_rerun_skips_already_stored_messages(self):
+        self.backfill(batch_size=2, workers=2)
+        stats = self.backfill(batch_size=2, workers=2)
+
+        self.assertEqual(stats['feedback'], 0)
+        self.assertEqual(Feedback.objects.count(), 3)
+
+    def test_rerun_updates_renamed_users_and_rerenders_their_mentions(self):
+        cache.clear()
+        self.backfill(batch_size=2)
+        # Bob sent a message mentioning Alice; her cached page shows his name
+        alice_etag = self.client.get('/api/get-mentions/', {'user_id': 'UALICE'})['ETag']
+        # A later run, in a new process, once the stored names are due for a check
+        directory.invalidate()
+        SlackUser.objects.update(username_checked_at=timezone.now() - timedelta(days=2))
+        self.server.user_names = {'UBOB': 'robert'}
+        self.server.pages[1]['messages'].append(
+            {'ts': '1700000004.000100', 'user': 'UCAROL', 'text': 'welcome back <@UBOB>'},
+        )
+
+        stats = self.backfill(batch_size=2, full=True)
+
+        self.assertEqual(stats['feedback'], 1)
+        self.assertEqual(SlackUser.objects.filter(slack_id='UBOB').count(), 1)
+        self.assertEqual(SlackUser.objects.get(slack_id='UBOB').username, 'robert')
+        self.assertEqual(
+            Feedback.objects.get(slack_message_id='1700000000.000100').rendered_message, 'thanks @robert and @ucarol',
+        )
+        self.assertEqual(Feedback.objects.get(slack_message_id='1700000004.000100').rendered_message, 'welcome back @robert')
+        response = self.client.get('/api/get-mentions/', {'user_id': 'UALICE'}, HTTP_IF_NONE_MATCH=alice_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"robert"', response.content.decode())
+
+
+class SlackDirectoryTests(StubSlackTestCase):
+    def test_failed_lookup_is_retried_instead_of_cached(self):
+        self.server.users_info_errors = 1
+        with self.stub_api():
+            self.assertEqual(directory.get_username('UDAVE'), '')
+            self.assertEqual(directory.get_username('UDAVE'), 'udave')
+            self.assertEqual(directory.get_username('UDAVE'), 'udave')
+
+        self.assertEqual(self.server.calls.count('users.info'), 2)
+
+    def test_stale_stored_names_are_checked_with_slack(self):
+        SlackUser.objects.create(slack_id='UDAVE', username='dave', username_checked_at=timezone.now())
+        SlackUser.objects.create(
+            slack_id='UERIN', username='erin', username_checked_at=timezone.now() - timedelta(days=2),
+        )
+        self.server.user_names = {'UERIN': 'erin.new'}
+
+        self.assertEqual(directory.get_usernames(['UDAVE', 'UERIN'], fetch=False), {'UDAVE': 'dave', 'UERIN': 'erin'})
+        with self.stub_api():
+            self.assertEqual(directory.get_usernames(['UDAVE', 'UERIN']), {'UDAVE': 'dave', 'UERIN': 'erin.new'})
+
+        self.assertEqual(self.server.calls, ['users.info'])
+
+
+class OutboundRetryTests(StubSlackTestCase):
+    def test_server_errors_are_retried_by_the_shared_session(self):
+        self.server.unavailable = 1
+        with self.stub_api():
+            response = slack_api.call('users.info', {'user': 'UDAVE'})
+
+        self.assertEqual(response['user']['name'], 'udave')
+        self.assertEqual(self.server.calls, ['users.info', 'users.info'])
+
+    def test_exhausted_retries_raise_with_the_status(self):
+        self.server.unavailable = settings.OUTBOUND_HTTP_RETRIES + 1
+        with self.stub_api(), self.assertRaisesRegex(SlackApiError, 'HTTP 503'):
+            slack_api.call('users.info', {'user': 'UDAVE'})
+
+        self.server.rate_limited = slack_api.MAX_RETRIES + 1
+        with self.stub_api(), self.assertRaisesRegex(SlackApiError, 'HTTP 429'):
+            slack_api.call('users.info', {'user': 'UDAVE'})
+        self.assertEqual(self.server.calls, ['users.info'] * (settings.OUTBOUND_HTTP_RETRIES + slack_api.MAX_RETRIES + 2))
+
+
+class IncrementalSyncTests(StubSlackTestCase):
+    def test_next_run_only_asks_for_messages_after_the_checkpoint(self):
+        self.backfill(batch_size=2)
+        state = ChannelSyncState.objects.get(channel_id='CFEEDBACK')
+        self.assertEqual(state.last_ts, '1700000003.000100')
+        self.assertEqual(state.cursor, '')
+
+        self.server.history_params.clear()
+        self.backfill(batch_size=2)
+        self.assertEqual(self.server.history_params[0]['oldest'], '1700000003.000100')
+
+    def test_crashed_run_resumes_from_the_saved_cursor(self):
+        self.server.fail_on_cursor = '1'
+        with self.assertRaises(requests.JSONDecodeError):
+            self.backfill(batch_size=2)
+        state = ChannelSyncState.objects.get(channel_id='CFEEDBACK')
+        self.assertEqual(state.cursor, '1')
+        self.assertEqual(state.last_ts, '')
+
+        self.server.history_params.clear()
+        stats = self.backfill(batch_size=2)
+        self.assertEqual(self.server.history_params[0].get('cursor'), '1')
+        self.assertEqual(stats['feedback'], 1)
+        self.assertEqual(Feedback.objects.count(), 3)
+        self.assertEqual(ChannelSyncState.objects.get(channel_id='CFEEDBACK').last_ts, '1700000003.000100')
+
+    def test_error_page_keeps_the_checkpoint(self):
+        self.server.error_on_cursor = '1'
+        with self.assertRaises(SlackApiError):
+            self.backfill(batch_size=2)
+        state = ChannelSyncState.objects.get(channel_id='CFEEDBACK')
+        self.assertEqual((state.cursor, state.last_ts), ('1', ''))
+
+        self.server.history_params.clear()
+        self.backfill(batch_size=2)
+        self.assertEqual(self.server.history_params[0].get('cursor'), '1')
+        self.assertEqual(Feedback.objects.count(), 3)
+        self.assertEqual(ChannelSyncState.objects.get(channel_id='CFEEDBACK').last_ts, '1700000003.000100')
+
+
+class UserStatsTests(StubSlackTestCase):
+    def snapshot(self):
+        return sorted(UserStat.objects.filter(count__gt=0).values_list('slack_user__slack_id', 'kind', 'key', 'count'))
+
+    def test_incremental_counters_match_a_rebuild(self):
+        self.backfill(batch_size=2)
+        item = {'type': 'message', 'ts': '1700000000.000100'}
+        process_event({'type': 'reaction_added', 'reaction': 'tada', 'item': item})
+        process_event({'type': 'reaction_removed', 'reaction': '+1', 'item': item})
+        apply_reaction_events([{'type': 'reaction_added', 'reaction': 'heart', 'item': item}])
+
+        incremental = self.snapshot()
+        self.assertIn(('UBOB', UserStat.REACTION, 'tada', 2), incremental)
+        self.assertNotIn(('UBOB', UserStat.REACTION, '+1', 1), incremental)
+        call_command('rebuild_user_stats', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+        process_event({'type': 'message', 'subtype': 'message_deleted', 'deleted_ts': '1700000000.000100'})
+        self.assertEqual({stat[0] for stat in self.snapshot()}, {'UALICE'})
+
+    def test_stats_endpoint_reads_only_the_counters(self):
+        self.backfill(batch_size=2)
+
+        # user, counters, sender usernames
+        with self.assertNumQueries(3):
+            body = self.client.get('/api/users/UBOB/stats/').json()
+        self.assertEqual(body['feedback_received'], 1)
+        self.assertEqual(body['reactions'], {'+1': 1, 'tada': 1})
+        self.assertEqual(body['top_senders'], [{'user_id': 'UALICE', 'username': 'ualice', 'count': 1}])
+        self.assertEqual(sum(body['by_month'].values()), 1)
+
+
+class SlackIdentityTests(StubSlackTestCase):
+    def login(self, email):
+        user = get_user_model().objects.create_user(username=email, email=email)
+        self.client.force_login(user)
+        return user
+
+    def reconcile(self):
+        with self.stub_api():
+            call_command('reconcile_slack_identities', stdout=io.StringIO())
+
+    def test_unmatched_login_is_resolved_in_the_background(self):
+        user = self.login('Dana@slack.example')
+
+        body = self.client.get('/api/user/info/').json()
+        self.assertEqual((body['user_id'], body['note']), (f'temp_{user.id}', 'Could not fetch real Slack ID'))
+        self.assertEqual(self.server.calls, [])
+
+        self.reconcile()
+        self.assertEqual(self.server.calls, ['users.lookupByEmail'])
+        body = self.client.get('/api/user/info/').json()
+        self.assertEqual((body['user_id'], body['username']), ('UDANA', 'dana'))
+        self.assertNotIn('note', body)
+
+        # The identity now comes from the session: one query for it and one for the auth user
+        with self.assertNumQueries(2):
+            body = self.client.post('/api/auth/callback/', {}, content_type='application/json').json()
+        self.assertEqual(body['user_id'], 'UDANA')
+
+    def test_known_users_are_matched_without_slack(self):
+        SlackUser.objects.create(slack_id='UERIN', username='erin')
+        self.login('erin@elsewhere.example')
+
+        self.assertEqual(self.client.get('/api/user/info/').json()['user_id'], 'UERIN')
+        self.assertTrue(SlackIdentity.objects.get(email='erin@elsewhere.example').resolved)
+        self.assertEqual(self.server.calls, [])
+
+    def test_reconcile_links_to_users_created_by_slack_events(self):
+        self.login('frank@slack.example')
+        self.client.get('/api/user/info/')
+        SlackUser.objects.create(slack_id='UFRANK', username='frank')
+
+        self.reconcile()
+
+        self.assertEqual(SlackIdentity.objects.get().slack_user.slack_id, 'UFRANK')
+        self.assertEqual(self.client.get('/api/user/info/').json()['user_id'], 'UFRANK')
+
+    def test_emails_slack_does_not_know_are_not_rechecked_immediately(self):
+        self.login('gina@elsewhere.example')
+        self.client.get('/api/user/info/')
+
+        self.reconcile()
+        self.reconcile()
+
+        self.assertEqual(self.server.calls, ['users.lookupByEmail'])
+        self.assertFalse(SlackIdentity.objects.get().resolved)
+
+
+@override_settings(SLACK_EVENTS_QUEUED=True, SLACK_SIGNING_SECRET=None)
+class QueuedEventTests(TestCase):
+    def post_event(self, event_id, event, **headers):
+        body = {'type': 'event_callback', 'event_id': event_id, 'event': event}
+        return self.client.post('/slack/events/', body, content_type='application/json', headers=headers)
+
+    def test_events_are_queued_and_retries_deduplicated(self):
+        SlackUser.objects.create(slack_id='UALICE', username='alice')
+        event = {'type': 'message', 'ts': '1700000000.000100', 'user': 'UALICE', 'text': 'hello'}
+
+        self.assertEqual(self.post_event('Ev1', event).status_code, 200)
+        self.assertEqual(self.post_event('Ev1', event, **{'X-Slack-Retry-Num': '1'}).status_code, 200)
+
+        self.assertEqual(Feedback.objects.count(), 0)
+        queued = SlackEvent.objects.get()
+        self.assertEqual(queued.retry_num, 1)
+
+        call_command('process_slack_events', '--once', stdout=io.StringIO())
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, SlackEvent.DONE)
+        self.assertEqual(Feedback.objects.get().message, 'hello')
+
+    def test_async_listener_shares_the_deduplication(self):
+        body = {'type': 'event_callback', 'event_id': 'Ev1', 'event': {'type': 'message', 'ts': '1700000000.000100'}}
+        for retry_num in ('0', '2', '1'):
+            request = RequestFactory().post(
+                '/slack/events/', body, content_type='application/json', headers={'X-Slack-Retry-Num': retry_num},
+            )
+            self.assertEqual(async_to_sync(async_views.slack_event_listener)(request).status_code, 200)
+
+        self.assertEqual(SlackEvent.objects.get().retry_num, 2)
+
+    def test_reaction_events_in_a_batch_are_netted_out(self):
+        SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.post_event('Ev1', {'type': 'message', 'ts': '1700000000.000100', 'user': 'UALICE', 'text': 'hello'})
+        item = {'type': 'message', 'ts': '1700000000.000100'}
+        self.post_event('Ev2', {'type': 'reaction_added', 'reaction': 'tada', 'item': item})
+        self.post_event('Ev3', {'type': 'reaction_added', 'reaction': 'tada', 'item': item})
+        self.post_event('Ev4', {'type': 'reaction_added', 'reaction': '+1', 'item': item})
+        self.post_event('Ev5', {'type': 'reaction_removed', 'reaction': '+1', 'item': item})
+        self.post_event('Ev6', {'type': 'reaction_removed', 'reaction': 'tada', 'item': item})
+
+        out = io.StringIO()
+        call_command('process_slack_events', '--once', '--window', '0', stdout=out)
+
+        self.assertEqual(list(Reaction.objects.values_list('reaction', flat=True)), ['tada'])
+        self.assertFalse(SlackEvent.objects.exclude(status=SlackEvent.DONE).exists())
+        self.assertIn('1 batches, 6 events', out.getvalue())
+
+
+@override_settings(MENTION_STREAM_KEEPALIVE=1)
+class MentionStreamTests(TestCase):
+    def setUp(self):
+        SlackUser.objects.create(slack_id='UALICE', username='alice')
+        SlackUser.objects.create(slack_id='UBOB', username='bob')
+
+    def read_event(self, events):
+        return next(events).decode().split('\n')[:2]
+
+    def test_new_mentions_and_reactions_are_pushed(self):
+        response = self.client.get('/api/mentions/stream/', {'user_id': 'UBOB'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = iter(response.streaming_content)
+        self.assertEqual(self.read_event(events), ['event: ready', 'data: {"user_id": "UBOB"}'])
+        carol = get_hub().subscribe('UCAROL')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            process_event({'type': 'message', 'ts': '1700000000.000100', 'user': 'UALICE', 'text': 'thanks <@UBOB>'})
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_reaction_events([{'type': 'reaction_added', 'reaction': 'tada', 'item': {'ts': '1700000000.000100'}}])
+
+        name, data = self.read_event(events)
+        self.assertEqual(name, 'event: mention')
+        mention = json.loads(data[len('data: '):])
+        self.assertEqual((mention['message'], mention['sender']['username']), ('thanks @bob', 'alice'))
+        name, data = self.read_event(events)
+        self.assertEqual(name, 'event: reaction')
+        self.assertEqual(json.loads(data[len('data: '):])['count'], 1)
+        self.assertEqual(next(events), b': keepalive\n\n')
+        self.assertIsNone(carol.get(0))
+
+        carol.close()
+        response.close()
+        self.assertEqual(get_hub().subscriber_count(), 0)
+
+    def test_async_subscription_receives_deltas_published_from_other_threads(self):
+        async def receive():
+            subscription = get_hub().subscribe('UBOB', loop=asyncio.get_running_loop())
+            events = amention_events(subscription, 1)
+            await anext(events)
+            await asyncio.to_thread(get_hub().publish, [('UBOB', {'type': 'mention', 'slack_message_id': '1'})])
+            event = await anext(events)
+            await events.aclose()
+            return event
+
+        self.assertTrue(async_to_sync(receive)().startswith('event: mention\n'))
+        self.assertEqual(get_hub().subscriber_count(), 0)
+
+    def test_a_reader_that_falls_behind_is_told_to_resync(self):
+        hub = LocalHub()
+        subscription = hub.subscribe('UBOB')
+        hub.publish([('UBOB', {'type': 'mention'})] * (SUBSCRIPTION_BUFFER + 1))
+
+        self.assertEqual(subscription.get(0), RESYNC)
+        self.assertIsNone(subscription.get(0))
+
+    def test_unknown_user_is_rejected(self):
+        self.assertEqual(self.client.get('/api/mentions/stream/', {'user_id': 'UCAROL'}).status_code, 404)
+
+    def test_redis_hub_relays_deltas_between_processes(self):
+        channels = {}
+        web, worker = RedisHub('redis://localhost/0'), RedisHub('redis://localhost/0')
+        web._redis, worker._redis = StubRedis(channels), StubRedis(channels)
+        subscription = web.subscribe('UBOB')
+        try:
+            worker.publish([('UBOB', {'type': 'mention', 'slack_message_id': '1'})])
+            self.assertEqual(subscription.get(1), {'type': 'mention', 'slack_message_id': '1'})
+            self.assertIsNone(subscription.get(0))
+        finally:
+            subscription.close()
+            web._listener.stop()
+        self.assertEqual(channels, {REDIS_CHANNEL: []})
+
+    @override_settings(SLACK_EVENTS_QUEUED=True, MENTION_HUB_URL='')
+    def test_queued_events_without_a_hub_url_are_flagged(self):
+        self.assertEqual([warning.id for warning in check_hub_settings(None)], ['feedback.W001'])
+        with override_settings(MENTION_HUB_URL='redis://localhost/0'):
+            self.assertEqual(check_hub_settings(None), [])
+
+
+class AsyncViewTests(TestCase):
+    def test_async_get_mentions_matches_the_sync_view(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        for i in range(25):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}',
+                timestamp=timezone.now() + timedelta(minutes=i), user=alice, sender=alice,
+            )
+            TaggedUser.objects.create(feedback=feedback, user=bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+
+        first = RequestFactory().get('/api/get-mentions/', {'user_id': 'UBOB'})
+        cursor = json.loads(views.get_mentions(first).content)['next_cursor']
+        request = RequestFactory().get('/api/get-mentions/', {'user_id': 'UBOB', 'cursor': cursor, 'include_total': 'true'})
+        sync_body = json.loads(views.get_mentions(request).content)
+        cache.clear()
+        async_body = json.loads(async_to_sync(async_views.get_mentions)(request).content)
+
+        self.assertEqual(async_body, sync_body)
+        self.assertEqual(len(async_body['mentions']), 5)
+        self.assertEqual(async_body['mentions'][0]['message'], 'thanks @bob #20')
+        self.assertIsNone(async_body['next_cursor'])
+        self.assertEqual(async_body['total'], 25)
+
+
+class MentionQueryCountTests(TestCase):
+    def setUp(self):
+        directory.invalidate()
+        self.alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        SlackUser.objects.create(slack_id='UCAROL', username='carol')
+
+    def tearDown(self):
+        directory.invalidate()
+
+    def create_mentions(self, count):
+        for i in range(count):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'<@UBOB> helped <@UCAROL> and <@UBOB> #{i}',
+                timestamp=timezone.now() + timedelta(minutes=i), user=self.alice, sender=self.alice,
+            )
+            # Carol is mentioned but not tagged, so her name comes from the directory
+            TaggedUser.objects.create(feedback=feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+            Reaction.objects.create(feedback=feedback, reaction='tada')
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        # response versions, user, page, reactions, tagged users, untagged mention names
+        for count in (3, 20):
+            with self.subTest(count=count):
+                Feedback.objects.all().delete()
+                directory.invalidate()
+                self.create_mentions(count)
+                with self.assertNumQueries(6):
+                    response = self.client.get('/api/get-mentions/', {'user_id': 'UBOB'})
+                mentions = response.json()['mentions']
+                self.assertEqual(len(mentions), count)
+                self.assertEqual(mentions[0]['message'], '@bob helped @carol and @bob #0')
+
+    def test_rendered_messages_skip_mention_lookups(self):
+        self.create_mentions(5)
+        call_command('backfill_rendered_messages', stdout=io.StringIO())
+        directory.invalidate()
+
+        # response versions, user, page, reactions, tagged users
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/get-mentions/', {'user_id': 'UBOB'})
+        self.assertEqual(response.json()['mentions'][0]['message'], '@bob helped @carol and @bob #0')
+
+    def test_renaming_a_user_refreshes_rendered_messages(self):
+        self.create_mentions(2)
+        call_command('backfill_rendered_messages', stdout=io.StringIO())
+
+        carol = SlackUser.objects.get(slack_id='UCAROL')
+        carol.username = 'caroline'
+        carol.save()
+
+        self.assertEqual(
+            sorted(Feedback.objects.values_list('rendered_message', flat=True)),
+            ['@bob helped @caroline and @bob #0', '@bob helped @caroline and @bob #1'],
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        # Rows sharing a timestamp must still come back exactly once, ordered by id
+        timestamp = timezone.now()
+        for i in range(45):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}',
+                timestamp=timestamp + timedelta(minutes=i // 2), user=alice, sender=alice,
+            )
+            TaggedUser.objects.create(feedback=feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+
+    def test_get_mentions_cursor_walks_every_row_once(self):
+        messages, cursor = [], None
+        while True:
+            params = {'user_id': 'UBOB', **({'cursor': cursor} if cursor else {})}
+            body = self.client.get('/api/get-mentions/', params).json()
+            self.assertNotIn('total', body)
+            messages += [mention['original_message'] for mention in body['mentions']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(messages, [f'thanks <@UBOB> #{i}' for i in range(45)])
+
+    def test_mentions_follow_a_retimed_feedback(self):
+        feedback = Feedback.objects.get(slack_message_id='1700000000.000100')
+        feedback.timestamp += timedelta(days=1)
+        feedback.save()
+
+        self.assertEqual(TaggedUser.objects.get(feedback=feedback).feedback_timestamp, feedback.timestamp)
+        mentions = self.client.get('/api/get-mentions/', {'user_id': 'UBOB'}).json()['mentions']
+        self.assertEqual(mentions[0]['original_message'], 'thanks <@UBOB> #1')
+
+    def test_feedback_list_is_paginated(self):
+        body = self.client.get('/api/feedbacks/', {'page_size': 40, 'include_total': 'true'}).json()
+        self.assertEqual(len(body['results']), 40)
+        self.assertEqual(body['count'], 45)
+
+        body = self.client.get('/api/feedbacks/', {'page_size': 40, 'cursor': body['next_cursor']}).json()
+        self.assertEqual([row['message'] for row in body['results']], [f'thanks <@UBOB> #{i}' for i in range(40, 45)])
+        self.assertIsNone(body['next_cursor'])
+        self.assertNotIn('count', body)
+
+    def test_malformed_cursor_is_rejected(self):
+        response = self.client.get('/api/get-mentions/', {'user_id': 'UBOB', 'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/feedbacks/', {'cursor': 'not-a-cursor'}).status_code, 400)
+
+
+class FeedbackListTests(TestCase):
+    def setUp(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        for i in range(30):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}',
+                timestamp=timezone.now() + timedelta(minutes=i), user=bob, sender=alice,
+            )
+            TaggedUser.objects.create(feedback=feedback, user=bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+            Reaction.objects.create(feedback=feedback, reaction='tada')
+
+    def test_list_matches_the_model_serializer_in_three_queries(self):
+        # response versions, then page, reactions, tagged users
+        with self.assertNumQueries(4):
+            results = self.client.get('/api/feedbacks/').json()['results']
+
+        expected = FeedbackSerializer(Feedback.objects.order_by('timestamp', 'id'), many=True).data
+        self.assertEqual(results, json.loads(json.dumps(expected)))
+
+    def test_benchmark_command_reports_each_strategy(self):
+        out = io.StringIO()
+        call_command('benchmark_feedback_list', '--feedback', '50', '--users', '5', stdout=out)
+
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        for line in lines:
+            self.assertIn(': 50 rows, ', line)
+        self.assertIn('FeedbackRowSerializer, .values() rows: 50 rows, 3 queries', out.getvalue())
+        # The seed data is rolled back
+        self.assertEqual(Feedback.objects.count(), 30)
+        self.assertFalse(SlackUser.objects.filter(slack_id__startswith='UEXPLAIN').exists())
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        self.feedback = Feedback.objects.create(
+            slack_message_id='1700000000.000100', message='thanks <@UBOB>',
+            timestamp=timezone.now(), user=self.bob, sender=self.alice,
+        )
+        TaggedUser.objects.create(feedback=self.feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_unchanged_pages_are_served_after_one_version_query(self):
+        for path, params in (('/api/get-mentions/', {'user_id': 'UBOB'}), ('/api/feedbacks/', {})):
+            with self.subTest(path=path):
+                first = self.client.get(path, params)
+                etag = first['ETag']
+
+                with self.assertNumQueries(2):
+                    again = self.client.get(path, params)
+                    revalidated = self.client.get(path, params, HTTP_IF_NONE_MATCH=etag)
+
+                self.assertEqual(again.content, first.content)
+                self.assertEqual(again['ETag'], etag)
+                self.assertEqual(revalidated.status_code, 304)
+
+    def test_writes_change_the_etag_of_affected_pages(self):
+        params = {'user_id': 'UBOB'}
+        etag = self.client.get('/api/get-mentions/', params)['ETag']
+        alice_etag = self.client.get('/api/get-mentions/', {'user_id': 'UALICE'})['ETag']
+
+        Reaction.objects.create(feedback=self.feedback, reaction='tada')
+
+        response = self.client.get('/api/get-mentions/', params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['mentions'][0]['reactions'], [{'reaction': 'tada'}])
+        self.assertEqual(self.client.get('/api/get-mentions/', {'user_id': 'UALICE'})['ETag'], alice_etag)
+
+        self.alice.username = 'alicia'
+        self.alice.save()
+        self.assertNotEqual(self.client.get('/api/get-mentions/', {'user_id': 'UALICE'})['ETag'], alice_etag)
+
+    def test_versions_bumped_by_another_process_are_seen(self):
+        params = {'user_id': 'UBOB'}
+        etag = self.client.get('/api/get-mentions/', params)['ETag']
+
+        # The event worker writes the new version to the database, not to this process's cache
+        ResponseVersion.objects.filter(scope='UBOB').update(version='bumped-elsewhere')
+
+        self.assertEqual(self.client.get('/api/get-mentions/', params, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_error_responses_are_not_cached(self):
+        self.assertEqual(self.client.get('/api/get-mentions/', {'user_id': 'UCAROL'}).status_code, 404)
+        SlackUser.objects.create(slack_id='UCAROL', username='carol')
+        self.assertEqual(self.client.get('/api/get-mentions/', {'user_id': 'UCAROL'}).status_code, 200)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+
+    def add_feedback(self, i, message, sender=None, tagged=None):
+        feedback = Feedback.objects.create(
+            slack_message_id=f'17000000{i:02d}.000100', message=message,
+            timestamp=timezone.now() + timedelta(minutes=i), user=self.bob, sender=sender or self.alice,
+        )
+        if tagged:
+            TaggedUser.objects.create(feedback=feedback, user=tagged, username_mentioned=tagged.username)
+        return feedback
+
+    def search(self, **params):
+        return self.client.get('/api/feedback/search/', params).json()
+
+    def test_results_are_ranked_and_filtered(self):
+        self.add_feedback(0, 'thanks for the deploy', tagged=self.bob)
+        self.add_feedback(1, 'deploys, deploy scripts and a deployment guide', sender=self.bob)
+        self.add_feedback(2, 'thanks for the review', tagged=self.bob)
+        Reaction.objects.create(feedback=Feedback.objects.get(slack_message_id='1700000000.000100'), reaction='tada')
+
+        results = self.search(q='deploy')['results']
+        self.assertEqual([row['message'] for row in results], [
+            'deploys, deploy scripts and a deployment guide', 'thanks for the deploy',
+        ])
+        self.assertGreater(results[0]['rank'], results[1]['rank'])
+
+        for filters in ({'user_id': 'UBOB'}, {'sender_id': 'UALICE'}, {'reaction': 'tada'}):
+            with self.subTest(**filters):
+                self.assertEqual([row['message'] for row in self.search(q='deploy', **filters)['results']], ['thanks for the deploy'])
+        self.assertEqual(self.search(q='deploy', since=(timezone.now() + timedelta(minutes=1, seconds=30)).isoformat())['results'], [])
+
+    def test_edits_are_reindexed(self):
+        feedback = self.add_feedback(0, 'great demo')
+        feedback.message = 'great launch'
+        feedback.save()
+
+        self.assertEqual(self.search(q='demo')['results'], [])
+        self.assertEqual(len(self.search(q='launch')['results']), 1)
+
+    def test_cursor_walks_every_match_once(self):
+        for i in range(25):
+            self.add_feedback(i, f'kudos #{i}')
+        self.add_feedback(30, 'unrelated')
+
+        ids, cursor = [], None
+        while True:
+            body = self.search(q='kudos', page_size=10, **({'cursor': cursor} if cursor else {}))
+            ids += [row['slack_message_id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(sorted(ids), sorted(f'17000000{i:02d}.000100' for i in range(25)))
+        self.assertEqual(self.client.get('/api/feedback/search/').status_code, 400)
+        self.assertEqual(self.client.get('/api/feedback/search/', {'q': 'kudos', 'cursor': 'bad'}).status_code, 400)
+
+    def test_rows_tied_on_rank_are_paged_by_id(self):
+        feedbacks = [self.add_feedback(i, 'kudos for the launch') for i in range(7)]
+
+        rows, cursor = [], None
+        while True:
+            body = self.search(q='launch', page_size=3, **({'cursor': cursor} if cursor else {}))
+            rows += body['results']
+            cursor = body['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(len({row['rank'] for row in rows}), 1)
+        self.assertEqual([row['slack_message_id'] for row in rows], [f.slack_message_id for f in reversed(feedbacks)])
+
+    def test_benchmark_command_reports_each_query(self):
+        out = io.StringIO()
+        call_command('benchmark_search', '--feedback', '200', '--users', '5', stdout=out)
+
+        self.assertIn("common word ('thanks'): first page of 20", out.getvalue())
+        self.assertIn("no match ('zeppelin'): first page of 0", out.getvalue())
+        self.assertFalse(Feedback.objects.exists())
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        SlackUser.objects.create(slack_id='UBOB', username='bob')
+
+    def tearDown(self):
+        metrics.reset()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_view(self):
+        self.client.get('/api/get-mentions/', {'user_id': 'UBOB'})
+        self.client.get('/api/get-mentions/', {'user_id': 'UBOB'})
+        self.client.get('/api/feedbacks/')
+
+        body = self.scrape()
+        self.assertIn('feedback_request_duration_seconds_count{view="get_mentions"} 2', body)
+        self.assertIn('feedback_request_duration_seconds_count{view="feedback-list"} 1', body)
+        # The second page came from the response cache after one version query
+        self.assertIn('feedback_request_db_queries_bucket{view="get_mentions",le="1"} 1', body)
+        self.assertIn('feedback_request_outbound_calls_count{service="slack",view="get_mentions"} 2', body)
+        self.assertIn('feedback_requests_total{method="GET",status="200",view="get_mentions"} 2', body)
+        self.assertIn('# TYPE feedback_response_size_bytes histogram', body)
+
+    def test_outbound_calls_are_attributed_to_the_request(self):
+        def view(request):
+            outbound.record_latency('slack:users.info', 0.2)
+            outbound.record_latency('openai:chat.completions', 1.5)
+            return HttpResponse('ok')
+
+        metrics.RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+
+        body = self.scrape()
+        self.assertIn('feedback_request_outbound_calls_sum{service="slack",view="unmatched"} 1', body)
+        self.assertIn('feedback_request_outbound_duration_seconds_sum{service="openai",view="unmatched"} 1.5', body)
+        self.assertIn('feedback_outbound_duration_seconds_count{endpoint="slack:users.info"}', body)
+
+    @override_settings(SLOW_REQUEST_MS=1)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        def view(request):
+            SlackUser.objects.filter(slack_id='UBOB').exists()
+            time.sleep(0.01)
+            return HttpResponse('ok')
+
+        with self.assertLogs('feedback.metrics', 'WARNING') as logs:
+            metrics.RequestMetricsMiddleware(view)(RequestFactory().get('/slow/'))
+
+        self.assertIn('Slow request GET /slow/ (unmatched)', logs.output[0])
+        self.assertIn('1 queries', logs.output[0])
+        self.assertIn('feedback_slackuser', logs.output[0])
+
+
+class SummarySelectionTests(TestCase):
+    def setUp(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        self.start = timezone.now()
+        for i in range(10):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}',
+                rendered_message=f'thanks @bob #{i}',
+                timestamp=self.start + timedelta(minutes=i), user=alice, sender=alice,
+            )
+            TaggedUser.objects.create(feedback=feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+            Reaction.objects.create(feedback=feedback, reaction='tada')
+
+    def test_newest_feedback_within_the_budget_is_returned_oldest_first(self):
+        full, truncated = select_feedback_for_summary(self.bob)
+        self.assertFalse(truncated)
+        self.assertEqual(len(full), 10)
+
+        budget = sum(estimate_tokens(format_feedback_block(1, feedback)) for feedback in full[-3:])
+        selected, truncated = select_feedback_for_summary(self.bob, token_budget=budget)
+        self.assertTrue(truncated)
+        self.assertEqual([f['message'] for f in selected], ['thanks @bob #7', 'thanks @bob #8', 'thanks @bob #9'])
+        self.assertEqual(selected[0]['reactions'], ['tada'])
+        self.assertEqual(selected[0]['sender'], 'alice')
+
+    def test_posted_feedback_is_cut_to_the_budget(self):
+        posted = [
+            {'sender': 'alice', 'timestamp': (self.start + timedelta(minutes=i)).isoformat(), 'message': f'thanks #{i}'}
+            for i in range(10)
+        ]
+        budget = sum(estimate_tokens(format_feedback_block(1, feedback)) for feedback in posted[-3:])
+        with override_settings(SUMMARY_PROMPT_TOKEN_BUDGET=budget):
+            summary_input = resolve_summary_input({'feedback': posted, 'username': 'bob'})
+
+        self.assertTrue(summary_input.truncated)
+        self.assertEqual([f['message'] for f in summary_input.feedback], ['thanks #7', 'thanks #8', 'thanks #9'])
+
+    def test_time_range_limits_the_selection(self):
+        selected, _ = select_feedback_for_summary(
+            self.bob, since=self.start + timedelta(minutes=2), until=self.start + timedelta(minutes=5),
+        )
+        self.assertEqual([f['message'] for f in selected], ['thanks @bob #2', 'thanks @bob #3', 'thanks @bob #4'])
+
+    def test_unknown_user_and_bad_range_are_rejected(self):
+        response = self.client.post('/api/feedback/summarize/', {'user_id': 'UNOBODY'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.post(
+            '/api/feedback/summarize/', {'user_id': 'UBOB', 'since': 'yesterday'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class SummaryCacheTests(TestCase):
+    def setUp(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        self.feedback = Feedback.objects.create(
+            slack_message_id='1700000000.000100', message='thanks <@UBOB>', rendered_message='thanks @bob',
+            timestamp=timezone.now(), user=alice, sender=alice,
+        )
+        TaggedUser.objects.create(feedback=self.feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+
+    def cache_current_summary(self):
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        key = summary_cache_key(build_summary_request(feedback_data, 'bob'))
+        store_summary(key, 'Bob is helpful.', len(feedback_data), self.bob)
+
+    def test_repeated_request_is_served_from_the_cache(self):
+        self.cache_current_summary()
+
+        response = self.client.post('/api/feedback/summarize/', {'user_id': 'UBOB'}, content_type='application/json')
+        self.assertEqual(response.json()['summary'], 'Bob is helpful.')
+        self.assertTrue(response.json()['cached'])
+
+    def test_new_rows_for_the_user_invalidate_the_entry(self):
+        self.cache_current_summary()
+        Reaction.objects.create(feedback=self.feedback, reaction='tada')
+        self.assertFalse(CachedSummary.objects.exists())
+
+        self.cache_current_summary()
+        apply_reaction_events([{'type': 'reaction_added', 'reaction': '+1', 'item': {'ts': '1700000000.000100'}}])
+        self.assertFalse(CachedSummary.objects.exists())
+
+    @override_settings(SUMMARY_CACHE_SIZE=2)
+    def test_least_recently_used_entries_are_evicted(self):
+        for key in ('a', 'b', 'c'):
+            store_summary(key, f'summary {key}', 1)
+        self.assertEqual(sorted(CachedSummary.objects.values_list('key', flat=True)), ['b', 'c'])
+
+
+class FakeOpenAITestCase(TestCase):
+    """Points the OpenAI clients at a local FakeOpenAIHandler and seeds eleven mentions of Bob."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeOpenAIHandler)
+        self.server.lock = threading.Lock()
+        self.server.prompts = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.settings_override = override_settings(
+            OPENAI_API_KEY='test',
+            OPENAI_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}/v1',
+            SUMMARY_CHUNK_TOKENS=60,
+        )
+        self.settings_override.enable()
+        outbound.reset_openai_clients()
+
+        self.alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        self.bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        self.start = timezone.now().replace(microsecond=0)
+        for i in range(11):
+            self.add_feedback(i)
+
+    def tearDown(self):
+        outbound.reset_openai_clients()
+        self.settings_override.disable()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_feedback(self, i):
+        feedback = Feedback.objects.create(
+            slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}', rendered_message=f'thanks @bob #{i}',
+            timestamp=self.start + timedelta(minutes=i), user=self.alice, sender=self.alice,
+        )
+        TaggedUser.objects.create(feedback=feedback, user=self.bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+
+    def kinds(self):
+        return [kind for kind, _ in self.server.prompts]
+
+
+class MapReduceSummaryTests(FakeOpenAITestCase):
+    def test_chunks_are_summarized_then_merged(self):
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        chunks = chunk_feedback(feedback_data)
+        self.assertGreater(len(chunks), 1)
+
+        summary, cached = views.generate_feedback_summary(feedback_data, 'bob', self.bob)
+
+        self.assertEqual(summary, 'summary text')
+        self.assertFalse(cached)
+        self.assertEqual(self.kinds(), ['notes'] * len(chunks) + ['summary'])
+        self.assertEqual(self.server.prompts[-1][1].count('notes text'), len(chunks))
+
+        self.assertEqual(views.generate_feedback_summary(feedback_data, 'bob', self.bob), ('summary text', True))
+        self.assertEqual(len(self.server.prompts), len(chunks) + 1)
+
+    def test_new_feedback_only_resummarizes_the_newest_chunk(self):
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        views.generate_feedback_summary(feedback_data, 'bob', self.bob)
+        self.server.prompts.clear()
+
+        self.add_feedback(11)
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        views.generate_feedback_summary(feedback_data, 'bob', self.bob)
+
+        self.assertEqual(self.kinds(), ['notes', 'summary'])
+        self.assertIn('thanks @bob #11', self.server.prompts[0][1])
+
+    def test_async_engine_matches(self):
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        summary, cached = async_to_sync(async_views.agenerate_feedback_summary)(feedback_data, 'bob', self.bob)
+
+        self.assertEqual((summary, cached), ('summary text', False))
+        self.assertEqual(self.kinds(), ['notes'] * len(chunk_feedback(feedback_data)) + ['summary'])
+
+    @override_settings(SUMMARY_CHUNK_TOKENS=80, SUMMARY_CHUNK_DAYS=1)
+    def test_feedback_dropped_by_the_budget_keeps_the_chunk_boundaries(self):
+        carol = SlackUser.objects.create(slack_id='UCAROL', username='carol')
+        noon = datetime(2026, 1, 1, 12, tzinfo=dt_timezone.utc)
+
+        def mention(day, i):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'carol.{day}.{i}', message=f'thanks <@UCAROL> day {day} #{i}',
+                rendered_message=f'thanks @carol day {day} #{i}',
+                timestamp=noon + timedelta(days=day, minutes=i), user=self.alice, sender=self.alice,
+            )
+            TaggedUser.objects.create(feedback=feedback, user=carol, username_mentioned='carol', slack_id_mentioned='UCAROL')
+
+        for day in range(3):
+            mention(day, 0)
+            mention(day, 1)
+        feedback_data, _ = select_feedback_for_summary(carol)
+        budget = sum(estimate_tokens(format_feedback_block(i + 1, f)) for i, f in enumerate(feedback_data))
+        self.assertEqual([len(chunk) for chunk in chunk_feedback(feedback_data)], [2, 2, 2])
+        views.generate_feedback_summary(feedback_data, 'carol', carol)
+        self.server.prompts.clear()
+
+        # The seventh mention no longer fits: the rest of day 0 goes with the oldest one
+        mention(2, 2)
+        feedback_data, truncated = select_feedback_for_summary(carol, token_budget=budget)
+        self.assertTrue(truncated)
+        self.assertEqual([len(chunk) for chunk in chunk_feedback(feedback_data)], [2, 3])
+        views.generate_feedback_summary(feedback_data, 'carol', carol)
+
+        self.assertEqual(self.kinds(), ['notes', 'summary'])
+        self.assertIn('thanks @carol day 2 #2', self.server.prompts[0][1])
+
+
+class StreamingSummaryTests(FakeOpenAITestCase):
+    def stream(self):
+        response = self.client.post('/api/feedback/summarize/stream/', {'user_id': 'UBOB'}, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = []
+        for block in b''.join(response.streaming_content).decode().strip().split('\n\n'):
+            event, data = block.split('\n')
+            events.append((event.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    def test_tokens_are_streamed_then_cached(self):
+        metrics.reset()
+        events = self.stream()
+
+        feedback_data, _ = select_feedback_for_summary(self.bob)
+        self.assertEqual(events[0], ('progress', {'stage': 'preparing', 'chunks': len(chunk_feedback(feedback_data))}))
+        self.assertEqual(''.join(data['text'] for event, data in events if event == 'token'), 'summary text')
+        self.assertEqual(events[-1], ('done', {'feedback_count': 11, 'truncated': False, 'cached': False}))
+        self.assertEqual(self.kinds()[-1], 'summary')
+        exported = metrics.render_prometheus(outbound.latency_report())
+        self.assertIn('feedback_summary_stream_seconds_count{stage="first_byte"} 1', exported)
+        self.assertIn('feedback_summary_stream_seconds_count{stage="first_token"} 1', exported)
+        self.assertNotIn('summarize:stream', exported)
+
+        events = self.stream()
+        self.assertEqual(events, [('token', {'text': 'summary text'}), ('done', {'feedback_count': 11, 'truncated': False, 'cached': True})])
+
+    def test_unknown_user_is_rejected_before_streaming(self):
+        response = self.client.post('/api/feedback/summarize/stream/', {'user_id': 'UNOBODY'}, content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+
+class SummaryJobTests(FakeOpenAITestCase):
+    def precompute(self):
+        call_command('precompute_summaries', '--workers', '1', stdout=io.StringIO())
+
+    def test_precomputed_summary_is_served_and_refreshed_after_new_feedback(self):
+        self.assertEqual(self.client.get('/api/feedback/summary/UBOB/').json()['status'], SummaryJob.PENDING)
+
+        self.precompute()
+        body = self.client.get('/api/feedback/summary/UBOB/').json()
+        self.assertEqual((body['status'], body['summary'], body['feedback_count']), ('done', 'summary text', 11))
+
+        self.add_feedback(11)
+        body = self.client.get('/api/feedback/summary/UBOB/').json()
+        self.assertEqual((body['status'], body['summary']), ('pending', 'summary text'))
+
+        self.server.prompts.clear()
+        self.precompute()
+        body = self.client.get('/api/feedback/summary/UBOB/').json()
+        self.assertEqual((body['status'], body['feedback_count']), ('done', 12))
+        self.assertEqual(self.kinds(), ['notes', 'summary'])
+
+    def test_tagged_users_are_scheduled_and_unchanged_ones_skipped(self):
+        self.precompute()
+        self.assertEqual(SummaryJob.objects.get().slack_user, self.bob)
+
+        self.server.prompts.clear()
+        self.precompute()
+        self.assertEqual(self.server.prompts, [])
+
+    def test_unknown_user_is_not_found(self):
+        self.assertEqual(self.client.get('/api/feedback/summary/UNOBODY/').status_code, 404)
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        alice = SlackUser.objects.create(slack_id='UALICE', username='alice')
+        bob = SlackUser.objects.create(slack_id='UBOB', username='bob')
+        start = timezone.now()
+        for i in range(5):
+            feedback = Feedback.objects.create(
+                slack_message_id=f'17000000{i:02d}.000100', message=f'thanks <@UBOB> #{i}', rendered_message=f'thanks @bob #{i}',
+                timestamp=start + timedelta(minutes=i), user=alice, sender=alice,
+            )
+            if i % 2 == 0:
+                TaggedUser.objects.create(feedback=feedback, user=bob, username_mentioned='bob', slack_id_mentioned='UBOB')
+            Reaction.objects.create(feedback=feedback, reaction=f'emoji{i}')
+
+    def test_ndjson_export_attaches_relations_across_chunks(self):
+        out = io.StringIO()
+        call_command('export_feedback', '--chunk-size', '2', stdout=out, stderr=io.StringIO())
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([r['rendered_message'] for r in records], [f'thanks @bob #{i}' for i in range(5)])
+        self.assertEqual([r['reactions'] for r in records], [[f'emoji{i}'] for i in range(5)])
+        self.assertEqual(records[0]['tagged_users'], [{'slack_id': 'UBOB', 'username': 'bob'}])
+        self.assertEqual(records[1]['tagged_users'], [])
+        self.assertEqual(records[0]['recipient'], {'slack_id': 'UALICE', 'username': 'alice'})
+
+    def test_csv_endpoint_streams_the_users_feedback(self):
+        response = self.client.get('/api/feedback/export/', {'format': 'csv', 'user_id': 'UBOB'})
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['slack_message_id', 'timestamp', 'source'])
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[1].endswith('emoji0,UBOB'))
+
+    def test_unknown_format_is_rejected(self):
+        self.assertEqual(self.client.get('/api/feedback/export/', {'format': 'xml'}).status_code, 400)
+
+    def test_async_export_matches_the_sync_view(self):
+        request = RequestFactory().get('/api/feedback/export/', {'format': 'csv', 'user_id': 'UBOB'})
+        sync_body = b''.join(views.export_feedback(request).streaming_content)
+
+        async def read():
+            response = await async_views.export_feedback(request)
+            self.assertTrue(response.is_async)
+            return b''.join([part async for part in response.streaming_content])
+
+        self.assertEqual(async_to_sync(read)(), sync_body)
+
+
+class ExplainQueriesTests(TestCase):
+    def test_seed_data_is_rolled_back(self):
+        out = io.StringIO()
+        call_command('explain_queries', '--feedback', '200', '--users', '5', stdout=out)
+
+        self.assertIn('get_mentions deep page', out.getvalue())
+        self.assertIn('reaction_removed lookup', out.getvalue())
+        self.assertFalse(Feedback.objects.exists())
+        self.assertFalse(SlackUser.objects.exists())
+
+    def test_mention_pages_are_read_in_index_order(self):
+        slack_user = seed(2000, 5)
+        for name, queryset in hot_queries(slack_user):
+            if name.startswith('get_mentions'):
+                plan = queryset.explain()
+                self.assertNotIn('TEMP B-TREE', plan, name)
+                self.assertNotIn('Sort', plan, name)
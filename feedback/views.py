@@ -1,32 +1,56 @@
 import json
-import re
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+import time
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
-from django.utils import timezone
-from .models import Feedback, Reaction, SlackUser, TaggedUser
+from .models import Feedback, SlackUser, TaggedUser
 from django.conf import settings
 from rest_framework import viewsets
-from .serializers import FeedbackSerializer
-from django.db.models import Prefetch
+from .serializers import FEEDBACK_ROW_FIELDS, FeedbackRowSerializer, FeedbackSerializer, attach_feedback_relations
+from .pagination import (
+    FeedbackKeysetPagination, apply_cursor, apply_rank_cursor, encode_rank_cursor, include_total, split_page,
+)
+from .response_cache import ALL_FEEDBACK, cached_json_response
+from .rendering import MENTION_RE, render_message
+from .summaries import (
+    build_summary_request, chunk_feedback, get_cached_summary, openai_completions, parse_time_bound,
+    prepare_final_request, resolve_summary_input, sse_event, store_summary, stream_deltas, summarize,
+    summary_cache_key,
+)
+from .slack_directory import directory
+from .events import enqueue_event, process_event
+from .mention_hub import get_hub, mention_events
+from .summary_jobs import request_summary
+from .stats import user_stats
+from .identities import session_identity
+from .metrics import record_stream_timing, render_prometheus
+from .export import CONTENT_TYPES, EXPORT_FORMATS, export_queryset, iter_export
+from .search import MAX_SEARCH_PAGE_SIZE, SEARCH_PAGE_SIZE, search_queryset
+from . import outbound
+from django.db.models import F, Prefetch
 from django.urls import reverse
 from django.shortcuts import redirect
-from slack_sdk import WebClient
-from slack_sdk.errors import SlackApiError
-import openai
 from slack_sdk.signature import SignatureVerifier
 import logging
 
 SLACK_VERIFICATION_TOKEN = settings.SLACK_BOT_TOKEN  # From Slack settings
 logger = logging.getLogger(__name__)
 
+MENTIONS_PAGE_SIZE = 20
+
 @csrf_exempt
 def slack_event_listener(request):
     """
-    Listens to Slack events and stores them in the database.
+    Listens to Slack events and stores them in the database. With
+    SLACK_EVENTS_QUEUED enabled the event is only appended to the SlackEvent
+    queue and acknowledged; manage.py process_slack_events applies it later.
     """
     if request.method == 'POST':
         try:
+            if settings.SLACK_SIGNING_SECRET:
+                verifier = SignatureVerifier(settings.SLACK_SIGNING_SECRET)
+                if not verifier.is_valid_request(request.body, dict(request.headers)):
+                    return JsonResponse({'error': 'Invalid signature'}, status=403)
+
             data = json.loads(request.body.decode('utf-8'))
             logger.info("Received data: %s", data)
 
@@ -36,82 +60,10 @@ def slack_event_listener(request):
 
             # Handle actual events
             if data.get('type') == 'event_callback':
-                event = data.get('event', {})
-                event_type = event.get('type')
-                
-                if event_type == 'message' and 'subtype' not in event:
-                    # Handle new message
-                    slack_message_id = event.get('ts')
-                    message_text = event.get('text')
-                    slack_user_id = event.get('user')
-                    timestamp = timezone.make_aware(timezone.datetime.fromtimestamp(float(slack_message_id)))
-
-                    # Get or create the SlackUser
-                    slack_user, _ = SlackUser.objects.get_or_create(
-                        slack_id=slack_user_id,
-                        defaults={'username': ''}  # You might want to fetch the username from Slack API
-                    )
-
-                    # Create or update the feedback message
-                    feedback_message, created = Feedback.objects.update_or_create(
-                        slack_message_id=slack_message_id,
-                        defaults={
-                            'message': message_text,
-                            'timestamp': timestamp,
-                            'user': slack_user,
-                            'sender': slack_user,
-                            'source': 'slack',
-                        }
-                    )
-                    logger.info(f"{'Created' if created else 'Updated'} message: {feedback_message.id}")
-
-                elif event_type == 'reaction_added':
-                    # Handle new reaction
-                    slack_message_id = event.get('item', {}).get('ts')
-                    reaction_name = event.get('reaction')
-
-                    try:
-                        # Get the related message
-                        feedback_message = Feedback.objects.get(slack_message_id=slack_message_id)
-                        
-                        # Always create a new reaction entry
-                        reaction = Reaction.objects.create(
-                            feedback=feedback_message,
-                            reaction=reaction_name
-                        )
-                        logger.info(f"Created reaction: {reaction.reaction}")
-
-                    except Feedback.DoesNotExist:
-                        logger.error(f"Message not found for reaction: {slack_message_id}")
-
-                elif event_type == 'reaction_removed':
-                    # Handle reaction removal
-                    slack_message_id = event.get('item', {}).get('ts')
-                    reaction_name = event.get('reaction')
-
-                    try:
-                        feedback_message = Feedback.objects.get(slack_message_id=slack_message_id)
-                        
-                        # Delete one instance of the reaction
-                        reaction = Reaction.objects.filter(
-                            feedback=feedback_message,
-                            reaction=reaction_name
-                        ).first()
-                        if reaction:
-                            reaction.delete()
-                            logger.info(f"Deleted reaction {reaction_name} from message {slack_message_id}")
-
-                    except Feedback.DoesNotExist:
-                        logger.error(f"Message not found for reaction: {slack_message_id}")
-
-                elif event_type == 'message' and event.get('subtype') == 'message_deleted':
-                    # Handle message deletion
-                    deleted_ts = event.get('deleted_ts')
-                    try:
-                        Feedback.objects.filter(slack_message_id=deleted_ts).delete()
-                        logger.info(f"Deleted message {deleted_ts}")
-                    except Exception as e:
-                        logger.error(f"Error deleting message: {str(e)}")
+                if settings.SLACK_EVENTS_QUEUED:
+                    enqueue_event(data, int(request.headers.get('X-Slack-Retry-Num', 0)))
+                else:
+                    process_event(data.get('event', {}))
 
             return JsonResponse({'status': 'ok'})
 
@@ -124,226 +76,298 @@ def slack_event_listener(request):
 
     return JsonResponse({'error': 'Method not allowed'}, status=405)
 
+# apply_cursor order for get_mentions_queryset: the TaggedUser copies of
+# (timestamp, id), so the seek reads the (user, feedback_timestamp, feedback)
+# index in order instead of sorting every mention of the user
+MENTION_ORDER = ('mention_timestamp', 'mention_feedback_id')
+
+
+def get_mentions_queryset(slack_user):
+    """Feedback that tags slack_user, oldest first, with everything serialize_mentions reads."""
+    return Feedback.objects.filter(tagged_users__user=slack_user)\
+        .alias(mention_timestamp=F('tagged_users__feedback_timestamp'), mention_feedback_id=F('tagged_users__feedback_id'))\
+        .order_by(*MENTION_ORDER)\
+        .prefetch_related(
+            'reactions',  # Simplified - no need to select_related('user') for reactions
+            Prefetch('tagged_users', queryset=TaggedUser.objects.select_related('user'))
+        ).select_related('sender', 'user')
+
+def serialize_mentions(feedbacks):
+    """Builds the get_mentions payload for a page of feedback from get_mentions_queryset."""
+    feedbacks = list(feedbacks)
+
+    # Messages are rendered at ingest time; only rows that predate
+    # rendered_message need their mentions resolved here. Tagged users are
+    # already prefetched and anyone else takes a single directory lookup.
+    unrendered = [feedback for feedback in feedbacks if not feedback.rendered_message]
+    usernames = {}
+    for feedback in unrendered:
+        for tu in feedback.tagged_users.all():
+            usernames[tu.user.slack_id] = tu.user.username
+    untagged = {
+        mentioned_id
+        for feedback in unrendered
+        for mentioned_id in MENTION_RE.findall(feedback.message)
+    } - usernames.keys()
+    if untagged:
+        usernames.update(directory.get_usernames(untagged, fetch=False))
+
+    data = []
+    for feedback in feedbacks:
+        processed_message = feedback.rendered_message or render_message(feedback.message, usernames)
+
+        # Simplified reaction data - just return the reaction names
+        reactions = [{"reaction": r.reaction} for r in feedback.reactions.all()]
+        sender = {
+            "sender_id": feedback.sender.slack_id if feedback.sender else None,
+            "sender_username": feedback.sender.username if feedback.sender else "Unknown"
+        }
+        
+        # Get tagged users information
+        tagged_users = [
+            {
+                "user_id": tu.user.slack_id,
+                "username": tu.user.username,
+                "username_mentioned": tu.username_mentioned
+            } for tu in feedback.tagged_users.all()
+        ]
+        
+        data.append({
+            "message": processed_message,
+            "original_message": feedback.message,
+            "timestamp": feedback.timestamp,
+            "mentioned_in": feedback.slack_message_id,
+            "reactions": reactions,  # Now just contains reaction names
+            "sender": sender,
+            "source": feedback.source,
+            "tagged_users": tagged_users,
+            "recipient": {
+                "user_id": feedback.user.slack_id,
+                "username": feedback.user.username
+            }
+        })
+    return data
+
 @csrf_exempt
 def get_mentions(request):
     """
-    Returns paginated mentions where a user is tagged, including reactions and sender details.
+    Returns a page of mentions where a user is tagged, including reactions and sender details.
+    Pass the returned next_cursor back as ?cursor= for the following page; the total
+    is only counted when ?include_total=true is given. Pages are cached per user and
+    carry an ETag, so a repeated request is answered without querying the database.
     """
     if request.method == 'GET':
         user_id = request.GET.get('user_id')
-        page = int(request.GET.get('page', 1))
 
         if not user_id:
             return JsonResponse({"error": "User ID is required"}, status=400)
 
-        try:
-            # Get Slack user
-            slack_user = SlackUser.objects.get(slack_id=user_id)
-
-            # Optimize query using prefetch_related for efficiency
-            mentioned_messages = TaggedUser.objects.filter(user=slack_user).select_related('feedback')
-            feedback_qs = Feedback.objects.filter(id__in=mentioned_messages.values('feedback_id'))\
-                .order_by("timestamp")\
-                .prefetch_related(
-                    'reactions',  # Simplified - no need to select_related('user') for reactions
-                    Prefetch('tagged_users', queryset=TaggedUser.objects.select_related('user'))
-                ).select_related('sender', 'user')
-
-            # Paginate results (limit 20 mentions per page)
-            paginator = Paginator(feedback_qs, 20)
-            mentions_page = paginator.get_page(page)
-
-            # Prepare response
-            data = []
-            for feedback in mentions_page:
-                # Process the message to replace user IDs with usernames
-                processed_message = feedback.message
-                
-                # Find all user mentions in the format <@U12345678>
-                user_mentions = re.findall(r'<@([A-Z0-9]+)>', processed_message)
-                
-                # Replace each mention with the username
-                for mentioned_id in user_mentions:
-                    try:
-                        # Try to find the user in our database
-                        mentioned_user = SlackUser.objects.filter(slack_id=mentioned_id).first()
-                        if mentioned_user and mentioned_user.username:
-                            # Replace the ID with the username
-                            processed_message = processed_message.replace(
-                                f'<@{mentioned_id}>', 
-                                f'@{mentioned_user.username}'
-                            )
-                    except Exception as e:
-                        print(f"Error processing mention for {mentioned_id}: {e}")
-                
-                # Simplified reaction data - just return the reaction names
-                reactions = [{"reaction": r.reaction} for r in feedback.reactions.all()]
-                sender = {
-                    "sender_id": feedback.sender.slack_id if feedback.sender else None,
-                    "sender_username": feedback.sender.username if feedback.sender else "Unknown"
-                }
-                
-                # Get tagged users information
-                tagged_users = [
-                    {
-                        "user_id": tu.user.slack_id,
-                        "username": tu.user.username,
-                        "username_mentioned": tu.username_mentioned
-                    } for tu in feedback.tagged_users.all()
-                ]
-                
-                data.append({
-                    "message": processed_message,
-                    "original_message": feedback.message,
-                    "timestamp": feedback.timestamp,
-                    "mentioned_in": feedback.slack_message_id,
-                    "reactions": reactions,  # Now just contains reaction names
-                    "sender": sender,
-                    "source": feedback.source,
-                    "tagged_users": tagged_users,
-                    "recipient": {
-                        "user_id": feedback.user.slack_id,
-                        "username": feedback.user.username
-                    }
-                })
+        return cached_json_response(request, user_id, lambda: mentions_response(request, user_id))
 
-            return JsonResponse({
-                "mentions": data,
-                "total_pages": paginator.num_pages,
-                "current_page": mentions_page.number
-            }, status=200)
+    return JsonResponse({"error": "Invalid request"}, status=400)
 
-        except SlackUser.DoesNotExist:
-            return JsonResponse({"error": "User not found"}, status=404)
 
-    return JsonResponse({"error": "Invalid request"}, status=400)
+def mentions_response(request, user_id):
+    try:
+        # Get Slack user
+        slack_user = SlackUser.objects.get(slack_id=user_id)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    # Optimize query using prefetch_related for efficiency
+    feedback_qs = get_mentions_queryset(slack_user)
+
+    # Seek past the cursor and fetch one extra row to know whether there is a next page
+    try:
+        page_qs = apply_cursor(feedback_qs, request.GET.get('cursor'), MENTION_ORDER)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    mentions_page, next_cursor = split_page(list(page_qs[:MENTIONS_PAGE_SIZE + 1]), MENTIONS_PAGE_SIZE)
+
+    # Prepare response
+    body = {
+        "mentions": serialize_mentions(mentions_page),
+        "next_cursor": next_cursor,
+    }
+    if include_total(request.GET):
+        body["total"] = feedback_qs.count()
+
+    return JsonResponse(body, status=200)
+
+
+@csrf_exempt
+def stream_mentions(request):
+    """
+    Pushes new mentions of ?user_id= and reactions on them as server-sent
+    events, so clients load get_mentions once and then apply the deltas
+    instead of polling. Events are 'ready', 'mention', 'reaction' and
+    'resync', the last telling a client that fell behind to re-fetch.
+    Each connection holds a worker thread here; ASGI deployments get the
+    async_views version.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    user_id = request.GET.get('user_id')
+    if not user_id:
+        return JsonResponse({"error": "User ID is required"}, status=400)
+    if not SlackUser.objects.filter(slack_id=user_id).exists():
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    events = mention_events(get_hub().subscribe(user_id), settings.MENTION_STREAM_KEEPALIVE)
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the events
+    return response
 
 
 class FeedbackViewSet(viewsets.ModelViewSet):
-    queryset = Feedback.objects.all()
+    queryset = Feedback.objects.select_related('sender', 'user').prefetch_related(
+        'reactions',
+        Prefetch('tagged_users', queryset=TaggedUser.objects.select_related('user')),
+    )
     serializer_class = FeedbackSerializer
+    pagination_class = FeedbackKeysetPagination
+
+    def list(self, request, *args, **kwargs):
+        # Pages are cached until any feedback is written; see response_cache
+        return cached_json_response(request, ALL_FEEDBACK, lambda: self.list_response(request))
+
+    def list_response(self, request):
+        # Listing reads plain rows: one query for the page plus one each for reactions and tagged users
+        rows = self.paginate_queryset(self.filter_queryset(Feedback.objects.values(*FEEDBACK_ROW_FIELDS)))
+        data = FeedbackRowSerializer(attach_feedback_relations(rows), many=True).data
+        return JsonResponse(self.get_paginated_response(data).data)
+
+@csrf_exempt
+def get_user_stats(request, user_id):
+    """
+    Returns the precomputed feedback statistics of a user: feedback received
+    in total and per month, the reactions on it and the top senders.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    try:
+        slack_user = SlackUser.objects.get(slack_id=user_id)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    return JsonResponse(user_stats(slack_user), status=200)
+
+@csrf_exempt
+def export_feedback(request):
+    """
+    Streams every feedback row with sender, recipient, reactions and tagged
+    users as NDJSON (?format=ndjson, the default) or CSV (?format=csv).
+    ?user_id= limits the export to feedback tagging that user and
+    ?since=/?until= take ISO 8601 datetimes.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}, status=400)
+
+    try:
+        since = parse_time_bound(request.GET.get('since'), 'since')
+        until = parse_time_bound(request.GET.get('until'), 'until')
+        slack_user = SlackUser.objects.get(slack_id=request.GET['user_id']) if request.GET.get('user_id') else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    response = StreamingHttpResponse(
+        iter_export(export_format, export_queryset(slack_user, since, until)),
+        content_type=CONTENT_TYPES[export_format],
+    )
+    response['Content-Disposition'] = f'attachment; filename="feedback.{export_format}"'
+    return response
+
+@csrf_exempt
+def search_feedback(request):
+    """
+    Ranked full-text search over feedback messages (?q=), best match first.
+    Optional filters: ?user_id= (tagged user), ?sender_id=, ?reaction= and
+    ?since=/?until= as ISO 8601 datetimes. Pass the returned next_cursor
+    back as ?cursor= for the following page.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    q = request.GET.get('q', '').strip()
+    if not q:
+        return JsonResponse({"error": "q is required"}, status=400)
+    try:
+        page_size = min(max(int(request.GET.get('page_size', SEARCH_PAGE_SIZE)), 1), MAX_SEARCH_PAGE_SIZE)
+    except ValueError:
+        page_size = SEARCH_PAGE_SIZE
+
+    try:
+        queryset = search_queryset(
+            q,
+            user_id=request.GET.get('user_id'),
+            sender_id=request.GET.get('sender_id'),
+            reaction=request.GET.get('reaction'),
+            since=parse_time_bound(request.GET.get('since'), 'since'),
+            until=parse_time_bound(request.GET.get('until'), 'until'),
+        )
+        queryset = apply_rank_cursor(queryset, request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    rows = list(queryset.values(*FEEDBACK_ROW_FIELDS, 'rank')[:page_size + 1])
+    rows, next_cursor = split_page(rows, page_size, encode=encode_rank_cursor)
+    results = [
+        {**FeedbackRowSerializer(row).data, "rank": row['rank']}
+        for row in attach_feedback_relations(rows)
+    ]
+    return JsonResponse({"results": results, "next_cursor": next_cursor}, status=200)
 
 @csrf_exempt
 def auth_callback(request):
     """Handle OAuth callback and return user ID"""
     if request.method == 'POST':
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Not authenticated"}, status=401)
         try:
-            data = json.loads(request.body)
-            code = data.get('code')
-            
-            # Process the OAuth code and get user info
-            # This is a simplified example - you'd need to implement the actual OAuth flow
-            
             # Return the user's Slack ID that can be used for API calls
-            user = request.user
-            slack_user = SlackUser.objects.filter(username=user.email.split('@')[0]).first()
-            
-            if slack_user:
-                return JsonResponse({
-                    "user_id": slack_user.slack_id,
-                    "username": slack_user.username
-                })
-            else:
-                # Create a new SlackUser if one doesn't exist
-                email_username = user.email.split('@')[0]
-                slack_user = SlackUser.objects.create(
-                    slack_id=f"temp_{user.id}",  # Temporary ID until real Slack ID is available
-                    username=email_username
-                )
-                return JsonResponse({
-                    "user_id": slack_user.slack_id,
-                    "username": slack_user.username
-                })
-                
+            identity = session_identity(request)
+            return JsonResponse({
+                "user_id": identity['user_id'],
+                "username": identity['username']
+            })
+
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=400)
-            
+
     return JsonResponse({"error": "Invalid request"}, status=400)
 
 @csrf_exempt
 def get_user_info(request):
-    """Get user info from session and link with Slack ID"""
+    """
+    Get user info from session and link with Slack ID. Users Slack has not
+    matched yet get a temporary ID and a note; manage.py
+    reconcile_slack_identities replaces it in the background.
+    """
     if request.user.is_authenticated:
         try:
-            # Get email username
-            email = request.user.email
-            email_username = email.split('@')[0]
-            
-            # First, try to find a SlackUser by username
-            slack_user = SlackUser.objects.filter(username=email_username).first()
-            
-            if slack_user and not slack_user.slack_id.startswith('temp_'):
-                # User already exists with a real Slack ID
-                return JsonResponse({
-                    "user_id": slack_user.slack_id,
-                    "username": slack_user.username,
-                    "email": email
-                })
-            
-            # Need to fetch from Slack API
-            try:
-                # Disable SSL verification to work around certificate issues
-                import ssl
-                ssl._create_default_https_context = ssl._create_unverified_context
-                
-                # Initialize Slack client
-                slack_client = WebClient(token=settings.SLACK_BOT_TOKEN)
-                
-                # Look up user by email
-                slack_response = slack_client.users_lookupByEmail(email=email)
-                slack_id = slack_response['user']['id']
-                slack_username = slack_response['user']['name']
-                
-                # Update or create the SlackUser
-                if slack_user:
-                    # Update existing user
-                    slack_user.slack_id = slack_id
-                    slack_user.save()
-                else:
-                    # Create new user
-                    slack_user = SlackUser.objects.create(
-                        slack_id=slack_id,
-                        username=email_username
-                    )
-                
-                return JsonResponse({
-                    "user_id": slack_id,
-                    "username": slack_username,
-                    "email": email
-                })
-                
-            except Exception as slack_error:
-                print(f"Error fetching from Slack API: {slack_error}")
-                
-                # If we couldn't fetch from Slack, use a temporary ID
-                if not slack_user:
-                    # Create a new user with a unique temporary ID
-                    temp_id = f"temp_{request.user.id}"
-                    
-                    # Check if this temp_id already exists
-                    while SlackUser.objects.filter(slack_id=temp_id).exists():
-                        # If it exists, add a random suffix
-                        import random
-                        temp_id = f"temp_{request.user.id}_{random.randint(1000, 9999)}"
-                    
-                    slack_user = SlackUser.objects.create(
-                        slack_id=temp_id,
-                        username=email_username
-                    )
-                
-                return JsonResponse({
-                    "user_id": slack_user.slack_id,
-                    "username": email_username,
-                    "email": email,
-                    "note": "Could not fetch real Slack ID"
-                })
-                
+            identity = session_identity(request)
         except Exception as e:
-            import traceback
-            print(f"Error in get_user_info: {str(e)}")
-            print(traceback.format_exc())
+            logger.exception("Error in get_user_info")
             return JsonResponse({"error": str(e)}, status=400)
-    
+
+        body = {
+            "user_id": identity['user_id'],
+            "username": identity['username'],
+            "email": request.user.email
+        }
+        if not identity['resolved']:
+            body["note"] = "Could not fetch real Slack ID"
+        return JsonResponse(body)
+
     return JsonResponse({"error": "Not authenticated"}, status=401)
 
 def oauth_success(request):
@@ -367,99 +391,162 @@ def debug_session(request):
         "session_key": request.session.session_key,
     })
 
+@csrf_exempt
+def debug_outbound(request):
+    """Debug endpoint with per-endpoint latency histograms of outbound Slack and OpenAI calls and streamed summaries"""
+    return JsonResponse({"latency": outbound.latency_report()})
+
+def metrics(request):
+    """Per-view request metrics and outbound call latencies in the Prometheus text format"""
+    return HttpResponse(
+        render_prometheus(outbound.latency_report()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
 @csrf_exempt
 def summarize_feedback(request):
     """
-    Accepts feedback data and username from the frontend and returns an AI-generated summary.
+    Returns an AI-generated summary of a user's feedback. The body either holds
+    a user_id (and optional ISO since/until bounds), in which case the
+    feedback is read from the database within the prompt token budget, or the
+    feedback array and username posted by the frontend.
     """
     if request.method != 'POST':
         return JsonResponse({"error": "Only POST method is allowed"}, status=405)
     
     try:
         data = json.loads(request.body)
-        feedback_data = data.get('feedback', [])
-        username = data.get('username', 'the user')  # Get username from request
-        
-        if not feedback_data:
-            return JsonResponse({"error": "No feedback data provided"}, status=400)
+        feedback_data, username, truncated, slack_user = resolve_summary_input(data)
         
         # Call the AI model to summarize the feedback
-        summary = generate_feedback_summary(feedback_data, username)
+        summary, cached = generate_feedback_summary(feedback_data, username, slack_user)
         
         return JsonResponse({
             "summary": summary,
-            "feedback_count": len(feedback_data)
+            "feedback_count": len(feedback_data),
+            "truncated": truncated,
+            "cached": cached
         }, status=200)
         
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
     except Exception as e:
-        import traceback
-        print(f"Error in summarize_feedback: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("Error in summarize_feedback")
         return JsonResponse({"error": str(e)}, status=500)
 
-def generate_feedback_summary(feedback_data, username):
+@csrf_exempt
+def summarize_feedback_stream(request):
+    """
+    Streaming variant of summarize_feedback with the same request body.
+    Unless the summary is cached, a 'progress' event with the number of
+    chunks to condense is sent first. The summary arrives as server-sent
+    'token' events while OpenAI writes it, followed by a 'done' event with
+    feedback_count, truncated and cached, or an 'error' event.
+    """
+    if request.method != 'POST':
+        return JsonResponse({"error": "Only POST method is allowed"}, status=405)
+
+    try:
+        summary_input = resolve_summary_input(json.loads(request.body))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON data"}, status=400)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    response = StreamingHttpResponse(stream_feedback_summary(*summary_input), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep nginx from buffering the events
+    return response
+
+def stream_feedback_summary(feedback_data, username, truncated, slack_user):
+    """
+    Yields the summarize_feedback_stream events and records the time to the
+    first event, to the first summary text and the total time under
+    summarize:stream:*.
+    """
+    started = time.monotonic()
+    done = {"feedback_count": len(feedback_data), "truncated": truncated, "cached": False}
+    key = summary_cache_key(build_summary_request(feedback_data, username))
+    summary = get_cached_summary(key)
+    if summary is not None:
+        record_stream_timing('first_byte', started)
+        record_stream_timing('first_token', started)
+        yield sse_event('token', {"text": summary})
+        record_stream_timing('total', started)
+        yield sse_event('done', {**done, "cached": True})
+        return
+
+    # The map phase can take a while on long histories; let the client know work has started
+    record_stream_timing('first_byte', started)
+    yield sse_event('progress', {"stage": "preparing", "chunks": len(chunk_feedback(feedback_data))})
+
+    parts = []
+    try:
+        final_request = prepare_final_request(feedback_data, username, openai_completions)
+        client = outbound.get_openai_client()
+        with outbound.timed('openai:chat.completions:stream'):
+            for text in stream_deltas(client.chat.completions.create(**final_request, stream=True)):
+                if not parts:
+                    record_stream_timing('first_token', started)
+                parts.append(text)
+                yield sse_event('token', {"text": text})
+    except Exception as e:
+        logger.error("Error streaming feedback summary: %s", str(e))
+        yield sse_event('error', {"error": "Unable to generate summary due to an error. Please try again later."})
+        return
+
+    store_summary(key, ''.join(parts).strip(), len(feedback_data), slack_user)
+    record_stream_timing('total', started)
+    yield sse_event('done', done)
+
+@csrf_exempt
+def get_feedback_summary(request, user_id):
+    """
+    Returns the precomputed summary of a user's feedback. status is pending
+    or running while manage.py precompute_summaries has not caught up with
+    the latest feedback, in which case summary is the previous one (or null).
+    Asking for a user without a summary queues one.
+    """
+    if request.method != 'GET':
+        return JsonResponse({"error": "Only GET method is allowed"}, status=405)
+
+    try:
+        slack_user = SlackUser.objects.get(slack_id=user_id)
+    except SlackUser.DoesNotExist:
+        return JsonResponse({"error": "User not found"}, status=404)
+
+    job = request_summary(slack_user)
+    return JsonResponse({
+        "status": job.status,
+        "summary": job.summary or None,
+        "feedback_count": job.feedback_count,
+        "truncated": job.truncated,
+        "generated_at": job.finished_at,
+    }, status=200)
+
+def generate_feedback_summary(feedback_data, username, slack_user=None):
     """
     Uses OpenAI API to generate a summary of all feedback for a specific user.
+    Returns (summary, cached); an identical earlier request is answered from
+    the summary cache without calling OpenAI.
     """
+    key = summary_cache_key(build_summary_request(feedback_data, username))
+    summary = get_cached_summary(key)
+    if summary is not None:
+        return summary, True
+
     try:
-        client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        
-        # Updated prompt to focus on individual user feedback analysis
-        prompt = (
-            f"Analyze the following feedback messages received by {username} and provide "
-            "a summary in markdown format with these sections:\n"
-            "# Personal Feedback Analysis\n\n"
-            "## Main Themes and Patterns\n"
-            f"[Analyze main themes in the feedback received by {username}]\n\n"
-            "## Key Strengths\n"
-            f"[List {username}'s key strengths based on the feedback]\n\n"
-            "## Areas for Improvement\n"
-            f"[List suggested areas where {username} could improve, based on the feedback]\n\n"
-            "## Personal Growth Trends\n"
-            f"[Analyze {username}'s growth and development trends based on the feedback]\n\n"
-            f"Note: This analysis is specifically about feedback received by {username}.\n\n"
-            "Feedback messages to analyze:\n\n"
-        )
-        
-        # Add all feedback messages to the prompt
-        for i, feedback in enumerate(feedback_data):
-            message_block = (
-                f"Message {i+1} (from {feedback.get('sender', 'Unknown')} "
-                f"on {feedback.get('timestamp', 'Unknown date')}):\n"
-                f"{feedback.get('message', '')}\n"
-            )
-            
-            reactions = feedback.get('reactions', [])
-            if reactions:
-                reaction_str = ', '.join(str(r) for r in reactions)
-                message_block += f"Reactions: {reaction_str}\n"
-            message_block += "\n"
-            
-            prompt += message_block
-        
-        # Updated system message to focus on personal feedback analysis
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",  # Using the 16k model for larger context
-            messages=[
-                {
-                    "role": "system", 
-                    "content": (
-                        "You are an expert at analyzing personal professional feedback. "
-                        "Provide concise summaries focused on the individual's performance, strengths, "
-                        "and growth opportunities. Frame the analysis from the perspective of "
-                        "feedback received by the specific person."
-                    )
-                },
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.7
-        )
-        
-        return response.choices[0].message.content.strip()
+        summary = summarize(feedback_data, username, openai_completions)
         
     except Exception as e:
-        print(f"Error generating feedback summary: {str(e)}")
-        return "Unable to generate summary due to an error. Please try again later."
+        logger.error("Error generating feedback summary: %s", str(e))
+        return "Unable to generate summary due to an error. Please try again later.", False
+
+    store_summary(key, summary, len(feedback_data), slack_user)
+    return summary, False
@@ -6,6 +6,7 @@ Generated by 'django-admin startproject' using Django 5.0.7.
 
 from pathlib import Path
 import os
+import sys
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,6 +14,28 @@ load_dotenv()
 
 SLACK_BOT_TOKEN = os.getenv('SLACK_BOT_TOKEN')
 SLACK_CHANNEL_ID = os.getenv('SLACK_CHANNEL_ID')
+SLACK_API_BASE_URL = os.getenv('SLACK_API_BASE_URL', 'https://slack.com/api')
+SLACK_SIGNING_SECRET = os.getenv('SLACK_SIGNING_SECRET')
+
+# Route the hot endpoints to feedback.async_views (for ASGI deployments)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Acknowledge Slack events immediately and apply them with manage.py process_slack_events.
+# Mentions the worker applies only reach /api/mentions/stream/ through MENTION_HUB_URL.
+SLACK_EVENTS_QUEUED = os.getenv('SLACK_EVENTS_QUEUED', 'false').lower() in ('1', 'true', 'yes')
+
+# In-memory Slack user directory (feedback.slack_directory)
+SLACK_USER_CACHE_TTL = int(os.getenv('SLACK_USER_CACHE_TTL', 3600))
+SLACK_USER_CACHE_SIZE = int(os.getenv('SLACK_USER_CACHE_SIZE', 10000))
+# Seconds a username stored in SlackUser is trusted before users.info is asked again, i.e.
+# how long a Slack rename can take to reach ingestion (--warm-directory picks it up at once)
+SLACK_USERNAME_MAX_AGE = int(os.getenv('SLACK_USERNAME_MAX_AGE', 24 * 3600))
+
+# Requests slower than this many milliseconds are logged with their slowest SQL (0 disables)
+SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', 1000))
+
+# Seconds before manage.py reconcile_slack_identities looks an unmatched login email up in Slack again
+SLACK_IDENTITY_RECHECK_INTERVAL = int(os.getenv('SLACK_IDENTITY_RECHECK_INTERVAL', 3600))
 
 # Build paths inside the project
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -53,12 +76,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'feedback',
     'corsheaders',
 ]
 
 MIDDLEWARE = [
+    'feedback.metrics.RequestMetricsMiddleware',  # First, so it times the whole request
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -108,6 +133,43 @@ SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = "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"
 
 # In settings.py
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_TIMEOUT = float(os.getenv('OPENAI_TIMEOUT', 60))
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # None uses api.openai.com
+
+# Estimated prompt tokens of feedback summarize_feedback reads from the database for a user_id
+# or accepts from the client; older feedback is dropped
+SUMMARY_PROMPT_TOKEN_BUDGET = int(os.getenv('SUMMARY_PROMPT_TOKEN_BUDGET', 48000))
+
+# Map-reduce summarization (feedback.summaries): feedback is summarized in chunks of this
+# many estimated tokens, at most SUMMARY_WORKERS OpenAI calls at a time
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', 6000))
+# Longer histories are chunked within periods of this many days, so chunk boundaries
+# stay put as new feedback arrives and the oldest drops out of the budget
+SUMMARY_CHUNK_DAYS = int(os.getenv('SUMMARY_CHUNK_DAYS', 30))
+SUMMARY_NOTES_MAX_TOKENS = int(os.getenv('SUMMARY_NOTES_MAX_TOKENS', 400))
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', 4))
+
+# Cached AI summaries (feedback.summaries): seconds an entry stays valid and entries kept
+SUMMARY_CACHE_TTL = int(os.getenv('SUMMARY_CACHE_TTL', 7 * 24 * 3600))
+SUMMARY_CACHE_SIZE = int(os.getenv('SUMMARY_CACHE_SIZE', 1000))
+
+# Cached mention and feedback list pages (feedback.response_cache): seconds a page is kept.
+# Page bodies live in the default cache; their versions live in the database, so pages are
+# invalidated across processes even when each worker has its own local-memory cache.
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 300))
+
+# Live mention stream (feedback.mention_hub): seconds between keepalive comments, and a
+# redis:// URL relaying deltas between worker processes (in-process only when empty).
+# Required with more than one web worker or with SLACK_EVENTS_QUEUED (check feedback.W001).
+MENTION_STREAM_KEEPALIVE = int(os.getenv('MENTION_STREAM_KEEPALIVE', 15))
+MENTION_HUB_URL = os.getenv('MENTION_HUB_URL', '')
+
+# Shared outbound HTTP clients for Slack and OpenAI (feedback.outbound)
+OUTBOUND_HTTP_CONNECT_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_CONNECT_TIMEOUT', 3.05))
+OUTBOUND_HTTP_TIMEOUT = float(os.getenv('OUTBOUND_HTTP_TIMEOUT', 10))
+OUTBOUND_HTTP_RETRIES = int(os.getenv('OUTBOUND_HTTP_RETRIES', 2))
+OUTBOUND_HTTP_BACKOFF = float(os.getenv('OUTBOUND_HTTP_BACKOFF', 0.5))
+OUTBOUND_HTTP_POOL_SIZE = int(os.getenv('OUTBOUND_HTTP_POOL_SIZE', 20))
 
 # Use custom SocialAccount Adapter
 SOCIALACCOUNT_ADAPTER = "feedback.adapters.MySocialAccountAdapter"
@@ -214,6 +276,12 @@ ACCOUNT_LOGOUT_ON_GET = True  # Removes the intermediate logout confirmation
 MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
 ACCOUNT_SESSION_REMEMBER = True
 
+# File the feedback loggers also write to; empty disables it. Test runs never write it.
+SLACK_EVENTS_LOG = os.getenv('SLACK_EVENTS_LOG', 'slack_events.log')
+if sys.argv[1:2] == ['test']:
+    SLACK_EVENTS_LOG = ''
+LOG_HANDLERS = ['console', 'file'] if SLACK_EVENTS_LOG else ['console']
+
 # Add to your existing settings.py
 LOGGING = {
     'version': 1,
@@ -222,14 +290,27 @@ LOGGING = {
         'console': {
             'class': 'logging.StreamHandler',
         },
-        'file': {
+        **({'file': {
             'class': 'logging.FileHandler',
-            'filename': 'slack_events.log',
-        },
+            'filename': SLACK_EVENTS_LOG,
+        }} if SLACK_EVENTS_LOG else {}),
     },
     'loggers': {
         'feedback.views': {
-            'handlers': ['console', 'file'],
+            'handlers': LOG_HANDLERS,
+            'level': 'INFO',
+        },
+        'feedback.events': {
+            'handlers': LOG_HANDLERS,
+            'level': 'INFO',
+        },
+        'feedback.async_views': {
+            'handlers': LOG_HANDLERS,
+            'level': 'INFO',
+        },
+        # Slow request warnings, see SLOW_REQUEST_MS
+        'feedback.metrics': {
+            'handlers': LOG_HANDLERS,
             'level': 'INFO',
         },
     },
@@ -1,18 +1,25 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
 from rest_framework.routers import DefaultRouter
 from feedback.views import (
     FeedbackViewSet,
-    slack_event_listener,
-    get_mentions,
     auth_callback,
     get_user_info,
     oauth_success,
     check_auth,
     debug_session,
-    summarize_feedback
+    debug_outbound,
+    metrics,
+    get_feedback_summary,
+    search_feedback,
+    get_user_stats,
 )
+from feedback import async_views, views
+
+# The hot endpoints have ASGI-native versions for async deployments
+hot_views = async_views if settings.ASYNC_VIEWS else views
 
 router = DefaultRouter()
 router.register(r'feedbacks', FeedbackViewSet)
@@ -29,16 +36,28 @@ urlpatterns = [
     path("accounts/social/signup/", google_auto_login),
     path("accounts/", include("allauth.urls")),
     path('api/', include(router.urls)),
-    path('slack/events/', slack_event_listener, name='slack_event_listener'),
-    path('api/get-mentions/', get_mentions, name='get_mentions'),
+    path('slack/events/', hot_views.slack_event_listener, name='slack_event_listener'),
+    path('api/get-mentions/', hot_views.get_mentions, name='get_mentions'),
+    path('api/mentions/stream/', hot_views.stream_mentions, name='stream_mentions'),
     path('api/auth/callback/', auth_callback, name='auth_callback'),
     path('api/user/info/', get_user_info, name='get_user_info'),
     path('oauth/success/', oauth_success, name='oauth_success'),
     path('api/auth/check/', check_auth, name='check_auth'),
     path('api/debug/session/', debug_session, name='debug_session'),
+    path('api/debug/outbound/', debug_outbound, name='debug_outbound'),
+    path('metrics', metrics, name='metrics'),
     path(
         'api/feedback/summarize/',
-        summarize_feedback,
+        hot_views.summarize_feedback,
         name='summarize_feedback'
     ),
+    path('api/users/<str:user_id>/stats/', get_user_stats, name='get_user_stats'),
+    path('api/feedback/export/', hot_views.export_feedback, name='export_feedback'),
+    path('api/feedback/search/', search_feedback, name='search_feedback'),
+    path('api/feedback/summary/<str:user_id>/', get_feedback_summary, name='get_feedback_summary'),
+    path(
+        'api/feedback/summarize/stream/',
+        hot_views.summarize_feedback_stream,
+        name='summarize_feedback_stream'
+    ),
 ]